@@ -3,25 +3,23 @@ from joblib import Parallel, delayed
 import pandas as pd
 from config import root_path
 import config as global_config
+from cta_api.cache import invalidate_data
+from cta_api.market_store import MarketStore, STORE_COLUMNS
+
+store = MarketStore(getattr(global_config, "market_store_path", os.path.join(root_path, "data", "market_store")),
+                    compact=getattr(global_config, "market_store_compact", False))
 
 def convert(symbol: str, interval: str, skip_existing: bool = True):
     s = symbol if "-" in symbol else symbol.replace("USDT","-USDT")
     src = os.path.join(root_path, "data", "market_csv", interval.upper(), f"{s}.csv")
-    dst_dir = os.path.join(root_path, "data", "pickle_data", interval.upper())
-    os.makedirs(dst_dir, exist_ok=True)
-    dst = os.path.join(dst_dir, f"{s}.pkl")
-    if skip_existing and os.path.exists(dst):
+    dst = store.symbol_dir(s, interval)
+    if skip_existing and store.exists(s, interval):
         print("skip existing:", dst)
         return
     df = pd.read_csv(src, parse_dates=["candle_begin_time"])
     df["offset"] = 0
     df["kline_pct"] = pd.to_numeric(df["close"], errors="coerce").pct_change().fillna(0.0)
-    cols = [
-        "candle_begin_time","open","high","low","close","volume","quote_volume","trade_num",
-        "taker_buy_base_asset_volume","taker_buy_quote_asset_volume","taker_sell_quote_asset_volume",
-        "offset","kline_pct"
-    ]
-    df = df[cols]
+    df = df[STORE_COLUMNS]
     try:
         print("sample head for", s, "interval", interval)
         print(df.head(5).to_string())
@@ -29,10 +27,34 @@ def convert(symbol: str, interval: str, skip_existing: bool = True):
         print(df.dtypes)
     except Exception as e:
         print("print sample error:", symbol, e)
-    df.to_feather(dst)
+    # 按月份分区写入 Parquet，回测按时间范围只读取需要的月份
+    store.write(df, s, interval)
+    # 同一进程内已缓存的旧数据失效
+    invalidate_data(s, interval)
     print("saved:", dst, len(df))
 
 
+def migrate_pickle(interval: str, skip_existing: bool = True):
+    """把 data/pickle_data/{周期} 下旧的 feather (.pkl) 文件导入分区存储"""
+    src_dir = os.path.join(root_path, "data", "pickle_data", interval.upper())
+    if not os.path.exists(src_dir):
+        print("pkl 目录不存在：", src_dir)
+        return
+    for f in sorted(os.listdir(src_dir)):
+        if not f.endswith(".pkl"):
+            continue
+        s = f[:-len(".pkl")]
+        if skip_existing and store.exists(s, interval):
+            print("skip existing:", store.symbol_dir(s, interval))
+            continue
+        try:
+            n = store.import_feather(os.path.join(src_dir, f), s, interval)
+            invalidate_data(s, interval)
+            print("migrated:", s, n)
+        except Exception as e:
+            print("migrate error:", s, e)
+
+
 def batch_convert(interval: str, workers: int = 4, skip_existing: bool = True):
     src_dir = os.path.join(root_path, "data", "market_csv", interval.upper())
     if not os.path.exists(src_dir):
@@ -60,7 +82,9 @@ if __name__ == "__main__":
     interval = getattr(global_config, "data_convert_interval", "1h")
     workers = getattr(global_config, "data_convert_workers", 4)
     skip_existing = getattr(global_config, "data_convert_skip_existing", True)
-    if symbol:
+    if getattr(global_config, "data_convert_migrate_pickle", False):
+        migrate_pickle(interval, skip_existing=skip_existing)
+    elif symbol:
         convert(symbol, interval, skip_existing=skip_existing)
     else:
         batch_convert(interval, workers=workers, skip_existing=skip_existing)
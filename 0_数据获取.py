@@ -5,6 +5,7 @@ from datetime import datetime
 from joblib import Parallel, delayed
 import pandas as pd
 from cta_api.binance_fetcher import collect, save_csv
+from cta_api.gap_index import find_gaps, missing_ranges
 from config import root_path
 import config as global_config
 
@@ -39,76 +40,369 @@ def _interval_delta(interval: str) -> pd.Timedelta:
     raise ValueError(interval)
 
 
+def _csv_gap_index(csv_path: str, interval: str):
+    from cta_api.gap_index import GapIndex
+
+    return GapIndex(csv_path[:-len(".csv")] + ".gaps.json", _interval_delta(interval))
+
+
+def _max_gap_attempts() -> int:
+    return getattr(global_config, "data_fetch_gap_max_attempts", 3)
+
+
+def _fmt(ts) -> str:
+    return pd.Timestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _plan_one(sym: str, interval: str, start: str, end: str):
+    """
+    根据本地 csv 决定下载起点；本地数据中间缺了K线时把缺失区间记入缺口索引，之后只补这些区间，不再整段重新下载
+    :return: (csv_path, 本地数据 base_df 或 None, 下载起点，末尾已是最新时为 None)；已是最新且没有待补的缺口时返回 None
+    """
+    csv_dir = os.path.join(root_path, "data", "market_csv", interval.upper())
+    os.makedirs(csv_dir, exist_ok=True)
+    s = sym if "-" in sym else sym.replace("USDT", "-USDT")
+    csv_path = os.path.join(csv_dir, f"{s}.csv")
+    from_start = start
+    base_df = None
+    if os.path.exists(csv_path):
+        try:
+            base_df = pd.read_csv(csv_path, parse_dates=["candle_begin_time"])
+            if base_df.empty:
+                base_df = None
+            else:
+                base_df = base_df.dropna(subset=["candle_begin_time"])
+                base_df = base_df.drop_duplicates(subset=["candle_begin_time"])
+                base_df = base_df.sort_values("candle_begin_time")
+                times = base_df["candle_begin_time"].reset_index(drop=True)
+                step = _interval_delta(interval)
+                index = _csv_gap_index(csv_path, interval)
+                gaps = find_gaps(times, step)
+                if gaps:
+                    print(sym, "local csv has", len(gaps), "gaps, backfill missing ranges only")
+                    index.add(gaps)
+                last_ts = times.iloc[-1]
+                end_ts = pd.Timestamp(end) if end is not None else pd.Timestamp.utcnow()
+                if last_ts >= end_ts - step:
+                    if not index.pending(_max_gap_attempts()):
+                        print(sym, "already up to date, last:", last_ts, "target:", end_ts)
+                        return None
+                    from_start = None
+                else:
+                    from_start = (last_ts + step).strftime("%Y-%m-%d %H:%M:%S")
+                    print(sym, "incremental from", from_start)
+        except Exception as e:
+            print(sym, "read local csv error, redownload from", start, e)
+            base_df = None
+    return csv_path, base_df, from_start
+
+
+def _csv_gaps(sym: str, csv_path: str, interval: str, base_df):
+    """待补数的缺口 (本地没有数据时为空)"""
+    if base_df is None:
+        return []
+    return _csv_gap_index(csv_path, interval).pending(_max_gap_attempts())
+
+
+def _save_one(sym: str, csv_path: str, base_df, df: pd.DataFrame, interval: str = None, fills=()):
+    """
+    :param fills: [(缺口, 补数下载的数据), ...]，与新数据一起合并，之后在缺口索引中更新仍缺失的区间
+    """
+    parts = [f for _, f in fills if f is not None and not f.empty]
+    if base_df is not None:
+        all_df = pd.concat([base_df] + ([df] if not df.empty else []) + parts, ignore_index=True)
+        all_df = all_df.dropna(subset=["candle_begin_time"])
+        all_df = all_df.drop_duplicates(subset=["candle_begin_time"])
+        all_df = all_df.sort_values("candle_begin_time")
+    else:
+        all_df = df
+    all_df.to_csv(csv_path, index=False, encoding="utf-8")
+    print(sym, "saved", csv_path, "shape", all_df.shape)
+    if interval is None:
+        return
+    step = _interval_delta(interval)
+    index = _csv_gap_index(csv_path, interval)
+    if base_df is None:
+        index.clear()
+    for gap, _ in fills:
+        remaining = missing_ranges(all_df["candle_begin_time"], gap.start, gap.end, step)
+        index.resolve(gap, remaining)
+        print(sym, "backfill", gap.start, "->", gap.end, "remaining gaps", len(remaining))
+    # 只校验新数据及其与本地最后一根K线的衔接
+    if not df.empty:
+        head = [base_df["candle_begin_time"].max()] if base_df is not None else []
+        new = df["candle_begin_time"].dropna().drop_duplicates().sort_values().tolist()
+        gaps = find_gaps(head + new, step)
+        if gaps:
+            index.add(gaps)
+
+
+def _collect_retry(sym: str, interval: str, from_start: str, end: str) -> pd.DataFrame:
+    """下载 [from_start, end]，接口暂时无数据时指数退避重试，最终无数据返回空表"""
+    base_sleep = getattr(global_config, "data_fetch_no_data_sleep", 5.0)
+    max_retries = getattr(global_config, "data_fetch_no_data_max_retries", 3)
+    sleep_time = base_sleep
+    attempt = 0
+    while True:
+        df = collect(sym, interval, from_start, end)
+        if not df.empty:
+            return df
+        attempt += 1
+        print(sym, "no data", f"(attempt {attempt}/{max_retries})")
+        if attempt >= max_retries or sleep_time <= 0:
+            print(sym, "no data after retries, skip")
+            return df
+        print(sym, "sleep", sleep_time, "seconds before retry")
+        time.sleep(sleep_time)
+        sleep_time *= 2
+
+
 def _download_one(sym: str, interval: str, start: str, end: str):
     try:
-        csv_dir = os.path.join(root_path, "data", "market_csv", interval.upper())
-        os.makedirs(csv_dir, exist_ok=True)
-        s = sym if "-" in sym else sym.replace("USDT", "-USDT")
-        csv_path = os.path.join(csv_dir, f"{s}.csv")
-        from_start = start
-        base_df = None
-        if os.path.exists(csv_path):
-            try:
-                base_df = pd.read_csv(csv_path, parse_dates=["candle_begin_time"])
-                if base_df.empty:
-                    base_df = None
-                else:
-                    base_df = base_df.dropna(subset=["candle_begin_time"])
-                    base_df = base_df.drop_duplicates(subset=["candle_begin_time"])
-                    base_df = base_df.sort_values("candle_begin_time")
-                    times = base_df["candle_begin_time"].reset_index(drop=True)
-                    delta = times.diff().dropna()
-                    step = _interval_delta(interval)
-                    if not delta.eq(step).all():
-                        print(sym, "local csv not continuous, redownload from", start)
-                        base_df = None
-                    else:
-                        last_ts = times.iloc[-1]
-                        end_ts = pd.Timestamp(end) if end is not None else pd.Timestamp.utcnow()
-                        if last_ts >= end_ts - step:
-                            print(sym, "already up to date, last:", last_ts, "target:", end_ts)
-                            return
-                        from_start = (last_ts + step).strftime("%Y-%m-%d %H:%M:%S")
-                        print(sym, "incremental from", from_start)
-            except Exception as e:
-                print(sym, "read local csv error, redownload from", start, e)
-                base_df = None
-        base_sleep = getattr(global_config, "data_fetch_no_data_sleep", 5.0)
-        max_retries = getattr(global_config, "data_fetch_no_data_max_retries", 3)
-        sleep_time = base_sleep
-        attempt = 0
-        while True:
-            df = collect(sym, interval, from_start, end)
+        plan = _plan_one(sym, interval, start, end)
+        if plan is None:
+            return
+        csv_path, base_df, from_start = plan
+        df = _collect_retry(sym, interval, from_start, end) if from_start is not None else pd.DataFrame()
+        gaps = _csv_gaps(sym, csv_path, interval, base_df)
+        fills = [(gap, collect(sym, interval, _fmt(gap.start), _fmt(gap.end))) for gap in gaps]
+        if not df.empty or fills:
+            _save_one(sym, csv_path, base_df, df, interval, fills)
+    except Exception as e:
+        print(sym, "error", str(e))
+
+
+def _store():
+    from cta_api.market_store import MarketStore
+
+    return MarketStore(getattr(global_config, "market_store_path", os.path.join(root_path, "data", "market_store")),
+                       compact=getattr(global_config, "market_store_compact", False))
+
+
+def _append_start(store, sym: str, interval: str, start: str, end: str):
+    """
+    追加模式的下载起点：分区存储高水位线的下一根K线，不读取数据文件
+    :return: 下载起点；已是最新时返回 None
+    """
+    s = sym if "-" in sym else sym.replace("USDT", "-USDT")
+    hwm = store.high_water_mark(s, interval)
+    if hwm is None:
+        return start
+    step = _interval_delta(interval)
+    end_ts = pd.Timestamp(end) if end is not None else pd.Timestamp.utcnow().tz_localize(None)
+    if hwm["last"] >= end_ts - step:
+        print(sym, "already up to date, last:", hwm["last"], "target:", end_ts)
+        return None
+    return (hwm["last"] + step).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _append_save(store, sym: str, interval: str, df: pd.DataFrame):
+    from cta_api.market_store import STORE_COLUMNS
+    from cta_api.cache import invalidate_data
+
+    s = sym if "-" in sym else sym.replace("USDT", "-USDT")
+    res = store.append(df[[c for c in STORE_COLUMNS if c in df.columns]], s, interval, step=_interval_delta(interval))
+    invalidate_data(s, interval)
+    print(sym, "appended", res.rows, "rows", res.first, "->", res.last)
+    for a, b in res.gaps:
+        print(sym, "gap", a, "->", b)
+
+
+def _store_gaps(store, sym: str, interval: str):
+    """分区存储中待补数的缺口 (第一次运行时扫描已有数据建立缺口索引)"""
+    s = sym if "-" in sym else sym.replace("USDT", "-USDT")
+    step = _interval_delta(interval)
+    if not store.exists(s, interval):
+        return []
+    index = store.gap_index(s, interval, step)
+    if not index.exists():
+        store.scan_gaps(s, interval, step)
+    return index.pending(_max_gap_attempts())
+
+
+def _fill_store_gaps(store, sym: str, interval: str, fills):
+    """补数下载的数据按缺口原地合并 (只重写缺口所在的月份)"""
+    from cta_api.cache import invalidate_data
+
+    s = sym if "-" in sym else sym.replace("USDT", "-USDT")
+    step = _interval_delta(interval)
+    for gap, df in fills:
+        remaining = store.fill_gap(df, s, interval, step, gap)
+        print(sym, "backfill", gap.start, "->", gap.end, "remaining gaps", len(remaining))
+    if fills:
+        invalidate_data(s, interval)
+
+
+def _append_one(sym: str, interval: str, start: str, end: str):
+    try:
+        store = _store()
+        from_start = _append_start(store, sym, interval, start, end)
+        if from_start is not None:
+            df = _collect_retry(sym, interval, from_start, end)
             if not df.empty:
-                if base_df is not None:
-                    all_df = pd.concat([base_df, df], ignore_index=True)
-                    all_df = all_df.dropna(subset=["candle_begin_time"])
-                    all_df = all_df.drop_duplicates(subset=["candle_begin_time"])
-                    all_df = all_df.sort_values("candle_begin_time")
-                else:
-                    all_df = df
-                all_df.to_csv(csv_path, index=False, encoding="utf-8")
-                print(sym, "saved", csv_path, "shape", all_df.shape)
-                return
-            attempt += 1
-            print(sym, "no data", f"(attempt {attempt}/{max_retries})")
-            if attempt >= max_retries or sleep_time <= 0:
-                print(sym, "no data after retries, skip")
-                return
-            print(sym, "sleep", sleep_time, "seconds before retry")
-            time.sleep(sleep_time)
-            sleep_time *= 2
+                _append_save(store, sym, interval, df)
+        fills = [(gap, collect(sym, interval, _fmt(gap.start), _fmt(gap.end)))
+                 for gap in _store_gaps(store, sym, interval)]
+        _fill_store_gaps(store, sym, interval, fills)
     except Exception as e:
         print(sym, "error", str(e))
 
 
+def _run_async(syms, interval: str, start: str, end: str):
+    """
+    异步模式：一个连接池、共享请求权重预算，全部合约的 (合约, 时间窗口) 并发下载
+    异步下载为空或出错的合约再走串行的 _download_one (含 Binance Vision 兜底和重试)
+    本地 csv 缺口索引中的区间与末尾增量一起下载，合并后只保留仍缺失的区间
+    """
+    from cta_api.async_fetcher import AsyncKlineFetcher
+
+    plans = {}
+    for sym in syms:
+        try:
+            plan = _plan_one(sym, interval, start, end)
+        except Exception as e:
+            print(sym, "error", str(e))
+            continue
+        if plan is not None:
+            plans[sym] = plan
+    if not plans:
+        return
+    fetcher = AsyncKlineFetcher(
+        concurrency=getattr(global_config, "data_fetch_async_concurrency", 16),
+        weight_limit_1m=getattr(global_config, "data_fetch_weight_limit", 2400),
+    )
+    # 末尾增量和缺口补数放在同一批请求中
+    jobs = [(sym, None) for sym, (_, _, from_start) in plans.items() if from_start is not None]
+    jobs += [(sym, gap) for sym, (csv_path, base_df, _) in plans.items()
+             for gap in _csv_gaps(sym, csv_path, interval, base_df)]
+    requests = [(sym, interval, plans[sym][2], end) if gap is None else
+                (sym, interval, _fmt(gap.start), _fmt(gap.end)) for sym, gap in jobs]
+    t0 = time.time()
+    frames = fetcher.run(requests)
+    st = fetcher.stats
+    print(f"async fetch: {len(plans)} symbols, {st.requests} requests, weight {st.weight:.0f}, "
+          f"retries {st.retries}, throttled {st.throttled}, {time.time() - t0:.1f}s")
+    done = list(zip(jobs, requests, frames))
+    for sym, (csv_path, base_df, from_start) in plans.items():
+        req, df = next(((req, f) for (s, gap), req, f in done if s == sym and gap is None), (None, pd.DataFrame()))
+        if df.empty and from_start is not None:
+            if req in st.errors:
+                print(sym, "async error", st.errors[req])
+            _download_one(sym, interval, start, end)
+            continue
+        # 下载出错的缺口不计入尝试次数，留到下次运行
+        fills = []
+        for (s, gap), req, f in done:
+            if s != sym or gap is None:
+                continue
+            if req in st.errors:
+                print(sym, "async backfill error", gap.start, "->", gap.end, st.errors[req])
+            else:
+                fills.append((gap, f))
+        try:
+            _save_one(sym, csv_path, base_df, df, interval, fills)
+        except Exception as e:
+            print(sym, "error", str(e))
+
+
+def _run_vision(syms, interval: str, start: str, end: str):
+    """
+    Binance Vision 模式：月度/每日压缩包并行下载到本地缓存 (校验 sha256)，直接合并写入分区存储，不经过 CSV
+    已有数据的合约从高水位线所在的日期开始更新，只重写该日期所在月份及之后的分区
+    """
+    from cta_api.vision_ingest import VisionIngester
+    from cta_api.cache import invalidate_data
+
+    store = _store()
+    ingester = VisionIngester(
+        getattr(global_config, "vision_cache_path", os.path.join(root_path, "data", "vision_cache")),
+        workers=getattr(global_config, "vision_workers", 8),
+    )
+    groups = {}
+    for sym in syms:
+        s = sym if "-" in sym else sym.replace("USDT", "-USDT")
+        hwm = store.high_water_mark(s, interval)
+        groups.setdefault(hwm["last"].strftime("%Y-%m-%d") if hwm else start, []).append(sym)
+    for sym_start, group in groups.items():
+        for s, n in ingester.ingest_many(group, interval, sym_start, end, store).items():
+            invalidate_data(s, interval)
+            print(s, "vision ingested from", sym_start, "rows", n)
+    for sym, err in ingester.errors.items():
+        print(sym, "vision error", err)
+
+
+def _run_append(syms, interval: str, start: str, end: str, workers: int = 4):
+    """
+    追加模式：按分区存储每个合约的高水位线增量下载，新K线追加为所在月份的新文件，不读写 CSV，也不重写已有数据
+    之后只对缺口索引中的区间补数，原地合并进缺口所在的月份
+    data_fetch_async 同时开启时用异步下载器一次下载全部合约
+    """
+    if not getattr(global_config, "data_fetch_async", False):
+        if workers is None or workers <= 1:
+            for sym in syms:
+                _append_one(sym, interval, start, end)
+        else:
+            Parallel(n_jobs=workers)(delayed(_append_one)(sym, interval, start, end) for sym in syms)
+        return
+
+    from cta_api.async_fetcher import AsyncKlineFetcher
+
+    store = _store()
+    plans = {}
+    for sym in syms:
+        from_start = _append_start(store, sym, interval, start, end)
+        if from_start is not None:
+            plans[sym] = from_start
+    fetcher = AsyncKlineFetcher(
+        concurrency=getattr(global_config, "data_fetch_async_concurrency", 16),
+        weight_limit_1m=getattr(global_config, "data_fetch_weight_limit", 2400),
+    )
+    requests = [(sym, interval, from_start, end) for sym, from_start in plans.items()]
+    frames = fetcher.run(requests) if requests else []
+    errors = fetcher.stats.errors
+    retry = []
+    for sym, req, df in zip(plans, requests, frames):
+        if df.empty:
+            if req in errors:
+                print(sym, "async error", errors[req])
+            retry.append(sym)
+            continue
+        try:
+            _append_save(store, sym, interval, df)
+        except Exception as e:
+            print(sym, "error", str(e))
+
+    # 新K线写入后 (可能发现新的缺口) 再一次性补齐全部合约的缺口
+    gaps = [(sym, gap) for sym in syms if sym not in retry for gap in _store_gaps(store, sym, interval)]
+    if gaps:
+        requests = [(sym, interval, _fmt(gap.start), _fmt(gap.end)) for sym, gap in gaps]
+        fills = fetcher.run(requests)
+        for (sym, gap), req, df in zip(gaps, requests, fills):
+            # 下载出错 (而不是交易所没有数据) 的缺口不计入尝试次数，留到下次运行
+            if req in errors:
+                print(sym, "async backfill error", gap.start, "->", gap.end, errors[req])
+                continue
+            try:
+                _fill_store_gaps(store, sym, interval, [(gap, df)])
+            except Exception as e:
+                print(sym, "error", str(e))
+    for sym in retry:
+        _append_one(sym, interval, start, end)
+
+
 def run(interval="1h", start="2019-09-01", end=None, limit=None, workers: int = 4):
     end = end or datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
     syms = usdt_perpetual_symbols()
     if limit:
         syms = syms[:limit]
     symbol_delay = getattr(global_config, "data_fetch_symbol_delay", 0.0)
-    if workers is None or workers <= 1:
+    if getattr(global_config, "data_fetch_vision", False):
+        _run_vision(syms, interval, start, end)
+    elif getattr(global_config, "data_fetch_append", False):
+        _run_append(syms, interval, start, end, workers)
+    elif getattr(global_config, "data_fetch_async", False):
+        _run_async(syms, interval, start, end)
+    elif workers is None or workers <= 1:
         total = len(syms)
         for idx, sym in enumerate(syms, 1):
             progress = idx / total * 100 if total else 0
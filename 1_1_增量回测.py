@@ -0,0 +1,38 @@
+import pandas as pd
+
+from cta_api.base import BacktestConfig
+from cta_api.engine import BacktestEngine
+from cta_api.streaming import run_stream_book
+import config as global_config
+
+
+def main():
+    book = getattr(global_config, "stream_book", None)
+    if not book:
+        print("config.stream_book is empty.")
+        return
+    rule_type = getattr(global_config, "stream_rule_type", "1H")
+    start = getattr(global_config, "stream_start", global_config.date_start)
+    warmup = getattr(global_config, "stream_warmup_bars", 2000)
+    state_path = getattr(global_config, "stream_state_path", None)
+
+    cfg = BacktestConfig(
+        c_rate=global_config.c_rate,
+        slippage=global_config.slippage,
+        leverage_rate=global_config.leverage_rate,
+        min_margin_ratio=global_config.min_margin_ratio,
+        proportion=global_config.proportion
+    )
+    engine = BacktestEngine(cfg)
+
+    # 首次运行 (或参数、费用设置变化后) 全量计算并建立检查点，之后只处理新增K线
+    print(f"Streaming update: {len(book)} strategies | {rule_type} | from {start}")
+    summary = run_stream_book(engine, [tuple(x) for x in book], rule_type=rule_type, start_date=start,
+                              warmup=warmup, state_path=state_path)
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(summary.to_string(index=False))
+    print(f"\nEquity curves saved to {engine.output_path / 'stream'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import pandas as pd
+
 from cta_api.base import BacktestConfig
 from cta_api.engine import BacktestEngine
 import config as global_config # 仍然可以读取 config.py 作为默认值
@@ -41,7 +43,26 @@ def main():
     )
     
     engine = BacktestEngine(cfg)
-    
+
+    if getattr(global_config, "single_all_offsets", False):
+        print(f"Starting Offset Backtest: {symbol} | {factor} | {para_list} | {rule_type}")
+        results, blend, blend_metrics = engine.run_backtest_offsets(
+            symbol=symbol,
+            factor_name=factor,
+            para=para_list,
+            rule_type=rule_type,
+            start_date=start,
+            end_date=end
+        )
+        if not results:
+            return
+        cols = ['累积净值', '年化收益', '最大回撤', '年化收益/回撤比', '夏普比率']
+        table = pd.DataFrame([{k: m[k] for k in cols} for _, _, m in results], index=[o for o, _, _ in results])
+        table.index.name = 'offset'
+        table.loc['合成'] = [blend_metrics[k] for k in cols]
+        print(table.to_string())
+        return
+
     print(f"Starting Backtest: {symbol} | {factor} | {para_list}")
     engine.run_backtest(
         symbol=symbol,
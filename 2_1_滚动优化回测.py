@@ -0,0 +1,98 @@
+import importlib
+import os
+
+import matplotlib
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from cta_api.base import BacktestConfig
+from cta_api.engine import BacktestEngine
+from cta_api.walk_forward import make_folds, run_walk_forward
+import config as global_config
+
+matplotlib.rcParams["font.family"] = "sans-serif"
+matplotlib.rcParams["font.sans-serif"] = ["SimHei", "STHeiti", "PingFang SC", "Arial Unicode MS"]
+matplotlib.rcParams["axes.unicode_minus"] = False
+
+
+def _para_combinations(factor: str) -> list:
+    """参数网格：batch_use_factor_params 为 True 时用因子自带的 para_list，否则用 config.para"""
+    if getattr(global_config, "batch_use_factor_params", False):
+        module = importlib.import_module(f'factors.{factor}')
+        if hasattr(module, 'Strategy'):
+            return module.Strategy().para_list()
+        return module.para_list()
+    cfg_para = getattr(global_config, 'para', [])
+    if isinstance(cfg_para, (int, float)):
+        return [[cfg_para]]
+    return [list(x) if isinstance(x, (list, tuple)) else [x] for x in cfg_para]
+
+
+def main():
+    symbols = getattr(global_config, "symbol_list", None)
+    if not symbols:
+        print("config.symbol_list is empty.")
+        return
+    if not getattr(global_config, "signal_name_list", None):
+        print("config.signal_name_list is empty.")
+        return
+    factor = global_config.signal_name_list[0]
+    rule_type = global_config.rule_type_list[0] if getattr(global_config, "rule_type_list", None) else "1H"
+    start = getattr(global_config, "date_start", "2021-01-01")
+    end = getattr(global_config, "date_end", "2025-01-01")
+    per_eva = getattr(global_config, "per_eva", "a")
+    if per_eva == 'a':
+        print("config.per_eva = 'a': 滚动优化需要按 y / m / w 划分区间")
+        return
+    train_periods = getattr(global_config, "wf_train_periods", 6)
+    test_periods = getattr(global_config, "wf_test_periods", 1)
+    metric = getattr(global_config, "wf_metric", "年化收益/回撤比")
+    cpu = getattr(global_config, "wf_cpu", max(1, os.cpu_count() - 1))
+
+    cfg = BacktestConfig(
+        c_rate=global_config.c_rate,
+        slippage=global_config.slippage,
+        leverage_rate=global_config.leverage_rate,
+        min_margin_ratio=global_config.min_margin_ratio,
+        proportion=global_config.proportion
+    )
+    engine = BacktestEngine(cfg)
+
+    para_combinations = _para_combinations(factor)
+    folds = make_folds(start, end, per_eva, train_periods, test_periods)
+    print(f"Walk-forward: {factor} | {len(para_combinations)} para sets | {len(folds)} folds "
+          f"(样本内 {train_periods}{per_eva} / 样本外 {test_periods}{per_eva}) | 选优指标: {metric}")
+
+    out_dir = engine.output_path / 'walk_forward'
+    out_dir.mkdir(exist_ok=True)
+    fig, ax = plt.subplots()
+    for symbol in symbols:
+        try:
+            res = run_walk_forward(engine, symbol, factor, para_combinations, rule_type, folds,
+                                   metric=metric, n_jobs=cpu)
+        except Exception as e:
+            print(f"[{symbol}] walk-forward failed: {e}")
+            continue
+        if res is None:
+            print(f"[{symbol}] no usable folds")
+            continue
+
+        print(f"\n[{symbol}] 各区间选中的参数与样本外表现:")
+        print(res.folds[['fold', 'test_start', 'test_end', 'para', f'样本内{metric}', '累积净值', '最大回撤']].to_string(index=False))
+        print(f"[{symbol}] 拼接后: 累积净值={res.metrics['累积净值']:.4f} 年化收益={res.metrics['年化收益']:.2%} "
+              f"最大回撤={res.metrics['最大回撤']:.2%} 夏普比率={res.metrics['夏普比率']:.2f}")
+
+        name = f"{factor}&{symbol.split('-')[0]}&{rule_type}&{per_eva}{train_periods}-{test_periods}"
+        res.folds.to_csv(out_dir / f"{name}&folds.csv", index=False, encoding='gbk')
+        res.equity.to_csv(out_dir / f"{name}&equity.csv", index=False, encoding='gbk')
+        ax.plot(pd.to_datetime(res.equity['candle_begin_time']), res.equity['equity_curve'], label=symbol)
+
+    print(f"\nResults saved to {out_dir}")
+    ax.set_title(f"{factor} walk-forward (样本外拼接)")
+    ax.legend()
+    plt.tight_layout()
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,9 @@ import ast
 
 from cta_api.base import BacktestConfig, BaseFactor
 from cta_api.engine import BacktestEngine
+from cta_api.shared_data import SharedMarketData
+from cta_api.scheduler import build_task_chunks, run_chunk, data_versions
+from cta_api.result_store import ResultStore
 import config as global_config
 
 matplotlib.rcParams["font.family"] = "sans-serif"
@@ -106,42 +109,6 @@ def plot_param_surfaces_multi(res_df: pd.DataFrame):
         plt.tight_layout()
         plt.show()
 
-def run_single_param_set(engine: BacktestEngine, symbol: str, factor_name: str, para: list, rule_type: str, start: str, end: str):
-    """
-    单个参数组合的运行函数（用于并行调用）
-    """
-    try:
-        # 运行回测，不画图以节省资源
-        df, metrics = engine.run_backtest(
-            symbol=symbol,
-            factor_name=factor_name,
-            para=para,
-            rule_type=rule_type,
-            start_date=start,
-            end_date=end,
-            show_chart=False
-        )
-        if df is None or df.empty:
-            return None
-        
-        # 提取最后一行结果
-        res = df.iloc[-1].to_dict()
-        res['symbol'] = symbol
-        res['factor'] = factor_name
-        res['para'] = str(para)
-        
-        # 补充一些统计指标 (从 metrics 中提取)
-        if metrics is not None:
-            res['年化收益'] = metrics.loc['年化收益', 0]
-            res['最大回撤'] = metrics.loc['最大回撤', 0]
-            res['夏普比率'] = metrics.loc['夏普比率', 0]
-            res['年化收益/回撤比'] = metrics.loc['年化收益/回撤比', 0]
-        
-        return res
-    except Exception as e:
-        print(f"Error in {symbol} {para}: {e}")
-        return None
-
 def main():
     symbols = getattr(global_config, "symbol_list", None)
     if not symbols:
@@ -170,7 +137,8 @@ def main():
         slippage=global_config.slippage,
         leverage_rate=global_config.leverage_rate,
         min_margin_ratio=global_config.min_margin_ratio,
-        proportion=global_config.proportion
+        proportion=global_config.proportion,
+        data_mmap=getattr(global_config, "data_mmap", False)
     )
     engine = BacktestEngine(cfg)
 
@@ -220,59 +188,46 @@ def main():
     total_tasks = len(symbols) * len(para_combinations)
     print(f"Total combinations: {total_tasks}")
     
-    # 3. 并行执行（带简单进度打印）
-    tasks = []
-    for symbol in symbols:
-        for para in para_combinations:
-            tasks.append((engine, symbol, factor, para, rule_type, start, end))
-    
-    completed = 0
+    # 3. 按 (币种, 因子) 分块并行执行，每完成一块就追加写入结果库（带简单进度打印）
+    chunks = build_task_chunks(symbols, {factor: para_combinations}, rule_type, start, end, n_jobs=cpu,
+                               data_versions=data_versions(engine, symbols, rule_type),
+                               min_amounts=engine.min_amount_dict)
+    print(f"Task chunks: {len(chunks)}")
 
-    def _run_with_progress(args):
-        nonlocal completed
-        res = run_single_param_set(*args)
-        completed += 1
-        print(f"\rProgress: {completed}/{total_tasks} ({completed/total_tasks*100:.1f}%)", end="", flush=True)
-        return res
+    store = ResultStore(getattr(global_config, "result_store_path", engine.output_path / "results"))
+    completed = 0
 
-    results = Parallel(n_jobs=cpu)(
-        delayed(_run_with_progress)(task) for task in tasks
-    )
+    def _run(chunk):
+        return chunk, run_chunk(engine, chunk)
+
+    # 行情只读取一次并发布到共享内存，各 worker 零拷贝挂载
+    with SharedMarketData() as shared, store:
+        engine.share_data(shared, symbols, rule_type)
+        for chunk, rows in Parallel(n_jobs=cpu, return_as="generator_unordered")(
+            delayed(_run)(chunk) for chunk in chunks
+        ):
+            store.append(rows)
+            completed += len(chunk.para_list)
+            print(f"\rProgress: {completed}/{total_tasks} ({completed/total_tasks*100:.1f}%)", end="", flush=True)
     print()  # 换行，避免进度条和后续输出混在一行
-    
-    # 4. 汇总结果
-    results = [r for r in results if r is not None]
-    if results:
-        res_df = pd.DataFrame(results)
-        
+
+    # 4. 从结果库读取本次结果
+    res_df = store.query(run_id=store.run_id, factor=factor, rule_type=rule_type)
+    if not res_df.empty:
         # Sort by Sharpe Ratio (if available) or Return
-        sort_col = '夏普比率' if '夏普比率' in res_df.columns else '年化收益'
+        sort_col = '夏普比率' if res_df['夏普比率'].notna().any() else '年化收益'
         res_df = res_df.sort_values(by=sort_col, ascending=False)
-        
-        print(f"\nTop 10 Results (sorted by {sort_col}):")
-        print(res_df.head(10))
 
-        timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
+        print(f"\nTop 10 Results (sorted by {sort_col}):")
+        print(res_df[['symbol', 'para', '年化收益', '最大回撤', '年化收益/回撤比', '夏普比率']].head(10).to_string())
+        print(f"\nResults saved to {store.root} (run_id={store.run_id})")
 
-        # 按因子-币种输出结果文件，并设置图标题为 因子-币种
+        # 按因子-币种画参数平原，图标题为 因子-币种
         for sym in sorted(res_df["symbol"].unique()):
-            sub = res_df[res_df["symbol"] == sym]
+            sub = res_df[res_df["symbol"] == sym].copy()
             if sub.empty:
                 continue
             folder_name = f"{factor}--{sym}"
-            sym_output_dir = engine.output_path / folder_name
-            sym_output_dir.mkdir(parents=True, exist_ok=True)
-
-            excel_path = sym_output_dir / f"batch_results_{folder_name}_{timestamp}.xlsx"
-            try:
-                sub.to_excel(excel_path, index=False)
-                print(f"Results saved to {excel_path}")
-            except Exception as e:
-                print(f"Error saving to Excel for {sym}: {e}")
-                csv_path = sym_output_dir / f"batch_results_{folder_name}_{timestamp}.csv"
-                sub.to_csv(csv_path, index=False)
-                print(f"Results saved to {csv_path}")
-
             print(f"\nPlotting parameter surfaces for {folder_name} ...")
             try:
                 plot_param_surfaces_multi(sub)
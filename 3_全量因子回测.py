@@ -6,9 +6,13 @@ from joblib import Parallel, delayed
 from typing import List, Optional
 from pathlib import Path
 import warnings
+import pyarrow.dataset as ds
 
 from cta_api.base import BacktestConfig
 from cta_api.engine import BacktestEngine
+from cta_api.shared_data import SharedMarketData
+from cta_api.scheduler import build_task_chunks, run_chunk, split_finished_tasks, data_versions
+from cta_api.result_store import ResultStore
 import config as global_config
 
 # Add project root to path
@@ -41,46 +45,6 @@ def find_all_factors(root_path: Path) -> List[str]:
     
     return sorted(factor_names)
 
-def run_single_param_set(engine: BacktestConfig, symbol: str, factor_name: str, para: list, rule_type: str, start: str, end: str):
-    """
-    Run a single backtest task.
-    """
-    try:
-        df, metrics = engine.run_backtest(
-            symbol=symbol,
-            factor_name=factor_name,
-            para=para,
-            rule_type=rule_type,
-            start_date=start,
-            end_date=end,
-            show_chart=False
-        )
-        
-        if df is None or df.empty:
-            return None
-        
-        # Basic result info
-        res = {
-            'symbol': symbol,
-            'factor': factor_name,
-            'para': str(para)
-        }
-        
-        # Add metrics if available
-        if metrics is not None:
-            # Add all calculated metrics to the result dictionary
-            for metric in metrics.index:
-                res[metric] = metrics.loc[metric, 0]
-        else:
-            # Fallback if metrics calculation failed
-            res['年化收益'] = 0
-            
-        return res
-        
-    except Exception as e:
-        print(f"Error in {factor_name} {para}: {e}")
-        return None
-
 def main():
     symbol = getattr(global_config, "full_symbol", "BTC-USDT")
     if getattr(global_config, "rule_type_list", None):
@@ -93,6 +57,7 @@ def main():
     cpu = getattr(global_config, "full_cpu", max(1, os.cpu_count() - 1))
     limit = getattr(global_config, "full_limit", 0)
     category = getattr(global_config, "full_category", None)
+    resume = getattr(global_config, "full_resume", True)
     
     print(f"Starting Full Batch Backtest for {symbol}...")
     print(f"Time Range: {start} to {end}")
@@ -103,7 +68,8 @@ def main():
         slippage=global_config.slippage,
         leverage_rate=global_config.leverage_rate,
         min_margin_ratio=global_config.min_margin_ratio,
-        proportion=global_config.proportion
+        proportion=global_config.proportion,
+        data_mmap=getattr(global_config, "data_mmap", False)
     )
     engine = BacktestEngine(cfg)
     
@@ -115,8 +81,9 @@ def main():
         
     print(f"Found {len(all_factors)} factors.")
     
-    # 3. Generate Tasks
-    tasks = []
+    # 3. Generate Tasks: {factor_name: para_list}
+    factor_params = {}
+    total_tasks = 0
     for factor_name in all_factors:
         try:
             module = importlib.import_module(f'factors.{factor_name}')
@@ -140,60 +107,69 @@ def main():
                 # print(f"Skipping {factor_name}: No para_list found or empty.")
                 continue
                 
-            # Add tasks
-            for para in para_list:
-                # Filter out factors with 3 parameters as requested
-                if len(para) == 3:
-                    continue
-                    
-                tasks.append((engine, symbol, factor_name, para, rule_type, start, end))
-                
-                # Check limit
-                if limit > 0 and len(tasks) >= limit:
-                    break
+            # Filter out factors with 3 parameters as requested
+            para_list = [para for para in para_list if len(para) != 3]
+
+            # Check limit
+            if limit > 0:
+                para_list = para_list[:limit - total_tasks]
+            if para_list:
+                factor_params[factor_name] = para_list
+                total_tasks += len(para_list)
             
-            if limit > 0 and len(tasks) >= limit:
+            if limit > 0 and total_tasks >= limit:
                 break
                 
         except Exception as e:
             print(f"Error loading factor {factor_name}: {e}")
             continue
             
-    print(f"Total tasks generated: {len(tasks)}")
+    print(f"Total tasks generated: {total_tasks}")
     
-    if not tasks:
+    if not factor_params:
         print("No tasks to run.")
         return
 
-    # 4. Run Tasks in Parallel
-    print(f"Running backtests on {cpu} cores...")
-    results = Parallel(n_jobs=cpu)(delayed(run_single_param_set)(*task) for task in tasks)
+    # 4. 断点续跑：跳过结果库中已完成的任务 (key 包含因子 / 共用模块源码哈希和行情数据版本，
+    #    以及最小下单量、预热K线数，修改过的因子、更新过的行情会重新回测)
+    store = ResultStore(getattr(global_config, "result_store_path", engine.output_path / "results"))
+    versions = data_versions(engine, [symbol], rule_type)
+    factor_params, task_keys = split_finished_tasks(
+        [symbol], factor_params, rule_type, start, end, cfg,
+        store.finished_keys(factor=list(factor_params), symbol=symbol, rule_type=rule_type) if resume else set(),
+        versions, engine.min_amount_dict)
+    todo_tasks = sum(len(p) for p in factor_params.values())
+    if todo_tasks < total_tasks:
+        print(f"Skipping {total_tasks - todo_tasks} finished tasks, {todo_tasks} left.")
+
+    # 5. Run Tasks in Parallel, one chunk = one (symbol, factor) parameter slice
+    chunks = build_task_chunks([symbol], factor_params, rule_type, start, end, n_jobs=cpu, data_versions=versions,
+                               min_amounts=engine.min_amount_dict)
+    print(f"Running {len(chunks)} task chunks on {cpu} cores...")
+    # 行情只读取一次并发布到共享内存，各 worker 零拷贝挂载；每完成一块就立即写入结果库 (一块一个文件)，
+    # 进程被强制结束 (OOM / SIGKILL) 时也只损失正在执行的块，重跑时自动跳过已完成的任务；
+    # 全部完成后把本次运行的小文件按分区合并，避免结果库中堆积大量小文件
+    if chunks:
+        with SharedMarketData() as shared, store:
+            engine.share_data(shared, [symbol], rule_type)
+            for rows in Parallel(n_jobs=cpu, return_as="generator_unordered")(
+                    delayed(run_chunk)(engine, chunk) for chunk in chunks):
+                store.append(rows)
+                store.flush()
+        store.compact()
     
-    # 5. Process Results
-    results = [r for r in results if r is not None]
+    # 6. Process Results (包括之前已完成的任务)
+    columns = ['factor', 'para', '年化收益', '夏普比率', '最大回撤']
+    df_res = store.query(columns=columns + ['task_key'], filter=ds.field('task_key').isin(task_keys),
+                         symbol=symbol, rule_type=rule_type)
+    df_res = df_res.drop_duplicates('task_key', keep='last').sort_values(by='年化收益', ascending=False)
     
-    if results:
-        df_res = pd.DataFrame(results)
-        
-        # Sort by Annual Return
-        if '年化收益' in df_res.columns:
-            df_res = df_res.sort_values(by='年化收益', ascending=False)
-        
-        # Output paths
-        csv_path = engine.output_path / f'full_backtest_{symbol}_{rule_type}.csv'
-        xlsx_path = engine.output_path / f'full_backtest_{symbol}_{rule_type}.xlsx'
-        
-        # Save
-        df_res.to_csv(csv_path, index=False, encoding='utf-8-sig')
-        try:
-            df_res.to_excel(xlsx_path, index=False)
-            print(f"\nResults saved to:\n- {csv_path}\n- {xlsx_path}")
-        except ImportError:
-            print(f"\nResults saved to {csv_path} (install openpyxl for Excel support)")
+    if not df_res.empty:
+        print(f"\nResults saved to {store.root} (run_id={store.run_id})")
         
         # Print Top 10
         print("\nTop 10 Factors by Annual Return:")
-        print(df_res[['factor', 'para', '年化收益', '夏普比率', '最大回撤']].head(10).to_string())
+        print(df_res[columns].head(10).to_string())
         
     else:
         print("No valid results returned.")
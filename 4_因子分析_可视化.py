@@ -18,6 +18,7 @@ from cta_api.engine import BacktestEngine
 from cta_api.base import BacktestConfig
 import config as global_config
 from cta_api.factor_scanner import scan_factors
+from cta_api.result_store import ResultStore
 
 st.set_page_config(page_title="CTA Parameter Plain Viewer", layout="wide")
 
@@ -61,6 +62,58 @@ for i in range(factor_data['param_count']):
     p_range = list(range(int(p_start), int(p_end) + 1, int(p_step)))
     params_config.append(p_range)
 
+def show_results(df_res):
+    """
+    展示参数平原：结果表 + 单参数折线 / 双参数热力图，df_res 需包含 p1, p2, ... 及 sharpe / return / max_dd / calmar
+    指标均为数值 (收益、回撤为小数)，只在结果表中格式化显示
+    """
+    st.subheader("分析结果")
+    st.dataframe(df_res.style.format({'return': '{:.2%}', 'max_dd': '{:.2%}', 'sharpe': '{:.2f}', 'calmar': '{:.2f}'},
+                                     na_rep='-'))
+    
+    # Visualization
+    metric_to_plot = st.selectbox("选择指标", ['sharpe', 'return', 'max_dd', 'calmar'])
+    
+    if factor_data['param_count'] == 1:
+        # Line Chart
+        fig = px.line(df_res, x='p1', y=metric_to_plot, markers=True, 
+                      title=f"单参数敏感性分析: {metric_to_plot}")
+        st.plotly_chart(fig, use_container_width=True)
+        
+    elif factor_data['param_count'] == 2:
+        # Heatmap
+        # Pivot data
+        pivot_df = df_res.pivot(index='p2', columns='p1', values=metric_to_plot)
+        
+        fig = go.Figure(data=go.Heatmap(
+            z=pivot_df.values,
+            x=pivot_df.columns,
+            y=pivot_df.index,
+            colorscale='Viridis',
+            colorbar=dict(title=metric_to_plot)
+        ))
+        fig.update_layout(
+            title=f"双参数热力图: {metric_to_plot}",
+            xaxis_title="Parameter 1",
+            yaxis_title="Parameter 2"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        
+    else:
+        st.info("3个或更多参数的可视化暂只支持前两个参数的热力图 (固定其他参数) 或查看原始数据表格。")
+        if 'p2' in df_res.columns:
+             # Attempt to plot p1 vs p2 and average the metric if multiple values exist
+            pivot_df = df_res.groupby(['p1', 'p2'])[metric_to_plot].mean().unstack()
+            fig = go.Figure(data=go.Heatmap(
+                z=pivot_df.values,
+                x=pivot_df.columns,
+                y=pivot_df.index,
+                colorscale='Viridis'
+            ))
+            fig.update_layout(title=f"前两个参数热力图 (聚合): {metric_to_plot}")
+            st.plotly_chart(fig, use_container_width=True)
+
+
 # Run Button
 if st.button("开始分析 (Run Analysis)"):
     if factor_data['param_count'] == 0:
@@ -92,90 +145,58 @@ if st.button("开始分析 (Run Analysis)"):
         start_time_str = start_date.strftime("%Y-%m-%d")
         end_time_str = end_date.strftime("%Y-%m-%d")
 
-        for idx, param_set in enumerate(combinations):
-            try:
-                # Run backtest
-                # Convert tuple to list for the engine
-                para_list = list(param_set)
-                
-                df, metrics = engine.run_backtest(
+        # 每批参数只读取一次数据、一次算出全部资金曲线，评价指标为数值，分批以便更新进度条
+        batch_size = 50
+        for idx in range(0, total_runs, batch_size):
+            batch = [list(param_set) for param_set in combinations[idx:idx + batch_size]]
+            for para_list, df, metrics in engine.run_backtest_batch(
                     symbol=selected_symbol,
                     factor_name=factor_data['import_path'],
-                    para=para_list,
+                    para_list=batch,
                     rule_type=rule_type,
                     start_date=start_time_str,
                     end_date=end_time_str,
-                    show_chart=False
-                )
-                
-                if metrics is not None:
-                    res = {
-                        'para': str(para_list),
-                        'return': metrics.loc['年化收益', 0],
-                        'sharpe': metrics.loc['夏普比率', 0],
-                        'max_dd': metrics.loc['最大回撤', 0],
-                        'calmar': metrics.loc['年化收益/回撤比', 0]
-                    }
-                    # Add individual params for plotting
-                    for p_i, p_val in enumerate(para_list):
-                        res[f'p{p_i+1}'] = p_val
-                        
-                    results.append(res)
-            except Exception as e:
-                print(f"Error: {e}")
-            
-            progress_bar.progress((idx + 1) / total_runs)
-            
+                    save_results=False):
+                res = {
+                    'para': str(para_list),
+                    'return': metrics['年化收益'],
+                    'sharpe': metrics['夏普比率'],
+                    'max_dd': metrics['最大回撤'],
+                    'calmar': metrics['年化收益/回撤比']
+                }
+                # Add individual params for plotting
+                for p_i, p_val in enumerate(para_list):
+                    res[f'p{p_i+1}'] = p_val
+
+                results.append(res)
+
+            progress_bar.progress(min(idx + batch_size, total_runs) / total_runs)
+
         progress_bar.empty()
         
         if not results:
             st.error("没有生成结果。请检查数据或参数。")
         else:
-            df_res = pd.DataFrame(results)
             st.success("分析完成！")
-            
-            st.subheader("分析结果")
-            st.dataframe(df_res)
-            
-            # Visualization
-            metric_to_plot = st.selectbox("选择指标", ['sharpe', 'return', 'max_dd', 'calmar'])
-            
-            if factor_data['param_count'] == 1:
-                # Line Chart
-                fig = px.line(df_res, x='p1', y=metric_to_plot, markers=True, 
-                              title=f"单参数敏感性分析: {metric_to_plot}")
-                st.plotly_chart(fig, use_container_width=True)
-                
-            elif factor_data['param_count'] == 2:
-                # Heatmap
-                # Pivot data
-                pivot_df = df_res.pivot(index='p2', columns='p1', values=metric_to_plot)
-                
-                fig = go.Figure(data=go.Heatmap(
-                    z=pivot_df.values,
-                    x=pivot_df.columns,
-                    y=pivot_df.index,
-                    colorscale='Viridis',
-                    colorbar=dict(title=metric_to_plot)
-                ))
-                fig.update_layout(
-                    title=f"双参数热力图: {metric_to_plot}",
-                    xaxis_title="Parameter 1",
-                    yaxis_title="Parameter 2"
-                )
-                st.plotly_chart(fig, use_container_width=True)
-                
-            else:
-                st.info("3个或更多参数的可视化暂只支持前两个参数的热力图 (固定其他参数) 或查看原始数据表格。")
-                if 'p2' in df_res.columns:
-                     # Attempt to plot p1 vs p2 and average the metric if multiple values exist
-                    pivot_df = df_res.groupby(['p1', 'p2'])[metric_to_plot].mean().unstack()
-                    fig = go.Figure(data=go.Heatmap(
-                        z=pivot_df.values,
-                        x=pivot_df.columns,
-                        y=pivot_df.index,
-                        colorscale='Viridis'
-                    ))
-                    fig.update_layout(title=f"前两个参数热力图 (聚合): {metric_to_plot}")
-                    st.plotly_chart(fig, use_container_width=True)
+            show_results(pd.DataFrame(results))
+
 
+# 从结果库读取 2_/3_ 的扫描结果，不必重新回测
+st.sidebar.subheader("结果库")
+if st.sidebar.button("从结果库加载 (Load from Result Store)"):
+    store = ResultStore(getattr(global_config, "result_store_path", os.path.join(current_dir, "data/results")))
+    # 同一参数多次运行时取均值，只读取需要的列
+    df_res = store.aggregate(
+        ['para'],
+        {'年化收益': 'mean', '夏普比率': 'mean', '最大回撤': 'mean', '年化收益/回撤比': 'mean'},
+        factor=factor_data['import_path'], symbol=selected_symbol, rule_type=rule_type,
+    )
+    if df_res.empty:
+        st.error("结果库中没有该因子 / 交易对 / 周期的结果，请先运行 2_批量回测 或 3_全量因子回测。")
+    else:
+        df_res = df_res.rename(columns={'年化收益_mean': 'return', '夏普比率_mean': 'sharpe',
+                                        '最大回撤_mean': 'max_dd', '年化收益/回撤比_mean': 'calmar'})
+        for p_i, p_vals in enumerate(zip(*df_res['para'].apply(json.loads))):
+            df_res[f'p{p_i+1}'] = p_vals
+        st.success(f"从结果库读取 {len(df_res)} 组参数")
+        show_results(df_res)
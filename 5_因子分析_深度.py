@@ -43,33 +43,33 @@ def run_multi_factor_analysis(factor_path='momentum.macd', symbol='BTC-USDT'):
     start_date = getattr(global_config, "multi_factor_start", "2023-01-01")
     end_date = getattr(global_config, "multi_factor_end", "2024-01-01")
     
-    for i, para in enumerate(combinations):
-        if i % 10 == 0:
-            print(f"Progress: {i}/{len(combinations)}")
-            
-        try:
-            df, metrics = engine.run_backtest(
-                symbol=symbol,
-                factor_name=factor_path,
-                para=list(para),
-                rule_type='1H',
-                start_date=start_date,
-                end_date=end_date,
-                show_chart=False
-            )
-            
-            if metrics is not None:
-                res = {
-                    'fast': para[0],
-                    'slow': para[1],
-                    'signal': para[2],
-                    'sharpe': metrics.loc['夏普比率', 0],
-                    'return': metrics.loc['年化收益', 0]
-                }
-                results.append(res)
-        except Exception as e:
-            print(f"Error: {e}")
-            
+    cfg = BacktestConfig(
+        c_rate=global_config.c_rate,
+        slippage=global_config.slippage,
+        leverage_rate=global_config.leverage_rate,
+        min_margin_ratio=global_config.min_margin_ratio,
+        proportion=global_config.proportion
+    )
+    engine = BacktestEngine(cfg)
+
+    # 2. 批量回测：数据只读取一次，评价指标为数值
+    results = []
+    for para, df, metrics in engine.run_backtest_batch(
+            symbol=symbol,
+            factor_name=factor_path,
+            para_list=[list(c) for c in combinations],
+            rule_type='1H',
+            start_date=start_date,
+            end_date=end_date,
+            save_results=False):
+        results.append({
+            'fast': para[0],
+            'slow': para[1],
+            'signal': para[2],
+            'sharpe': metrics['夏普比率'],
+            'return': metrics['年化收益']
+        })
+
     df_res = pd.DataFrame(results)
     if df_res.empty:
         print("No results.")
@@ -9,6 +9,13 @@ data_path = os.path.join(root_path, 'data/pickle_data')
 if os.path.exists(data_path) == False:
     os.makedirs(data_path)
 
+# 分区行情存储目录（Parquet，按 周期/币种/月份 分区，由 0_1_数据转换.py 写入）
+market_store_path = os.path.join(root_path, 'data/market_store')
+
+# 分区存储是否使用紧凑格式：价格保持 float64，成交量类列 float32、成交笔数 int32、时间 int64 纳秒，
+# 常量 offset 和逐根 kline_pct 不落盘 (读取时补全)；成交量类列有 float32 精度损失
+market_store_compact = False
+
 # ------------------------------
 # 回测基础配置（适用于 1/2/3/5 等脚本的默认行为）
 # ------------------------------
@@ -57,8 +64,28 @@ leverage_rate = 1
 min_margin_ratio = 1 / 100
 
 # 是否按时间分区间遍历：y=按年，m=按月，w=按周，a=全部遍历
+# 2_1_滚动优化回测.py 按此划分滚动区间 (需为 y / m / w)
 per_eva = 'a'
 
+# 滚动优化：样本内周期数 (以 per_eva 为单位)，在样本内遍历参数选优
+wf_train_periods = 6
+
+# 滚动优化：样本外周期数，用样本内最优参数回测，之后整体向后滚动这么多个周期
+wf_test_periods = 1
+
+# 滚动优化：样本内选优指标 (越大越好)
+wf_metric = '年化收益/回撤比'
+
+# 滚动优化：并行计算的区间数
+wf_cpu = max(1, os.cpu_count() - 1)
+
+# 参数扫描结果库目录（2_/3_ 的结果按 factor/symbol/rule_type 分区写成 parquet，可跨批次查询）
+result_store_path = os.path.join(root_path, 'data/results')
+
+# 内存映射读取行情（分区存储生成的 Arrow IPC 快照，2_/3_ 的并行 worker 共享系统页缓存，不再各自复制一份行情）
+# 开启后行情原始列只读，因子对原始列做 inplace 修改会报错
+data_mmap = False
+
 # 删除模式（老版本批量回测使用，控制是否清理旧文件）
 del_mode = True
 
@@ -93,8 +120,48 @@ data_fetch_workers = 1
 # 串行模式下，不同合约之间的停顿时间（秒）
 data_fetch_symbol_delay = 0.2
 
+# 异步下载（aiohttp，一个连接池 + 共享请求权重预算，全部合约的各页并发下载，优先于 data_fetch_workers）
+data_fetch_async = False
+
+# 异步下载的同时请求数（连接池大小）
+data_fetch_async_concurrency = 16
+
+# 每分钟请求权重上限（币安 U 本位合约为 2400，多个程序共用一个 IP 时调低）
+data_fetch_weight_limit = 2400
+
+# 追加模式：按分区存储中每个合约的高水位线增量下载，新K线追加为所在月份的新文件，不读写 CSV、不重写已有数据
+data_fetch_append = False
+
+# 缺口补数的最多尝试次数（缺口记录在缺口索引中，只下载缺失的区间；交易所本身没有数据的区间达到次数后不再请求）
+data_fetch_gap_max_attempts = 3
+
+# 从 Binance Vision 下载历史压缩包（已结束的月份用月度包，当月按天），校验后直接写入分区存储，不生成 CSV
+data_fetch_vision = False
+
+# Vision 压缩包本地缓存目录（已下载并校验过的文件不再重复下载）
+vision_cache_path = os.path.join(root_path, 'data/vision_cache')
+
+# Vision 并行下载的线程数
+vision_workers = 8
+
+# ------------------------------
+# cta_api/oi_collector.py 相关配置（持仓量/资金费率采集服务）
+# ------------------------------
+
+# 采集结果的分区存储目录（与行情存储分开），健康文件默认为其中的 _health.json
+oi_store_path = os.path.join(root_path, 'data/oi_store')
+
+# 同时进行的请求数
+oi_collector_concurrency = 32
+
+# 每隔多少个周期把内存中的样本批量写入存储（退出时也会写入）
+oi_collector_flush_every = 6
+
+# 健康文件路径（None 表示 oi_store_path/_health.json）
+oi_collector_health_path = None
+
 # ------------------------------
-# 0_1_数据转换.py 相关配置（CSV→Feather 转换）
+# 0_1_数据转换.py 相关配置（CSV→分区 Parquet 转换）
 # ------------------------------
 
 # 单合约转换：如 "BTCUSDT" 或 "BTC-USDT"；None 表示批量转换整个目录
@@ -106,9 +173,12 @@ data_convert_interval = "1h"
 # 批量转换并发数
 data_convert_workers = 4
 
-# 是否跳过已存在的 pkl/feather 文件（True=跳过，False=强制重建）
+# 是否跳过分区存储中已存在的币种（True=跳过，False=强制重建）
 data_convert_skip_existing = True
 
+# 是否改为把 data/pickle_data 下旧的 feather (.pkl) 文件迁移到分区存储（不读取 CSV）
+data_convert_migrate_pickle = False
+
 # ------------------------------
 # 1_单个回测.py 相关配置（单策略可视化调试）
 # ------------------------------
@@ -129,6 +199,29 @@ single_end = "2026-01-01"
 # 单次回测使用的周期（通常与 rule_type_list 对应）
 single_rule_type = "1H"
 
+# 是否一次回测该周期的全部 offset（如 4H 的 4 个起点），输出各 offset 与合成资金曲线的指标
+single_all_offsets = False
+
+# ------------------------------
+# 1_1_增量回测.py 相关配置（策略组合的增量更新）
+# ------------------------------
+
+# 需要每日增量更新的策略组合：[币种, 因子路径, 参数]
+stream_book = [
+    ['BTC-USDT', 'sma', [200]],
+    ['ETH-USDT', 'trend.ema_cross', [12, 26]],
+]
+
+# 增量回测的周期与资金曲线起点（修改后会自动全量重建）
+stream_rule_type = "1H"
+stream_start = date_start
+
+# 因子预热窗口（K线数），每次只在 预热窗口+新K线 上重算因子，需覆盖因子最长回看周期
+stream_warmup_bars = 2000
+
+# 增量回测检查点目录
+stream_state_path = os.path.join(root_path, 'data/stream_state')
+
 # ------------------------------
 # 2_批量回测.py 相关配置（单因子多参数、多币种扫描）
 # ------------------------------
@@ -162,6 +255,9 @@ full_limit = 0
 # 因子类别过滤，例如 "trend" 只跑趋势类因子，None 表示不过滤
 full_category = None
 
+# 断点续跑：跳过结果库中已完成的任务（因子、参数、区间、成本配置及因子源码都相同才算已完成）
+full_resume = True
+
 # ------------------------------
 # 5_因子分析_深度.py 相关配置（多维参数 + PCA 分析）
 # ------------------------------
@@ -0,0 +1,236 @@
+"""
+异步K线下载 (asyncio + aiohttp)
+全部请求共用一个连接池和一个请求权重令牌桶：桶的余量以币安返回的 X-MBX-USED-WEIGHT-1M 为准，
+收到 429 / 418 时按 Retry-After 整体暂停。K线按 limit 根一页切成固定的时间窗口，
+所有 (币种, 时间窗口) 并发请求，不再逐页串行等待
+base_url 可指向本地的模拟服务器，便于离线测试
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+import pandas as pd
+
+from cta_api.binance_fetcher import BASE, HEADERS, _to_ms, _ts, klines_to_frame, funding_to_frame, merge_extras
+
+# 币安 U 本位合约每个 IP 每分钟的请求权重上限
+WEIGHT_LIMIT_1M = 2400
+
+# 每页K线数：/fapi/v1/klines 的权重按 limit 分档 (<100: 1, <500: 2, <=1000: 5, >1000: 10)，
+# 499 根一页每单位权重拿到的K线最多
+KLINE_LIMIT = 499
+
+FUNDING_LIMIT = 1000
+
+
+def kline_weight(limit: int) -> int:
+    """/fapi/v1/klines 单次请求的权重"""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class WeightBudget:
+    """
+    请求权重令牌桶：容量为每分钟权重上限 × safety，按容量 / 60 每秒匀速补充
+    每次响应后用服务器统计的已用权重校正余量，多个客户端共用同一 IP 时也不会超限
+    """
+
+    def __init__(self, limit_1m: int = WEIGHT_LIMIT_1M, safety: float = 0.9):
+        self.capacity = limit_1m * safety
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _loop_lock(self) -> asyncio.Lock:
+        """
+        当前事件循环的锁：asyncio.Lock 发生等待后会绑定到所在的事件循环，
+        AsyncKlineFetcher.run 每次调用都新建事件循环，换了事件循环就重新创建 (余量和暂停时间照常保留)
+        """
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    async def acquire(self, weight: float) -> None:
+        """等待直到余量足够，先到先得"""
+        async with self._loop_lock():
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self.tokens >= weight:
+                        self.tokens -= weight
+                        return
+                    wait = (weight - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+
+    def update(self, used_weight: Optional[float]) -> None:
+        """用响应头中的 1 分钟已用权重校正余量"""
+        if used_weight is None:
+            return
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, self.capacity - used_weight)
+
+    def pause(self, seconds: float) -> None:
+        """被限流 (429 / 418) 后在 seconds 秒内不再发出请求"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+
+@dataclass
+class FetchStats:
+    """下载统计"""
+    requests: int = 0
+    weight: float = 0
+    retries: int = 0
+    throttled: int = 0
+    errors: Dict[Tuple[str, str, str, str], str] = field(default_factory=dict)  # 出错的任务 -> 错误信息
+
+
+class AsyncKlineFetcher:
+    """
+    并发下载多个 (币种, 时间范围) 的K线 (以及资金费率)
+    用法：
+        fetcher = AsyncKlineFetcher(concurrency=16)
+        frames = fetcher.run([('BTCUSDT', '1h', '2020-01-01', '2024-01-01'), ...])
+    """
+
+    def __init__(self, base_url: str = BASE, concurrency: int = 16, limit: int = KLINE_LIMIT,
+                 weight_limit_1m: int = WEIGHT_LIMIT_1M, max_retries: int = 5, timeout: float = 30,
+                 with_funding: bool = True):
+        """
+        :param base_url: 接口地址，测试时指向本地模拟服务器
+        :param concurrency: 同时进行的请求数 (即连接池大小)
+        :param limit: 每页K线数
+        :param weight_limit_1m: 每分钟请求权重上限
+        :param max_retries: 网络错误、5xx、限流的最大重试次数
+        :param with_funding: 是否同时下载资金费率并按时间合并 (与 binance_fetcher.collect 的输出列一致)
+        """
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.limit = limit
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.with_funding = with_funding
+        self.budget = WeightBudget(weight_limit_1m)
+        self.stats = FetchStats()
+
+    # ===== 请求 =====
+    def session(self) -> aiohttp.ClientSession:
+        """连接池大小为 concurrency 的会话 (其他采集任务也可以用它和 get 共享权重预算)"""
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                     headers=HEADERS)
+
+    async def get(self, session: aiohttp.ClientSession, path: str, params: dict, weight: float):
+        """带权重预算和重试的 GET，返回解析后的 JSON"""
+        params = {k: str(v) for k, v in params.items()}
+        for attempt in range(self.max_retries + 1):
+            await self.budget.acquire(weight)
+            self.stats.requests += 1
+            self.stats.weight += weight
+            try:
+                async with session.get(self.base_url + path, params=params) as r:
+                    used = r.headers.get('X-MBX-USED-WEIGHT-1M')
+                    self.budget.update(float(used) if used else None)
+                    if r.status in (418, 429):
+                        # 被限流：按服务器要求整体暂停，所有请求一起等待
+                        self.stats.throttled += 1
+                        self.budget.pause(float(r.headers.get('Retry-After', 60)))
+                        continue
+                    if r.status < 500:
+                        r.raise_for_status()
+                        return await r.json(content_type=None)
+                    error = f"HTTP {r.status}"
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = repr(e)
+            if attempt >= self.max_retries:
+                raise RuntimeError(f"GET {path} {params} failed after {attempt + 1} attempts: {error}")
+            self.stats.retries += 1
+            await asyncio.sleep(min(2 ** attempt, 30))
+        raise RuntimeError(f"GET {path} {params} still throttled after {self.max_retries + 1} attempts")
+
+    def windows(self, interval: str, start, end) -> List[Tuple[int, int]]:
+        """把 [start, end] 切成每页 limit 根K线的时间窗口 (毫秒，两端都包含)"""
+        st, et = _ts(start), _ts(end)
+        span = self.limit * _to_ms(interval)
+        return [(w, min(w + span - 1, et)) for w in range(st, et + 1, span)] if st <= et else []
+
+    async def _klines(self, session, symbol: str, interval: str, start, end) -> pd.DataFrame:
+        sym = symbol.replace("-", "")
+        weight = kline_weight(self.limit)
+        pages = await asyncio.gather(*[
+            self.get(session, "/fapi/v1/klines",
+                      {"symbol": sym, "interval": interval, "startTime": w0, "endTime": w1, "limit": self.limit},
+                      weight)
+            for w0, w1 in self.windows(interval, start, end)])
+        rows = [row for page in pages for row in page]
+        df = klines_to_frame(rows)
+        if df.empty:
+            return df
+        return df.drop_duplicates("candle_begin_time").sort_values("candle_begin_time").reset_index(drop=True)
+
+    async def _funding(self, session, symbol: str, start, end) -> pd.DataFrame:
+        """资金费率按时间顺序翻页 (每页 1000 条，通常一页即可覆盖一年)"""
+        sym = symbol.replace("-", "")
+        cur, et = _ts(start), _ts(end)
+        rows = []
+        while cur < et:
+            data = await self.get(session, "/fapi/v1/fundingRate",
+                                   {"symbol": sym, "limit": FUNDING_LIMIT, "startTime": cur, "endTime": et}, 1)
+            if not data:
+                break
+            rows.extend(data)
+            nxt = int(data[-1]["fundingTime"])
+            if nxt <= cur or len(data) < FUNDING_LIMIT:
+                break
+            cur = nxt + 1
+        return funding_to_frame(rows)
+
+    async def _one(self, session, symbol: str, interval: str, start, end) -> pd.DataFrame:
+        k = await self._klines(session, symbol, interval, start, end)
+        if k.empty or not self.with_funding:
+            return k
+        try:
+            fr = await self._funding(session, symbol, start, end)
+        except Exception:
+            fr = pd.DataFrame()
+        return merge_extras(k, pd.DataFrame(), fr)
+
+    async def fetch_many(self, jobs: List[Tuple[str, str, str, str]]) -> List[pd.DataFrame]:
+        """
+        并发下载多个任务
+        :param jobs: [(symbol, interval, start, end), ...]
+        :return: 与 jobs 对应的 DataFrame 列表，出错的任务返回空表，错误信息记录在 stats.errors[job]
+        """
+        async with self.session() as session:
+            results = await asyncio.gather(*[self._one(session, *job) for job in jobs], return_exceptions=True)
+        out = []
+        for job, res in zip(jobs, results):
+            if isinstance(res, BaseException):
+                self.stats.errors[tuple(job)] = repr(res)
+                res = pd.DataFrame()
+            out.append(res)
+        return out
+
+    def run(self, jobs: List[Tuple[str, str, str, str]]) -> List[pd.DataFrame]:
+        """fetch_many 的同步入口"""
+        return asyncio.run(self.fetch_many(jobs))
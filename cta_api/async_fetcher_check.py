@@ -0,0 +1,116 @@
+"""
+AsyncKlineFetcher 离线自检
+在本地起一个模拟币安 /fapi/v1/klines 的 aiohttp 服务器，用 AsyncKlineFetcher(base_url=...) 下载，检查：
+- 每个任务拿到的K线根数、首尾时间与上市时间、时间范围一致且逐根连续
+- 429 时按 Retry-After 调用 budget.pause 并重发，不计入 retries
+- 5xx 按退避重试后成功，4xx 不重试、按任务记录在 stats.errors 并返回空表
+- 同一个 fetcher 第二次 run() (新的事件循环) 在预算耗尽需要排队时仍能正常下载
+用法：python -m cta_api.async_fetcher_check
+"""
+import asyncio
+
+import pandas as pd
+from aiohttp import web
+
+from cta_api.async_fetcher import AsyncKlineFetcher
+
+STEP = 3600 * 1000  # 1h 的毫秒数
+
+# 模拟的上市时间 (毫秒)，不在表中的币种返回 400
+LISTING = {
+    'BTCUSDT': pd.Timestamp('2019-09-08').value // 10 ** 6,
+    'ETHUSDT': pd.Timestamp('2021-06-01').value // 10 ** 6,
+}
+
+# 第几个请求返回 429 / 502 (按服务器收到的顺序，从 1 开始)
+THROTTLE_AT = (2, 3)
+SERVER_ERROR_AT = (5,)
+RETRY_AFTER = 1
+
+
+class StubServer:
+    """模拟 /fapi/v1/klines：按上市时间和 [startTime, endTime] 返回至多 limit 根K线"""
+
+    def __init__(self):
+        self.received = 0
+        self.runner: web.AppRunner = None
+        self.base_url = ''
+
+    async def klines(self, request: web.Request) -> web.Response:
+        self.received += 1
+        if self.received in THROTTLE_AT:
+            return web.json_response({'code': -1003, 'msg': 'Too many requests'}, status=429,
+                                     headers={'Retry-After': str(RETRY_AFTER)})
+        if self.received in SERVER_ERROR_AT:
+            return web.Response(status=502)
+        q = request.query
+        listing = LISTING.get(q['symbol'])
+        if listing is None:
+            return web.json_response({'code': -1121, 'msg': 'Invalid symbol.'}, status=400)
+        st, et, limit = int(q['startTime']), int(q['endTime']), int(q['limit'])
+        first = listing + max(0, -(-(st - listing) // STEP)) * STEP
+        rows = [[t, '100', '101', '99', '100.5', '10', t + STEP - 1, '1000', 7, '4', '400', '0']
+                for t in range(first, et + 1, STEP)][:limit]
+        return web.json_response(rows, headers={'X-MBX-USED-WEIGHT-1M': str(self.received * 2)})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get('/fapi/v1/klines', self.klines)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', 0).start()
+        host, port = self.runner.addresses[0][:2]
+        self.base_url = f'http://{host}:{port}'
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+
+async def check() -> None:
+    server = StubServer()
+    await server.start()
+    try:
+        fetcher = AsyncKlineFetcher(base_url=server.base_url, concurrency=4, with_funding=False)
+        pauses = []
+        pause = fetcher.budget.pause
+        fetcher.budget.pause = lambda seconds: (pauses.append(seconds), pause(seconds))
+        jobs = [
+            ('BTC-USDT', '1h', '2020-01-01', '2020-03-31 23:00:00'),  # 上市前开始：全部 91 天
+            ('ETHUSDT', '1h', '2021-05-01', '2021-06-30 23:00:00'),   # 范围内上市：只有 6 月的 30 天
+            ('XXXUSDT', '1h', '2021-01-01', '2021-01-01 23:00:00'),   # 不存在的币种
+        ]
+        # run() 每次新建事件循环，放到线程中执行，模拟服务器留在当前事件循环
+        btc, eth, bad = await asyncio.to_thread(fetcher.run, jobs)
+        # 第二次 run()：先暂停预算，让全部请求在锁上排队
+        pause(0.5)
+        again, = await asyncio.to_thread(fetcher.run, jobs[:1])
+    finally:
+        await server.stop()
+
+    stats = fetcher.stats
+    for df, rows, first, last in [(btc, 91 * 24, '2020-01-01', '2020-03-31 23:00:00'),
+                                  (eth, 30 * 24, '2021-06-01', '2021-06-30 23:00:00')]:
+        assert len(df) == rows, f"expected {rows} rows, got {len(df)}"
+        assert df['candle_begin_time'].iloc[0] == pd.Timestamp(first), df['candle_begin_time'].iloc[0]
+        assert df['candle_begin_time'].iloc[-1] == pd.Timestamp(last), df['candle_begin_time'].iloc[-1]
+        assert df['candle_begin_time'].diff().dropna().eq(pd.Timedelta(hours=1)).all(), "klines not contiguous"
+    assert len(again) == len(btc), f"second run: expected {len(btc)} rows, got {len(again)}"
+    assert bad.empty and list(stats.errors) == [jobs[2]], stats.errors
+    assert 'ClientResponseError' in stats.errors[jobs[2]], stats.errors
+    assert stats.throttled == len(THROTTLE_AT), stats
+    assert pauses == [float(RETRY_AFTER)] * len(THROTTLE_AT), pauses
+    assert stats.retries == len(SERVER_ERROR_AT), stats
+    # 每页 499 根：BTC 5 页 + ETH 3 页 + 错误币种 1 次，外加被限流和 5xx 的重发，第二次 run() BTC 5 页
+    pages = 5 + 3 + 1 + 5
+    assert stats.requests == server.received == pages + len(THROTTLE_AT) + len(SERVER_ERROR_AT), \
+        (stats.requests, server.received)
+    print(f"async fetcher check ok: rows={len(btc)}/{len(eth)}, requests={stats.requests}, "
+          f"throttled={stats.throttled}, retries={stats.retries}, errors={[job[0] for job in stats.errors]}")
+
+
+def main():
+    asyncio.run(check())
+
+
+if __name__ == "__main__":
+    main()
@@ -16,9 +16,20 @@ class BacktestConfig:
     
     # 策略参数
     proportion: float = 1.0 # 止盈止损比例
+
+    # 行情数据缓存预算 (MB)，同一进程内多次回测共享，0 表示不缓存
+    data_cache_mb: float = 1024
+    # 指标缓存预算 (MB)，同一币种的各组参数、各因子共享 MA / EMA / ATR 等中间指标，0 表示不缓存
+    indicator_cache_mb: float = 256
+    # 回测只读取开始时间前多少根K线 (指标预热) 及之后的行情，None 表示读取全部历史
+    data_warmup_bars: Optional[int] = None
+    # 内存映射读取分区存储生成的 Arrow IPC 快照：原始列零拷贝且只读 (与 share_data 相同)，
+    # 同一主机上的并行进程共享系统页缓存，不再各自复制一份行情
+    data_mmap: bool = False
     
     # 路径配置 (可选，可以在Engine中指定默认值)
     data_path: Optional[str] = None
+    market_store_path: Optional[str] = None
     output_path: Optional[str] = None
 
 class BaseFactor(ABC):
@@ -26,6 +37,8 @@ class BaseFactor(ABC):
     因子策略基类
     所有新的因子都应该继承此类
     """
+    # (可选) 因子用到的行情列，如 ['close']；声明后批量回测只读取这些列 (及引擎所需的 OHLC)，None 表示全部列
+    columns: Optional[List[str]] = None
     
     @abstractmethod
     def signal(self, df: pd.DataFrame, para: list, proportion: float, leverage_rate: float) -> pd.DataFrame:
@@ -46,3 +59,8 @@ class BaseFactor(ABC):
         :return: [[p1, p2], [p3, p4]]
         """
         pass
+
+    # (可选) 一次计算多组参数信号的方法 signal_batch(self, arrays, para_list)，可向量化的因子实现后，批量回测不再逐个参数调用 signal
+    # arrays 为行情各数值列的 float64 数组 (如 arrays['close'])，返回 (K线数 × 参数组数) 的 signal 矩阵，
+    # 每列与 signal() 止盈止损前的 signal 列一致 (已合并多空、去除重复信号)，止盈止损由引擎统一处理；None 表示未实现
+    signal_batch = None
@@ -61,6 +61,9 @@ def fetch_klines(symbol: str, interval: str, start: str, end: str, limit: int =
         last = data[-1][0]
         st = last + step
         time.sleep(API_SLEEP)
+    return klines_to_frame(rows)
+
+def klines_to_frame(rows: list) -> pd.DataFrame:
     if not rows:
         return pd.DataFrame()
     arr = np.array(rows, dtype=object)
@@ -185,6 +188,9 @@ def fetch_funding_rate(symbol: str, start: str, end: str, limit: int = 1000) ->
             break
         cur = nxt + 1
         time.sleep(API_SLEEP)
+    return funding_to_frame(rows)
+
+def funding_to_frame(rows: list) -> pd.DataFrame:
     if not rows:
         return pd.DataFrame()
     df = pd.DataFrame(rows)
@@ -230,6 +236,9 @@ def collect(symbol: str, interval: str, start: str, end: str) -> pd.DataFrame:
             fr = vision_fetch_funding(symbol, start, end)
         except Exception:
             fr = pd.DataFrame()
+    return merge_extras(k, oi, fr)
+
+def merge_extras(k: pd.DataFrame, oi: pd.DataFrame, fr: pd.DataFrame) -> pd.DataFrame:
     df = k.copy()
     if not oi.empty:
         df = pd.merge_asof(df.sort_values("candle_begin_time"), oi.sort_values("candle_begin_time"), on="candle_begin_time")
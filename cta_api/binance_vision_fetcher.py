@@ -1,5 +1,6 @@
 import io
 import zipfile
+from pathlib import Path
 import requests
 import pandas as pd
 import numpy as np
@@ -17,12 +18,13 @@ def _date_iter(start: str, end: str):
         yield d.strftime("%Y-%m-%d")
         d += pd.Timedelta(days=1)
 
+# K线压缩包的本地缓存目录
+CACHE_DIR = Path(__file__).parent.parent / "data" / "vision_cache"
+
 def _fetch_zip_csv(url: str, csv_name: str) -> pd.DataFrame:
-    h = requests.head(url, timeout=20)
-    if h.status_code != 200:
-        return pd.DataFrame()
     r = requests.get(url, timeout=60)
-    r.raise_for_status()
+    if r.status_code != 200:
+        return pd.DataFrame()
     z = zipfile.ZipFile(io.BytesIO(r.content))
     names = z.namelist()
     name = csv_name if csv_name in names else names[0]
@@ -30,7 +32,13 @@ def _fetch_zip_csv(url: str, csv_name: str) -> pd.DataFrame:
         df = pd.read_csv(f)
     return df
 
+# 目录页面的抓取结果 (prefix, pattern) -> 文件列表，同一进程内不重复抓取
+_LIST_CACHE = {}
+
 def _list_files(prefix: str, pattern: str) -> list[str]:
+    key = (prefix, pattern)
+    if key in _LIST_CACHE:
+        return list(_LIST_CACHE[key])
     url = f"https://data.binance.vision/?prefix={requests.utils.quote(prefix, safe='')}"
     r = requests.get(url, timeout=30)
     if r.status_code != 200:
@@ -44,6 +52,7 @@ def _list_files(prefix: str, pattern: str) -> list[str]:
             if not href.startswith("http"):
                 href = "https://data.binance.vision" + ("/" + href.lstrip("/"))
             files.append(href)
+    _LIST_CACHE[key] = tuple(files)
     return files
 
 def fetch_oi(symbol: str, period: str, start: str, end: str) -> pd.DataFrame:
@@ -120,51 +129,6 @@ def fetch_funding(symbol: str, start: str, end: str) -> pd.DataFrame:
     return df[["funding_time","funding_rate"]]
 
 def fetch_klines(symbol: str, interval: str, start: str, end: str) -> pd.DataFrame:
-    sym = symbol.replace("-", "")
-    daily_prefix = f"data/futures/um/daily/klines/{sym}/{interval}/"
-    pattern_daily = rf"{sym}-{interval}-\d{{4}}-\d{{2}}-\d{{2}}\.zip"
-    files = _list_files(daily_prefix, pattern_daily)
-    if not files:
-        return pd.DataFrame()
-    rows = []
-    for f in files:
-        csv = f.split("/")[-1].replace(".zip", ".csv")
-        df = _fetch_zip_csv(f, csv)
-        if not df.empty:
-            rows.append(df)
-    if not rows:
-        return pd.DataFrame()
-    df = pd.concat(rows, ignore_index=True)
-    if "open_time" in df.columns:
-        ot = df["open_time"]
-    elif "Open time" in df.columns:
-        ot = df["Open time"]
-    else:
-        return pd.DataFrame()
-    df["candle_begin_time"] = pd.to_datetime(ot, unit="ms", errors="coerce")
-    cols_map = {
-        "open": "open",
-        "high": "high",
-        "low": "low",
-        "close": "close",
-        "volume": "volume",
-        "quote_asset_volume": "quote_volume",
-        "Number of trades": "trade_num",
-        "number_of_trades": "trade_num",
-        "taker_buy_base_asset_volume": "taker_buy_base_asset_volume",
-        "taker_buy_quote_asset_volume": "taker_buy_quote_asset_volume",
-    }
-    out = pd.DataFrame()
-    out["candle_begin_time"] = df["candle_begin_time"]
-    for src, dst in cols_map.items():
-        if src in df.columns:
-            out[dst] = pd.to_numeric(df[src], errors="coerce")
-        else:
-            out[dst] = np.nan
-    if "quote_volume" not in out.columns and "quote_asset_volume" in df.columns:
-        out["quote_volume"] = pd.to_numeric(df["quote_asset_volume"], errors="coerce")
-    out["taker_sell_quote_asset_volume"] = out["quote_volume"] - out.get("taker_buy_quote_asset_volume", 0)
-    return out[[
-        "candle_begin_time","open","high","low","close","volume","quote_volume","trade_num",
-        "taker_buy_base_asset_volume","taker_buy_quote_asset_volume","taker_sell_quote_asset_volume"
-    ]]
+    from cta_api.vision_ingest import VisionIngester
+    df = VisionIngester(CACHE_DIR).fetch(symbol, interval, start, end)
+    return df if not df.empty else pd.DataFrame()
@@ -0,0 +1,134 @@
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Callable, Hashable, Optional
+
+import pandas as pd
+
+_MISSING = object()
+
+
+def _frame_nbytes(value: Any) -> int:
+    """估算缓存对象占用的内存 (DataFrame / Series / ndarray，或由它们组成的 tuple)"""
+    if isinstance(value, tuple):
+        return sum(_frame_nbytes(v) for v in value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    return int(getattr(value, 'nbytes', 0))
+
+
+class LRUCache:
+    """
+    带内存预算的 LRU 缓存 (进程内)
+    超出预算时按最近最少使用的顺序淘汰，单个超过预算的对象不缓存
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = _frame_nbytes):
+        self.max_bytes = int(max_bytes)
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，命中时移动到队尾"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """写入缓存，并按内存预算淘汰旧数据"""
+        size = self.sizeof(value)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_bytes:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.current_bytes += size
+            self._shrink()
+
+    def get_or_compute(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """命中则直接返回，否则调用 func 计算并写入缓存"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = func()
+            self.put(key, value)
+        return value
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """
+        删除缓存
+        :param predicate: 按 key 判断是否删除，None 表示清空
+        :return: 删除的条目数
+        """
+        with self._lock:
+            keys = [k for k in self._data if predicate is None or predicate(k)]
+            for k in keys:
+                self._pop(k)
+            return len(keys)
+
+    def resize(self, max_bytes: int) -> None:
+        """调整内存预算"""
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            self._shrink()
+
+    def stats(self) -> dict:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def _pop(self, key: Hashable) -> None:
+        if key in self._data:
+            del self._data[key]
+            self.current_bytes -= self._sizes.pop(key)
+
+    def _shrink(self) -> None:
+        while self.current_bytes > self.max_bytes and self._data:
+            key = next(iter(self._data))
+            self._pop(key)
+            self.evictions += 1
+
+
+# 行情数据缓存：key 为 (symbol, rule_type, offset, 数据版本, 数据根目录, ...)，value 为 load_data 预处理后的 DataFrame
+data_cache = LRUCache(max_bytes=1024 * 1024 ** 2)
+
+# 指标缓存：key 为 (行情指纹, 指标名, 依赖列, 参数)，value 为只读的指标数组，见 cta_api.indicators
+indicator_cache = LRUCache(max_bytes=256 * 1024 ** 2)
+
+
+def invalidate_data(symbol: Optional[str] = None, rule_type: Optional[str] = None) -> int:
+    """
+    数据文件被重写后 (如 0_1_数据转换)，删除对应的行情缓存
+    :param symbol: 币种，如 'BTC-USDT'，None 表示全部币种
+    :param rule_type: 周期，如 '1H'，None 表示全部周期
+    :return: 删除的条目数
+    """
+    def _match(key):
+        return ((symbol is None or key[0] == symbol) and
+                (rule_type is None or str(key[1]).upper() == rule_type.upper()))
+    return data_cache.invalidate(_match)
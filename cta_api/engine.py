@@ -1,5 +1,7 @@
 import os
+import numpy as np
 import pandas as pd
+import pyarrow.feather as feather
 import importlib
 import warnings
 from typing import Optional, List, Dict
@@ -7,11 +9,18 @@ from pathlib import Path
 from datetime import datetime
 
 from cta_api.base import BacktestConfig, BaseFactor
-from cta_api.position import position_for_future
-from cta_api.function import cal_equity_curve
-from cta_api.statistics import transfer_equity_curve_to_trade, strategy_evaluate
+from cta_api.position import position_for_future, position_matrix
+from cta_api.function import cal_equity_curve, cal_equity_curve_batch, process_stop_loss_batch, format_kline_pct
+from cta_api.statistics import transfer_equity_curve_to_trade, strategy_evaluate, strategy_evaluate_numeric
 from cta_api.draw_backtest_chart import draw_backtest_chart
 from cta_api.logger import setup_logger
+from cta_api.cache import data_cache, indicator_cache
+from cta_api.shared_data import SharedMarketData, SharedFrameHandle, attach_frame
+from cta_api.market_store import MarketStore, arrow_to_pandas, upcast_frame
+
+# 引擎自身用到的行情列 (止盈止损、资金曲线、结果输出)，因子声明 columns 时与之合并
+ENGINE_COLUMNS = ['open', 'high', 'low', 'close', 'quote_volume', 'kline_pct']
+
 
 class BacktestEngine:
     """
@@ -23,6 +32,11 @@ class BacktestEngine:
         self.root_path = Path(__file__).parent.parent
         self.data_path = Path(config.data_path) if config.data_path else self.root_path / 'data/pickle_data'
         self.output_path = Path(config.output_path) if config.output_path else self.root_path / 'data/output'
+        # 分区行情存储，没有分区数据的币种仍读取 data_path 下的 .pkl 文件
+        self.market_store = MarketStore(config.market_store_path if config.market_store_path
+                                        else self.root_path / 'data/market_store')
+        # 数据根目录，写入行情缓存的 key：data_cache 是进程级的，不同数据目录的引擎不能共用缓存条目
+        self.data_root = (str(self.market_store.root.resolve()), str(self.data_path.resolve()))
         
         # 确保输出目录存在
         self.output_path.mkdir(parents=True, exist_ok=True)
@@ -35,6 +49,13 @@ class BacktestEngine:
         # 加载最小下单量
         self.min_amount_dict = self._load_min_amount()
 
+        # 行情缓存为进程级单例，这里只设置内存预算
+        data_cache.resize(config.data_cache_mb * 1024 ** 2)
+        indicator_cache.resize(config.indicator_cache_mb * 1024 ** 2)
+
+        # 已发布到共享内存的行情：(symbol, rule_type, offset) -> SharedFrameHandle，随引擎一起传给子进程
+        self.shared_handles: Dict[tuple, SharedFrameHandle] = {}
+
     def _load_min_amount(self) -> Dict[str, float]:
         """加载最小下单量配置"""
         csv_path = self.root_path / '最小下单量.csv'
@@ -48,23 +69,227 @@ class BacktestEngine:
             self.logger.warning(f"Failed to load min amount: {e}")
             return {}
 
-    def load_data(self, symbol: str, rule_type: str, offset: int = 0) -> pd.DataFrame:
-        """读取并预处理数据"""
+    def load_data(self, symbol: str, rule_type: str, offset: int = 0, start=None, end=None,
+                  columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        读取并预处理数据
+        优先读取分区存储 (market_store)，只读取 [start, end] 涉及的月份 / row group 以及 columns 中的列；
+        没有分区数据时读取旧的 {周期}/{币种}.pkl 文件，再按 start / end / columns 截取
+        预处理结果按 (symbol, rule_type, offset, 数据版本, 数据根目录, start, end, columns) 缓存，每次返回一份拷贝，调用方可以随意修改
+        已通过 share_data 发布到共享内存的数据直接零拷贝挂载 (原始列只读)
+        :param start: 开始时间 (包含)，None 表示最早
+        :param end: 结束时间 (包含)，None 表示最新
+        :param columns: 需要的列，None 表示全部，candle_begin_time 总是返回
+        """
+        sliced = start is not None or end is not None or columns is not None
+        handle = self.shared_handles.get((symbol, rule_type, offset))
+        if handle is not None:
+            df = attach_frame(handle)
+            return self._slice_data(df, start, end, columns) if sliced else df
+
+        version = self.data_version(symbol, rule_type)
+        if not self.market_store.exists(symbol, rule_type) and sliced:
+            # 旧格式只能整读文件，截取整份数据的缓存
+            return self._slice_data(self.load_data(symbol, rule_type, offset), start, end, columns)
+
+        mapped = self.config.data_mmap and self.market_store.exists(symbol, rule_type)
+        key = (symbol, rule_type, offset, version, self.data_root)
+        if sliced:
+            key += (str(start), str(end), None if columns is None else tuple(columns))
+        if mapped:
+            key += ('mmap',)
+        df = data_cache.get(key)
+        if df is None:
+            # 数据已被重写：删除本数据目录下旧版本的缓存
+            data_cache.invalidate(lambda k: k[:3] == key[:3] and k[4] == self.data_root and k[3] != version)
+            if mapped:
+                df = self.market_store.read_mapped(symbol, rule_type, start, end, columns, offset)
+                self._fill_columns(df, columns)
+            else:
+                df = self._read_data(symbol, rule_type, offset, start, end, columns)
+            # 行情版本标识，随 copy 传给因子，作为指标缓存的指纹
+            df.attrs['data_key'] = key
+            data_cache.put(key, df)
+        # 紧凑格式的列在这里转回 float64 (load_data 指定 columns 时只转换需要的列)；
+        # 内存映射的原始列只读，浅拷贝即可，不复制映射的数据
+        return upcast_frame(df, deep=not mapped)
+
+    def load_data_offsets(self, symbol: str, rule_type: str, offsets: Optional[List[int]] = None) -> Dict[int, pd.DataFrame]:
+        """
+        读取同一周期的多个 offset 的行情，数据只读一次 (load_data 每个 offset 都要整读一遍)
+        各 offset 与 load_data 的结果相同，并按同样的键放入缓存
+        :param offsets: 需要的 offset，None 表示数据中的全部 offset
+        :return: {offset: 行情}，按 offset 排序
+        """
+        version = self.data_version(symbol, rule_type)
+        if self.config.data_mmap and self.market_store.exists(symbol, rule_type):
+            # 快照中每个 offset 都是连续的一段，逐个映射不需要整读
+            available = self.market_store.mapped_offsets(symbol, rule_type)
+            offsets = available if offsets is None else [o for o in offsets if o in available]
+            return {o: self.load_data(symbol, rule_type, o) for o in sorted(offsets)}
+
+        # 数据中的 offset 列表也按数据版本缓存
+        offsets_key = (symbol, rule_type, 'offsets', version, self.data_root)
+        if offsets is None:
+            offsets = data_cache.get(offsets_key)
+        frames, missing = {}, []
+        for offset in (offsets or []):
+            handle = self.shared_handles.get((symbol, rule_type, offset))
+            if handle is not None:
+                frames[offset] = attach_frame(handle)
+                continue
+            df = data_cache.get((symbol, rule_type, offset, version, self.data_root))
+            if df is None:
+                missing.append(offset)
+            else:
+                frames[offset] = df.copy()
+
+        if offsets is None or missing:
+            data_cache.invalidate(
+                lambda k: k[:2] == (symbol, rule_type) and k[4] == self.data_root and k[3] != version)
+            full = self._read_data(symbol, rule_type)
+            all_offsets = tuple(sorted(full['offset'].unique().tolist()))
+            data_cache.put(offsets_key, all_offsets)
+            for offset in (all_offsets if offsets is None else [o for o in missing if o in all_offsets]):
+                df = full[full['offset'] == offset].copy()
+                key = (symbol, rule_type, offset, version, self.data_root)
+                df.attrs['data_key'] = key
+                data_cache.put(key, df)
+                frames[offset] = df.copy()
+        return dict(sorted(frames.items()))
+
+    def share_data(self, shared: SharedMarketData, symbols: List[str], rule_type: str, offset: int = 0) -> None:
+        """
+        把各币种预处理后的行情发布到共享内存，之后传入子进程的引擎直接挂载，不再各自读取文件
+        开启 data_mmap 且有分区数据的币种不发布，子进程各自内存映射同一个快照文件
+        :param shared: SharedMarketData，由调用方用 with 管理生命周期
+        """
+        for symbol in symbols:
+            try:
+                df = self.load_data(symbol, rule_type, offset)
+            except Exception as e:
+                self.logger.error(f"Error loading data for {symbol}: {e}")
+                continue
+            if self.config.data_mmap and self.market_store.exists(symbol, rule_type):
+                # 子进程直接内存映射快照 (上面的 load_data 已生成)，系统页缓存本身就是共享的
+                continue
+            self.shared_handles[(symbol, rule_type, offset)] = shared.publish(df)
+
+    def data_version(self, symbol: str, rule_type: str):
+        """数据版本：分区存储为各月份文件的 (文件数, 最大mtime)，旧格式为 .pkl 文件的 mtime"""
+        if self.market_store.exists(symbol, rule_type):
+            return self.market_store.version(symbol, rule_type)
         file_path = self.data_path / rule_type / f'{symbol}.pkl'
         if not file_path.exists():
             raise FileNotFoundError(f"Data not found: {file_path}")
-            
-        df = pd.read_feather(file_path)
+        return file_path.stat().st_mtime_ns
+
+    def _read_data(self, symbol: str, rule_type: str, offset: Optional[int] = None, start=None, end=None,
+                   columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """读取行情，补全 offset / kline_pct 并筛选指定 offset (None 时返回全部 offset)"""
+        if self.market_store.exists(symbol, rule_type):
+            # 谓词下推：按月份和 row group 统计信息跳过无关数据，offset 也在读取时过滤
+            df = self.market_store.read(symbol, rule_type, start, end, columns, offset)
+        else:
+            # list 列 (transfer_to_period_data 生成的 kline_pct) 保持为 Arrow 列，不展开成逐行的数组对象
+            df = arrow_to_pandas(feather.read_table(self.data_path / rule_type / f'{symbol}.pkl'))
         
-        # 基础处理
-        if 'offset' not in df.columns:
-            df['offset'] = 0
-        if 'kline_pct' not in df.columns:
-            df['kline_pct'] = pd.to_numeric(df['close'], errors='coerce').pct_change().fillna(0.0)
-            
+        self._fill_columns(df, columns)
+        if offset is None or 'offset' not in df.columns:
+            return df
         df = df[df['offset'] == offset].copy()
         return df
 
+    @staticmethod
+    def _fill_columns(df: pd.DataFrame, columns: Optional[List[str]] = None) -> None:
+        """补全旧数据缺少的 offset / kline_pct 列 (columns 不为 None 时只补全其中需要的列)"""
+        if columns is None or 'offset' in columns:
+            if 'offset' not in df.columns:
+                df['offset'] = 0
+        if columns is None or 'kline_pct' in columns:
+            if 'kline_pct' not in df.columns:
+                df['kline_pct'] = pd.to_numeric(df['close'], errors='coerce').pct_change().fillna(0.0)
+
+    def _load_window(self, rule_type: str, start_date, end_date) -> tuple:
+        """
+        回测需要读取的时间范围：开始时间前 config.data_warmup_bars 根K线 (供指标预热) 到结束时间后一根K线 (止盈止损用下一根开盘价)
+        data_warmup_bars 为 None 时读取全部历史，结果与旧版本一致
+        :return: (start, end)
+        """
+        bars = self.config.data_warmup_bars
+        if bars is None:
+            return None, None
+        bar = pd.Timedelta(pd.tseries.frequencies.to_offset(rule_type))
+        return pd.to_datetime(start_date) - bar * bars, pd.to_datetime(end_date) + bar
+
+    @staticmethod
+    def _slice_data(df: pd.DataFrame, start=None, end=None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """按 [start, end] 和 columns 截取已读取的行情"""
+        if start is not None:
+            df = df[df['candle_begin_time'] >= pd.to_datetime(start)]
+        if end is not None:
+            df = df[df['candle_begin_time'] <= pd.to_datetime(end)]
+        if columns is not None:
+            df = df[list(dict.fromkeys(['candle_begin_time'] + [c for c in columns if c in df.columns]))]
+        # 共享内存中的原始列只读，只选列时浅拷贝即可
+        return df.copy(deep=not df.attrs.get('shared_memory', False))
+
+    def _load_signal_func(self, factor_name: str, proportion: float = None):
+        """
+        加载因子模块，返回统一签名的信号函数 signal_func(df, para)
+        兼容旧模式 (module.signal) 和新模式 (module.Strategy class)
+        :param proportion: 传给因子的止盈止损比例，None 时使用 config.proportion
+        """
+        module = importlib.import_module(f'factors.{factor_name}')
+        proportion = self.config.proportion if proportion is None else proportion
+        leverage_rate = self.config.leverage_rate
+        if hasattr(module, 'Strategy') and issubclass(module.Strategy, BaseFactor):
+            strategy = module.Strategy()
+            return lambda df, para: strategy.signal(df, para, proportion, leverage_rate)
+        elif hasattr(module, 'signal'):
+            return lambda df, para: module.signal(df, para=para, proportion=proportion, leverage_rate=leverage_rate)
+        raise ValueError(f"Invalid factor module: {factor_name}")
+
+    def _factor_columns(self, factor_name: str) -> Optional[List[str]]:
+        """
+        因子声明用到的行情列 (Strategy.columns 或模块级 columns) 与引擎所需列的并集
+        因子未声明时返回 None，即读取全部列
+        """
+        module = importlib.import_module(f'factors.{factor_name}')
+        if hasattr(module, 'Strategy') and issubclass(module.Strategy, BaseFactor):
+            columns = module.Strategy.columns
+        else:
+            columns = getattr(module, 'columns', None)
+        if columns is None:
+            return None
+        return list(dict.fromkeys(list(columns) + ENGINE_COLUMNS))
+
+    def _load_signal_batch_func(self, factor_name: str):
+        """
+        加载因子的批量信号函数 signal_batch(arrays, para_list)，因子未提供时返回 None
+        兼容旧模式 (模块级 signal_batch 函数) 和新模式 (Strategy 类实现 signal_batch 方法)
+        """
+        module = importlib.import_module(f'factors.{factor_name}')
+        if hasattr(module, 'Strategy') and issubclass(module.Strategy, BaseFactor):
+            if module.Strategy.signal_batch is None:
+                return None
+            return module.Strategy().signal_batch
+        return getattr(module, 'signal_batch', None)
+
+    def _signal_and_pos_batch(self, base: pd.DataFrame, signal_batch_func, para_list: List[list]) -> tuple:
+        """
+        由 signal_batch 一次得到全部参数的 signal 矩阵，再逐列做止盈止损、计算持仓
+        :return: (signal矩阵, pos矩阵)
+        """
+        arrays = {c: base[c].to_numpy(dtype=np.float64) for c in base.columns
+                  if pd.api.types.is_numeric_dtype(base[c]) and not pd.api.types.is_bool_dtype(base[c])}
+        signal = np.asarray(signal_batch_func(arrays, para_list), dtype=np.float64)
+        if signal.shape != (len(base), len(para_list)):
+            raise ValueError(f"signal_batch returned shape {signal.shape}, expected {(len(base), len(para_list))}")
+        signal = process_stop_loss_batch(arrays['open'], arrays['close'], signal,
+                                         self.config.proportion, self.config.leverage_rate)
+        return signal, position_matrix(signal)
+
     def run_backtest(self, 
                      symbol: str, 
                      factor_name: str, 
@@ -83,22 +308,15 @@ class BacktestEngine:
         
         # 1. 加载数据
         try:
-            df = self.load_data(symbol, rule_type, offset)
+            df = self.load_data(symbol, rule_type, offset, *self._load_window(rule_type, start_date, end_date))
         except Exception as e:
             self.logger.error(f"Error loading data for {symbol}: {e}")
             return None, None
 
         # 2. 计算信号 (动态加载策略)
         try:
-            module = importlib.import_module(f'factors.{factor_name}')
-            # 兼容旧模式 (module.signal) 和新模式 (module.Strategy class)
-            if hasattr(module, 'Strategy') and issubclass(module.Strategy, BaseFactor):
-                strategy = module.Strategy()
-                df = strategy.signal(df, para, self.config.proportion, self.config.leverage_rate)
-            elif hasattr(module, 'signal'):
-                df = module.signal(df, para=para, proportion=self.config.proportion, leverage_rate=self.config.leverage_rate)
-            else:
-                raise ValueError(f"Invalid factor module: {factor_name}")
+            signal_func = self._load_signal_func(factor_name)
+            df = signal_func(df, para)
         except Exception as e:
             self.logger.error(f"Error executing factor {factor_name}: {e}")
             return None, None
@@ -148,6 +366,254 @@ class BacktestEngine:
             
         return df, rtn
 
+    def run_backtest_batch(self,
+                           symbol: str,
+                           factor_name: str,
+                           para_list: List[list],
+                           rule_type: str = '1H',
+                           start_date: str = '2020-01-01',
+                           end_date: str = '2099-01-01',
+                           offset: int = 0,
+                           save_results: bool = True,
+                           numeric: bool = True) -> List[tuple]:
+        """
+        批量回测同一币种、同一因子的多组参数
+        数据只读取一次，各参数的持仓拼成 (K线数 × 参数组数) 矩阵后一次性计算全部资金曲线
+        因子提供 signal_batch 时，全部参数的信号也一次算出
+        :param numeric: True 时评价指标为 strategy_evaluate_numeric 的数值 dict，False 时为 strategy_evaluate 的格式化表格
+        :return: [(para, df, metrics), ...]，出错的参数组会被跳过
+        """
+        warnings.filterwarnings('ignore')
+        self.logger.info(f"Start batch backtest: {symbol} | {factor_name} | {len(para_list)} para sets")
+
+        # 1. 加载数据
+        try:
+            # 只读取 (紧凑格式下只转换) 因子声明的列
+            base = self.load_data(symbol, rule_type, offset, *self._load_window(rule_type, start_date, end_date),
+                                  columns=self._factor_columns(factor_name))
+        except Exception as e:
+            self.logger.error(f"Error loading data for {symbol}: {e}")
+            return []
+
+        # 2. 时间过滤条件 (对所有参数相同)
+        in_range = ((base['candle_begin_time'] >= pd.to_datetime(start_date)) &
+                    (base['candle_begin_time'] <= pd.to_datetime(end_date))).to_numpy()
+        if not in_range.any():
+            self.logger.warning(f"No data between {start_date} and {end_date}")
+            return []
+
+        # 3. 在全部历史上计算各参数的信号和持仓
+        try:
+            ok_para, signal, pos = self.signal_and_pos_matrix(base, factor_name, para_list)
+        except Exception as e:
+            self.logger.error(f"Error executing factor {factor_name}: {e}")
+            return []
+        if not ok_para:
+            return []
+
+        # 4. 截取回测区间，一次性计算全部资金曲线并逐个参数统计
+        results = self.evaluate_positions(base[in_range], ok_para, signal[in_range], pos[in_range],
+                                          symbol, rule_type, numeric=numeric)
+        if save_results:
+            for para, df, _ in results:
+                self._save_results(df, symbol, factor_name, para, rule_type)
+
+        self.logger.info(f"Finish batch backtest: {symbol} | {factor_name} | {len(results)}/{len(para_list)} para sets")
+        self.logger.debug(f"Indicator cache: {indicator_cache.stats()}")
+        return results
+
+    def run_backtest_offsets(self,
+                             symbol: str,
+                             factor_name: str,
+                             para: list,
+                             rule_type: str = '4H',
+                             start_date: str = '2020-01-01',
+                             end_date: str = '2099-01-01',
+                             offsets: Optional[List[int]] = None,
+                             numeric: bool = True) -> tuple:
+        """
+        同一周期的全部 offset 一起回测，消除K线起点选择带来的择时运气
+        数据只读取一次；各 offset 分别计算信号后，持仓按 (K线数 × offset数) 排成矩阵，一次性计算全部资金曲线
+        合成资金曲线：资金平均分给各 offset，之后不再平衡，即各 offset 资金曲线按时间对齐后的平均值
+        :param offsets: 参与的 offset，None 表示数据中的全部 offset
+        :return: ([(offset, df, metrics), ...], 合成资金曲线 df, 合成指标)，没有可用数据时为 ([], None, None)
+        """
+        warnings.filterwarnings('ignore')
+        self.logger.info(f"Start offset backtest: {symbol} | {factor_name} | {para} | {rule_type}")
+
+        # 1. 一次读取全部 offset
+        try:
+            frames = self.load_data_offsets(symbol, rule_type, offsets)
+        except Exception as e:
+            self.logger.error(f"Error loading data for {symbol}: {e}")
+            return [], None, None
+
+        # 2. 各 offset 在全部历史上计算信号和持仓，再截取回测区间
+        ok_offsets, bases, signals, positions = [], [], [], []
+        for offset, base in frames.items():
+            in_range = ((base['candle_begin_time'] >= pd.to_datetime(start_date)) &
+                        (base['candle_begin_time'] <= pd.to_datetime(end_date))).to_numpy()
+            if not in_range.any():
+                continue
+            try:
+                ok_para, signal, pos = self.signal_and_pos_matrix(base, factor_name, [para])
+            except Exception as e:
+                self.logger.error(f"Error executing factor {factor_name} offset={offset}: {e}")
+                continue
+            if not ok_para:
+                continue
+            ok_offsets.append(offset)
+            bases.append(base[in_range])
+            signals.append(signal[in_range, 0])
+            positions.append(pos[in_range, 0])
+        if not ok_offsets:
+            self.logger.warning(f"No data between {start_date} and {end_date}")
+            return [], None, None
+
+        # 3. 各 offset 的K线数可能相差一两根，按行对齐、末尾补齐：补齐部分持仓为0、价格为空，
+        #    最后一根真实K线照常按收盘价平仓，与单独回测的结果一致
+        n = max(len(b) for b in bases)
+        pos_mat = np.zeros((n, len(ok_offsets)), order='F')
+        price = {c: np.full((n, len(ok_offsets)), np.nan, order='F') for c in ['open', 'high', 'low', 'close']}
+        for j, base in enumerate(bases):
+            pos_mat[:len(base), j] = positions[j]
+            for c in price:
+                price[c][:len(base), j] = base[c].to_numpy(dtype=np.float64)
+
+        min_amount = self.min_amount_dict.get(symbol, 0.001)  # 默认值
+        equity_change, equity_curve = cal_equity_curve_batch(
+            pos_mat, price['open'], price['high'], price['low'], price['close'],
+            slippage=self.config.slippage,
+            c_rate=self.config.c_rate,
+            leverage_rate=self.config.leverage_rate,
+            min_amount=min_amount,
+            min_margin_ratio=self.config.min_margin_ratio
+        )
+
+        # 4. 逐个 offset 统计
+        results, trades = [], []
+        for j, (offset, base) in enumerate(zip(ok_offsets, bases)):
+            m = len(base)
+            df, trade, rtn = self._evaluate_column(base, signals[j], positions[j], equity_change[:m, j],
+                                                   equity_curve[:m, j], rule_type, numeric)
+            self.logger.debug(f"[{symbol}] {para} offset={offset} Final Equity: {equity_curve[m - 1, j]:.4f}")
+            results.append((offset, df, rtn))
+            trades.append(trade)
+
+        # 5. 合成资金曲线：按时间对齐，某个 offset 尚未开始时净值记为1，之后向前填充
+        curves = pd.concat([df.set_index('candle_begin_time')['equity_curve'].rename(offset)
+                            for offset, df, _ in results], axis=1).sort_index()
+        curves = curves.ffill().fillna(1.0)
+        blend = pd.DataFrame({'candle_begin_time': curves.index, 'equity_curve': curves.mean(axis=1).to_numpy()})
+        blend['equity_change'] = blend['equity_curve'].pct_change().fillna(0.0)
+        for offset in curves.columns:
+            blend[f'offset_{offset}'] = curves[offset].to_numpy()
+        # 逐笔交易统计取全部 offset 的交易
+        trade = pd.concat([t for t in trades if not t.empty]).sort_index() if any(not t.empty for t in trades) \
+            else pd.DataFrame()
+        # 合成曲线由各 offset 交错的阶梯曲线平均而来，逐行的涨跌幅会低估波动率，评价指标按 rule_type 间隔取样后计算
+        sampled = blend.set_index('candle_begin_time')['equity_curve'].resample(rule_type.replace('H', 'h')).last()
+        sampled = sampled.dropna().reset_index()
+        sampled['equity_change'] = sampled['equity_curve'].pct_change().fillna(0.0)
+        blend_metrics, _ = strategy_evaluate_numeric(sampled, trade, rule_type)
+
+        self.logger.info(f"[{symbol}] {factor_name} {para} {len(ok_offsets)} offsets, "
+                         f"Blended Equity: {blend['equity_curve'].iloc[-1]:.4f}")
+        return results, blend, blend_metrics
+
+    def signal_and_pos_matrix(self, base: pd.DataFrame, factor_name: str, para_list: List[list]) -> tuple:
+        """
+        在整段行情上计算多组参数的信号和持仓
+        因子提供 signal_batch 时一次算出全部参数，否则 (或批量计算出错时) 逐个参数调用 signal
+        :param base: load_data 返回的行情
+        :return: (成功的参数列表, signal矩阵, pos矩阵)，矩阵形状为 (K线数 × 成功的参数组数)
+        """
+        signal_func = self._load_signal_func(factor_name)
+        signal_batch_func = self._load_signal_batch_func(factor_name)
+        if signal_batch_func is not None and para_list:
+            try:
+                signal, pos = self._signal_and_pos_batch(base, signal_batch_func, para_list)
+                return list(para_list), signal, pos
+            except Exception as e:
+                self.logger.warning(f"signal_batch failed for {factor_name}, falling back to signal: {e}")
+
+        ok_para, signal_cols, pos_cols = [], [], []
+        for para in para_list:
+            try:
+                # 共享内存中的原始列只读，浅拷贝即可隔离各参数新增的列
+                df = signal_func(base.copy(deep=not base.attrs.get('shared_memory', False)), para)
+                df = position_for_future(df)
+                if len(df) != len(base):
+                    raise ValueError(f"factor returned {len(df)} rows, expected {len(base)}")
+            except Exception as e:
+                self.logger.error(f"Error executing factor {factor_name} {para}: {e}")
+                continue
+            ok_para.append(para)
+            signal_cols.append(df['signal'].to_numpy(dtype=np.float64))
+            pos_cols.append(df['pos'].to_numpy(dtype=np.float64))
+        if not ok_para:
+            return [], np.empty((len(base), 0)), np.empty((len(base), 0))
+        return ok_para, np.column_stack(signal_cols), np.column_stack(pos_cols)
+
+    def evaluate_positions(self, base: pd.DataFrame, para_list: List[list], signal: np.ndarray, pos: np.ndarray,
+                           symbol: str, rule_type: str, numeric: bool = True) -> List[tuple]:
+        """
+        由持仓矩阵一次性计算全部资金曲线，并逐个参数统计评价指标
+        :param base: 回测区间内的行情 (与 signal / pos 的行一一对应)
+        :param signal: (K线数 × 参数组数) 的 signal 矩阵
+        :param pos: (K线数 × 参数组数) 的 pos 矩阵
+        :param numeric: True 时评价指标为 strategy_evaluate_numeric 的数值 dict，False 时为 strategy_evaluate 的格式化表格
+        :return: [(para, df, metrics), ...]
+        """
+        min_amount = self.min_amount_dict.get(symbol, 0.001)  # 默认值
+        equity_change, equity_curve = cal_equity_curve_batch(
+            pos,
+            base['open'].to_numpy(), base['high'].to_numpy(), base['low'].to_numpy(), base['close'].to_numpy(),
+            slippage=self.config.slippage,
+            c_rate=self.config.c_rate,
+            leverage_rate=self.config.leverage_rate,
+            min_amount=min_amount,
+            min_margin_ratio=self.config.min_margin_ratio
+        )
+
+        results = []
+        for j, para in enumerate(para_list):
+            df, _, rtn = self._evaluate_column(base, signal[:, j], pos[:, j], equity_change[:, j], equity_curve[:, j],
+                                               rule_type, numeric)
+            self.logger.debug(f"[{symbol}] {para} Final Equity: {equity_curve[-1, j]:.4f}")
+            results.append((para, df, rtn))
+        return results
+
+    def _evaluate_column(self, base: pd.DataFrame, signal: np.ndarray, pos: np.ndarray,
+                         equity_change: np.ndarray, equity_curve: np.ndarray, rule_type: str, numeric: bool) -> tuple:
+        """
+        单组持仓的资金曲线 df、逐笔交易和评价指标
+        :return: (df, trade, metrics)
+        """
+        base_cols = [c for c in ['candle_begin_time', 'open', 'high', 'low', 'close', 'quote_volume', 'kline_pct']
+                     if c in base.columns]
+        df = base[base_cols].copy()
+        df['signal'] = signal
+        df['pos'] = pos
+        df['equity_change'] = equity_change
+        df['equity_curve'] = equity_curve
+        df['start_time'] = self._trade_start_time(df)
+
+        trade = transfer_equity_curve_to_trade(df)
+        if numeric:
+            rtn, _ = strategy_evaluate_numeric(df, trade, rule_type)
+        else:
+            rtn, _ = strategy_evaluate(df.copy(), trade, rule_type)
+        return df, trade, rtn
+
+    @staticmethod
+    def _trade_start_time(df: pd.DataFrame) -> pd.Series:
+        """按 cal_equity_curve 的口径计算每笔交易的开仓时间 start_time"""
+        open_pos_condition = (df['pos'] != 0) & (df['pos'] != df['pos'].shift(1))
+        start_time = df['candle_begin_time'].where(open_pos_condition).ffill()
+        start_time[df['pos'] == 0] = pd.NaT
+        return start_time
+
     def _save_results(self, df: pd.DataFrame, symbol: str, factor_name: str, para: list, rule_type: str):
         """保存资金曲线CSV"""
         # 基础列
@@ -161,6 +627,8 @@ class BacktestEngine:
         cols_to_save = [c for c in base_cols if c in df.columns] + factor_cols
         
         out_df = df[cols_to_save].copy()
+        if 'kline_pct' in out_df.columns:
+            out_df['kline_pct'] = format_kline_pct(out_df['kline_pct'])
         out_df.rename(columns={'equity_curve': 'r_line_equity_curve'}, inplace=True)
         
         filename = f"{factor_name}&{symbol.split('-')[0]}&{rule_type}&{str(para)}.csv"
@@ -1,6 +1,8 @@
 import os
+import re
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 from typing import List, Union
 try:
     import numba
@@ -8,24 +10,28 @@ try:
 except ImportError:
     HAS_NUMBA = False
     print("Warning: Numba not found. Backtest speed might be slow. Please install numba: pip install numba")
+from cta_api.position import merge_signal, drop_duplicate_signal, merge_signal_matrix
 
 def _process_stop_loss_core(
     open_arr: np.ndarray,
     close_arr: np.ndarray,
     signal_arr: np.ndarray,
     stop_loss_pct: float,
-    leverage_rate: float
+    leverage_rate: float,
+    state: np.ndarray
 ) -> tuple:
     """
     止损逻辑核心函数
+    :param state: [持仓方向, 开仓价]，进入时为第一根K线之前的状态；处理完倒数第二根K线后写回
+                  (最后一根K线的开仓价依赖下一根K线，尚未确定)，用于增量回测续算
     :return: (更新后的signal数组, stop_loss_condition数组)
     """
     length = len(open_arr)
     new_signal = signal_arr.copy()
     stop_loss_price_arr = np.full(length, np.nan)
     
-    position = 0
-    open_price = np.nan
+    position = int(state[0])
+    open_price = state[1]
     
     for i in range(length):
         # 1. 检查是否有新信号 (开仓或反手)
@@ -59,6 +65,10 @@ def _process_stop_loss_core(
                     new_signal[i] = 0
                     position = 0
                     open_price = np.nan
+
+        if i == length - 2:
+            state[0] = position
+            state[1] = open_price
                     
     return new_signal, stop_loss_price_arr
 
@@ -70,77 +80,197 @@ else:
 
 
 
+def _group_sum_core(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    连续分组求和核心函数，与 pandas groupby / resample 的 sum 相同：跳过空值，Kahan 补偿求和
+    """
+    out = np.zeros(len(starts))
+    for g in range(len(starts)):
+        total = 0.0
+        compensation = 0.0
+        for i in range(starts[g], ends[g]):
+            val = values[i]
+            if np.isnan(val):
+                continue
+            y = val - compensation
+            t = total + y
+            compensation = t - total - y
+            if np.isnan(compensation):
+                compensation = 0.0
+            total = t
+        out[g] = total
+    return out
+
+
+# 如果安装了 Numba，则进行 JIT 编译
+if HAS_NUMBA:
+    _group_sum_optimized = numba.jit(nopython=True)(_group_sum_core)
+else:
+    _group_sum_optimized = _group_sum_core
+
+
+# 周期K线的聚合方式 (transfer_to_period_data)，原始数据中不存在的列跳过
+PERIOD_AGG = {
+    'symbol': 'first',
+    'open':   'first',
+    'high':   'max',
+    'low':    'min',
+    'close':  'last',
+    'volume': 'sum',
+    'quote_volume': 'sum',
+    'trade_num':    'sum',
+    'taker_buy_base_asset_volume':  'sum',
+    'taker_buy_quote_asset_volume': 'sum',
+    'avg_price': 'first'
+}
+
+
+def _reduce_groups(values: np.ndarray, how: str, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    按连续分组 [starts, ends) 聚合，空值口径与 pandas resample 一致：first / last 取第一个 / 最后一个非空值，
+    max / min 忽略空值，sum 跳过空值 (补偿求和)
+    """
+    if how in ('first', 'last'):
+        valid = pd.notna(values)
+        idx = np.arange(len(values))
+        if how == 'first':
+            pick = np.minimum.reduceat(np.where(valid, idx, len(values)), starts)
+            ok = pick < ends
+        else:
+            pick = np.maximum.reduceat(np.where(valid, idx, -1), starts)
+            ok = pick >= starts
+        out = values[np.where(ok, pick, 0)]
+        if not ok.all():
+            out = out.astype(object if out.dtype == object else np.float64)
+            out[~ok] = np.nan
+        return out
+    values = values.astype(np.float64)
+    if how == 'max':
+        return np.fmax.reduceat(values, starts)
+    if how == 'min':
+        return np.fmin.reduceat(values, starts)
+    return _group_sum_optimized(values, starts, ends)
+
+
+def ragged_array(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> pd.Series:
+    """
+    由数值缓冲区和每行的区间 [starts, ends) 构造 Arrow list<double> 列 (偏移量 + 数值缓冲区，不产生 Python 列表)
+    """
+    lengths = ends - starts
+    offsets = np.r_[0, np.cumsum(lengths)]
+    # 各行区间首尾相接，拼成新的数值缓冲区
+    gather = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - starts, lengths)
+    values = pa.array(np.asarray(values, dtype=np.float64)[gather])
+    if offsets[-1] < 2 ** 31:
+        arr = pa.ListArray.from_arrays(pa.array(offsets.astype(np.int32)), values)
+    else:
+        arr = pa.LargeListArray.from_arrays(pa.array(offsets), values)
+    return pd.Series(pd.arrays.ArrowExtensionArray(arr))
+
+
+def ragged_to_numpy(series: pd.Series) -> tuple:
+    """
+    Arrow list 列拆成 (偏移量, 数值) 两个 numpy 数组，第 i 行为 values[offsets[i]:offsets[i + 1]]
+    """
+    if isinstance(series.dtype, pd.ArrowDtype):
+        arr = pa.chunked_array(pa.array(series.array)).combine_chunks()
+    else:
+        arr = pa.array([np.asarray(x, dtype=np.float64) for x in series], type=pa.list_(pa.float64()))
+    offsets = np.asarray(arr.offsets, dtype=np.int64)
+    values = np.asarray(arr.values.to_numpy(zero_copy_only=False), dtype=np.float64)
+    return offsets - offsets[0], values[offsets[0]:offsets[-1]]
+
+
+def format_kline_pct(series: pd.Series) -> pd.Series:
+    """kline_pct 列转为 '[v1 v2 ...]' 字符串写入 CSV (完整精度，与 parse_kline_pct 对应)"""
+    if not isinstance(series.dtype, pd.ArrowDtype):
+        return series
+    offsets, values = ragged_to_numpy(series)
+    text = values.astype(str)
+    return pd.Series(['[' + ' '.join(text[a:b]) + ']' for a, b in zip(offsets[:-1], offsets[1:])],
+                     index=series.index)
+
+
+def parse_kline_pct(series: pd.Series) -> pd.Series:
+    """
+    解析 CSV 中 '[v1 v2 ...]' (或 '[v1, v2, ...]') 格式的 kline_pct 列，一次解析全部数值，返回 Arrow list 列
+    数值列 (每根K线一个涨跌幅) 原样返回
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    text = series.astype(str).str.strip('[]').str.replace(',', ' ', regex=False)
+    counts = text.str.split().str.len().fillna(0).to_numpy(dtype=np.int64)
+    values = np.array(' '.join(text).split(), dtype=np.float64)
+    ends = np.cumsum(counts)
+    out = ragged_array(values, ends - counts, ends)
+    out.index = series.index
+    return out
+
+
 def transfer_to_period_data(df: pd.DataFrame, rule_type: str = '5T') -> pd.DataFrame:
     """
-    将日线数据转换为相应的周期数据
+    将分钟等细粒度K线转换为相应的周期数据，同时生成该周期的全部 offset
+    offset = k 表示周期起点整体后移 k 个单位 (单位为 rule_type 的基本单位，如 4H 的 offset=1 即 01:00、05:00 ... 开始的K线)，
+    周期起点与 pandas resample 的默认口径 (origin='start_day') 一致
+    数据只排序一次，各 offset 按周期编号切分成连续分组后用 reduceat 聚合；
+    kline_pct 为周期内每根细K线的涨跌幅，存为 Arrow list<double> 列 (偏移量 + 共享数值缓冲区)
     :param df: 原始数据
     :param rule_type: 转换周期 (e.g. '5T', '1H')
     :return: 转换后的周期数据 DataFrame
     """
-    df = df.copy() # Avoid modifying original
-    df.set_index('candle_begin_time', inplace=True)
-    df['avg_price_1m'] = df['avg_price']
-    agg_dict = {
-        'symbol': 'first',
-        'open':   'first',
-        'high':   'max',
-        'low':    'min',
-        'close':  'last',
-        'volume': 'sum',
-        'quote_volume': 'sum',
-        'trade_num':    'sum',
-        'taker_buy_base_asset_volume':  'sum',
-        'taker_buy_quote_asset_volume': 'sum',
-        'avg_price': 'first'
-    }
-    # =====转换为其他分钟数据
     # Handle deprecated 'H' -> 'h'
     resample_rule = rule_type
     if resample_rule.endswith('H'):
         resample_rule = resample_rule.replace('H', 'h')
-
-    period_df = df.resample(rule=resample_rule).agg(agg_dict)
-    # =针对重采样后数据，补全空缺的数据。保证整张表没有空余数据
-    period_df['symbol'].ffill(inplace=True)
-    # 对开、高、收、低、价格进行补全处理
-    period_df['close'].ffill(inplace=True)
-    period_df['open'].fillna(value=period_df['close'], inplace=True)
-    period_df['high'].fillna(value=period_df['close'], inplace=True)
-    period_df['low'].fillna(value=period_df['close'],  inplace=True)
-    # 将停盘时间的某些列，数据填补为0
-    fill_0_list = ['volume', 'quote_volume', 'trade_num', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume']
-    period_df.loc[:, fill_0_list] = period_df[fill_0_list].fillna(value=0)
-
-    # 用1m均价代替重采样均价
-    period_df['avg_price'] = df['avg_price_1m']
-    period_df['avg_price'].fillna(value=period_df['open'], inplace=True)
-
+    freq = pd.Timedelta(pd.tseries.frequencies.to_offset(resample_rule)).value
+
+    # 通过持仓周期来计算需要多少个offset
+    num = re.match(r'\d+', rule_type)
+    range_limit = int(num.group()) if num else 1
+    unit = freq // range_limit
+
+    if df.empty:
+        return pd.DataFrame(columns=['candle_begin_time'] + [c for c in PERIOD_AGG if c in df.columns] +
+                            ['kline_pct', 'offset'])
+
+    # =====只排序一次
+    t = df['candle_begin_time'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    order = np.argsort(t, kind='stable')
+    t = t[order]
+    cols = {c: df[c].to_numpy()[order] for c in PERIOD_AGG if c in df.columns}
     # 计算轮动所需要的每根k线涨跌幅
-    df['pct'] = df['close'].pct_change(fill_method=None)
-    df['pct'] = df['pct'].fillna(0)
-    period_df_list = []
-    # 通过持仓周期来计算需要多少个offset，遍历转换每一个offset数据
-    try:
-        range_limit = int(rule_type[:-1])
-    except ValueError:
-        range_limit = 1 # Fallback if rule_type is complex like '1D' (handle properly in real scenario)
+    pct = pd.Series(cols['close'].astype(np.float64)).pct_change(fill_method=None).fillna(0).to_numpy()
+    day = pd.Timedelta('1D').value
+    origin = (t[0] // day) * day
 
+    # =====逐个 offset 分组聚合 (数据已有序，同一周期的K线是连续的一段)
+    labels, starts_all, ends_all, offset_col = [], [], [], []
+    agg = {c: [] for c in cols}
     for offset in range(range_limit):
-        period_df_resampled = df.resample(resample_rule, offset=offset).agg(agg_dict)
-        period_df_resampled['kline_pct'] = df['pct'].resample(resample_rule, offset=offset).apply(lambda x: list(x))
-        period_df_resampled['offset'] = offset
-        period_df_resampled.reset_index(inplace=True)
-        period_df_resampled.dropna(subset=['symbol'], inplace=True)
-        period_df_list.append(period_df_resampled)
-    
+        bins = (t - origin - offset * unit) // freq
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        ends = np.r_[starts[1:], len(t)]
+        labels.append(origin + offset * unit + bins[starts] * freq)
+        starts_all.append(starts)
+        ends_all.append(ends)
+        offset_col.append(np.full(len(starts), offset))
+        for c, values in cols.items():
+            agg[c].append(_reduce_groups(values, PERIOD_AGG[c], starts, ends))
+
     # 将不同offset的数据，合并到一张表
-    if period_df_list:
-        period_df = pd.concat(period_df_list, ignore_index=True)
-        period_df.sort_values(by='candle_begin_time', inplace=True)
-        period_df.dropna(subset=['open'], inplace=True)  # 去除一天都没有交易的周期
+    labels = np.concatenate(labels)
+    order = np.argsort(labels, kind='stable')
+    period_df = pd.DataFrame({'candle_begin_time': labels[order].astype('datetime64[ns]')})
+    for c in cols:
+        period_df[c] = np.concatenate(agg[c])[order]
+    starts, ends = np.concatenate(starts_all)[order], np.concatenate(ends_all)[order]
+    period_df['kline_pct'] = ragged_array(pct, starts, ends)
+    period_df['offset'] = np.concatenate(offset_col)[order]
+
+    period_df = period_df[period_df['open'].notna()]  # 去除一天都没有交易的周期
+    if 'volume' in period_df.columns:
         period_df = period_df[period_df['volume'] > 0]  # 去除成交量为0的交易周期
-        period_df.reset_index(inplace=True,drop=True)
-    
+    period_df.reset_index(inplace=True, drop=True)
     return period_df
 
 # =====计算资金曲线
@@ -244,6 +374,192 @@ def cal_equity_curve(df: pd.DataFrame,
     return df
 
 
+def _cal_equity_curve_core(
+    pos: np.ndarray,
+    open_arr: np.ndarray,
+    high_arr: np.ndarray,
+    low_arr: np.ndarray,
+    close_arr: np.ndarray,
+    slippage: float,
+    c_rate: float,
+    leverage_rate: float,
+    min_amount: float,
+    min_margin_ratio: float,
+    state: np.ndarray
+) -> tuple:
+    """
+    资金曲线核心函数 (多参数版)，逐列复现 cal_equity_curve 的计算口径
+    :param pos: 持仓矩阵 (K线数 × 参数组数)
+    :param open_arr/high_arr/low_arr/close_arr: 价格矩阵，形状与 pos 相同 (共享行情可用 np.broadcast_to 传入)
+    :param state: (参数组数 × 7) 的账户状态，见 equity_state()。进入时为第一根K线之前的状态，
+                  处理完倒数第二根K线后写回 (最后一根K线是否平仓取决于下一根K线)，用于增量回测续算
+    :return: (equity_change矩阵, equity_curve矩阵)
+    """
+    n, k = pos.shape
+    initial_cash = 10000.0
+    equity_change = np.zeros((n, k))
+    equity_curve = np.ones((n, k))
+
+    for j in range(k):
+        contract_num = state[j, 1]
+        open_pos_price = state[j, 2]
+        cash = state[j, 3]
+        liquidated = state[j, 4] != 0
+        prev_net_value = state[j, 5]
+        curve = state[j, 6]
+
+        for i in range(n):
+            p = pos[i, j]
+            prev_p = pos[i - 1, j] if i > 0 else state[j, 0]
+            next_p = pos[i + 1, j] if i < n - 1 else np.nan
+
+            # 开仓、平仓K线 (与上一根/下一根持仓方向不同)
+            is_open = p != 0 and p != prev_p
+            is_close = p != 0 and p != next_p
+
+            if p == 0:
+                # 空仓：不持有合约，净值为空
+                contract_num = np.nan
+                open_pos_price = np.nan
+                cash = np.nan
+                liquidated = False
+                net_value = np.nan
+            else:
+                # 开仓时按开盘价计算合约张数、开仓价格 (含滑点) 和扣除手续费后的保证金
+                if is_open:
+                    contract_num = np.floor(initial_cash * leverage_rate / (min_amount * open_arr[i, j]))
+                    open_pos_price = open_arr[i, j] * (1 + slippage * p)
+                    cash = initial_cash - open_pos_price * min_amount * contract_num * c_rate
+                    liquidated = False
+
+                # 持仓盈亏，平仓K线按下根K线开盘价 (含滑点) 结算
+                if is_close:
+                    next_open = open_arr[i + 1, j] if i < n - 1 else np.nan
+                    if np.isnan(next_open):
+                        next_open = close_arr[i, j]
+                    close_pos_price = next_open * (1 - slippage * p)
+                    close_pos_fee = close_pos_price * min_amount * contract_num * c_rate
+                    profit = min_amount * contract_num * (close_pos_price - open_pos_price) * p
+                else:
+                    close_pos_fee = 0.0
+                    profit = min_amount * contract_num * (close_arr[i, j] - open_pos_price) * p
+                net_value = cash + profit
+
+                # 爆仓判断：以K线内最不利价格计算保证金率
+                if p == 1:
+                    price_min = low_arr[i, j]
+                elif p == -1:
+                    price_min = high_arr[i, j]
+                else:
+                    price_min = np.nan
+                profit_min = min_amount * contract_num * (price_min - open_pos_price) * p
+                net_value_min = cash + profit_min
+                margin_ratio = np.divide(net_value_min, min_amount * contract_num * price_min)
+                if margin_ratio <= (min_margin_ratio + c_rate):
+                    liquidated = True
+
+                # 平仓时扣除手续费，平仓后净值为负同样视为爆仓
+                if is_close:
+                    net_value -= close_pos_fee
+                    if net_value < 0:
+                        liquidated = True
+
+                # 爆仓之后，本笔交易剩余K线净值均为0
+                if liquidated:
+                    net_value = 0.0
+
+            # 资金曲线涨跌幅：开仓K线相对初始资金，其余相对上一根K线净值
+            if is_open:
+                change = net_value / initial_cash - 1
+            else:
+                change = np.divide(net_value, prev_net_value) - 1
+            if np.isnan(change):
+                change = 0.0
+            curve *= 1 + change
+
+            equity_change[i, j] = change
+            equity_curve[i, j] = curve
+            prev_net_value = net_value
+
+            if i == n - 2:
+                state[j, 0] = p
+                state[j, 1] = contract_num
+                state[j, 2] = open_pos_price
+                state[j, 3] = cash
+                state[j, 4] = 1.0 if liquidated else 0.0
+                state[j, 5] = prev_net_value
+                state[j, 6] = curve
+
+    return equity_change, equity_curve
+
+# 如果安装了 Numba，则进行 JIT 编译 (error_model='numpy' 保持除零时与 pandas 一致返回 inf/nan)
+if HAS_NUMBA:
+    _cal_equity_curve_optimized = numba.jit(nopython=True, error_model='numpy')(_cal_equity_curve_core)
+else:
+    _cal_equity_curve_optimized = _cal_equity_curve_core
+
+
+def equity_state(k: int = 1) -> np.ndarray:
+    """
+    资金曲线的初始账户状态，每行对应一组参数：
+    [上一根K线持仓, 合约张数, 开仓价, 保证金, 是否爆仓, 上一根K线净值, 资金曲线]
+    """
+    state = np.full((k, 7), np.nan)
+    state[:, 4] = 0.0
+    state[:, 6] = 1.0
+    return state
+
+
+def stop_loss_state() -> np.ndarray:
+    """止损的初始状态：[持仓方向, 开仓价]，即空仓"""
+    return np.array([0.0, np.nan])
+
+
+def cal_equity_curve_batch(pos: np.ndarray,
+                           open_arr: np.ndarray,
+                           high_arr: np.ndarray,
+                           low_arr: np.ndarray,
+                           close_arr: np.ndarray,
+                           slippage: float = 1 / 1000,
+                           c_rate: float = 5 / 10000,
+                           leverage_rate: float = 3,
+                           min_amount: float = 0.01,
+                           min_margin_ratio: float = 1 / 100,
+                           state: np.ndarray = None) -> tuple:
+    """
+    一次性计算多组参数的资金曲线，口径与 cal_equity_curve 完全一致
+    :param pos: 持仓矩阵 (K线数 × 参数组数)，一维数组视为单组参数
+    :param open_arr: 开盘价，一维 (各参数共享同一份行情) 或与 pos 同形状的二维数组
+    :param high_arr: 最高价
+    :param low_arr: 最低价
+    :param close_arr: 收盘价
+    :param slippage: 滑点
+    :param c_rate: 手续费率
+    :param leverage_rate: 杠杆倍数
+    :param min_amount: 最小下单量
+    :param min_margin_ratio: 最低保证金率
+    :param state: (参数组数 × 7) 的账户状态 (equity_state())，从该状态接着计算并原地更新为倒数第二根K线之后的状态；
+                  None 表示从空仓、净值1开始
+    :return: (equity_change矩阵, equity_curve矩阵)，形状均为 (K线数 × 参数组数)
+    """
+    pos = np.asarray(pos, dtype=np.float64)
+    if pos.ndim == 1:
+        pos = pos.reshape(-1, 1)
+    shape = pos.shape
+
+    def _as_matrix(arr):
+        arr = np.asarray(arr, dtype=np.float64)
+        if arr.ndim == 1:
+            arr = np.broadcast_to(arr.reshape(-1, 1), shape)
+        return arr
+
+    if state is None:
+        state = equity_state(shape[1])
+    return _cal_equity_curve_optimized(
+        pos, _as_matrix(open_arr), _as_matrix(high_arr), _as_matrix(low_arr), _as_matrix(close_arr),
+        float(slippage), float(c_rate), float(leverage_rate), float(min_amount), float(min_margin_ratio), state
+    )
+
 
 def process_stop_loss_close(df: pd.DataFrame, stop_loss_pct: float, leverage_rate: float) -> pd.DataFrame:
     """
@@ -265,7 +581,7 @@ def process_stop_loss_close(df: pd.DataFrame, stop_loss_pct: float, leverage_rat
     
     # 调用 Numba 加速函数 (或纯 Python 函数)
     new_signal, stop_loss_price_arr = _process_stop_loss_optimized(
-        open_arr, close_arr, signal_arr, stop_loss_pct, leverage_rate
+        open_arr, close_arr, signal_arr, stop_loss_pct, leverage_rate, stop_loss_state()
     )
     
     # 将结果写回 DataFrame
@@ -274,6 +590,39 @@ def process_stop_loss_close(df: pd.DataFrame, stop_loss_pct: float, leverage_rat
     
     return df
 
+def process_stop_loss_batch(open_arr: np.ndarray, close_arr: np.ndarray, signal: np.ndarray,
+                            stop_loss_pct: float, leverage_rate: float) -> np.ndarray:
+    """
+    止损函数的矩阵版本：逐列处理 (K线数 × 参数组数) 的 signal 矩阵，口径与 process_stop_loss_close 一致
+    :return: 止损后的 signal 矩阵
+    """
+    open_arr = np.asarray(open_arr, dtype=np.float64)
+    close_arr = np.asarray(close_arr, dtype=np.float64)
+    signal = np.asarray(signal, dtype=np.float64)
+    new_signal = np.empty(signal.shape, order='F')
+    for j in range(signal.shape[1]):
+        new_signal[:, j] = _process_stop_loss_optimized(
+            open_arr, close_arr, np.ascontiguousarray(signal[:, j]), stop_loss_pct, leverage_rate, stop_loss_state()
+        )[0]
+    return new_signal
+
+
+def shift_array(arr, periods: int = 1) -> np.ndarray:
+    """
+    与 Series.shift 相同的平移 (沿K线方向，空位填 NaN)，支持一维数组和 (K线数 × 参数组数) 矩阵
+    """
+    arr = np.asarray(arr, dtype=np.float64)
+    out = np.full_like(arr, np.nan)
+    if periods == 0:
+        out[:] = arr
+    elif abs(periods) < len(arr):
+        if periods > 0:
+            out[periods:] = arr[:-periods]
+        else:
+            out[:periods] = arr[-periods:]
+    return out
+
+
 def write_file(content: str, path: str):
     """
     写入文件
@@ -0,0 +1,113 @@
+"""
+行情缺口索引
+- 每个 (币种, 周期) 一个 JSON 文件，记录缺失的K线区间 [第一根缺失K线, 最后一根缺失K线] 及已尝试补数的次数
+- 下载脚本只对索引中的区间补数并原地合并，不再因为中间缺了几根K线就整段重新下载
+- 交易所本身没有数据的区间 (如停机维护) 在尝试 max_attempts 次后不再请求
+"""
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Tuple, Union
+
+import pandas as pd
+
+
+@dataclass
+class Gap:
+    """一个缺失区间 (两端都是缺失的K线开盘时间)"""
+    start: pd.Timestamp
+    end: pd.Timestamp
+    attempts: int = 0
+
+
+def find_gaps(times: Iterable, step: pd.Timedelta) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    已排序、无重复的K线时间中缺失的区间
+    :return: [(第一根缺失K线, 最后一根缺失K线), ...]；相邻两根间隔不足两个周期 (时间未对齐) 的不算缺口
+    """
+    times = pd.Series(pd.to_datetime(list(times)), dtype='datetime64[ns]')
+    prev = times.shift()
+    jump = (times - prev) >= 2 * step
+    return [(a + step, b - step) for a, b in zip(prev[jump], times[jump])]
+
+
+def missing_ranges(times: pd.Series, start, end, step: pd.Timedelta) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """[start, end] 内仍缺失的区间 (times 为已有K线的时间)"""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    inside = times[(times >= start) & (times <= end)].drop_duplicates().sort_values().tolist()
+    return find_gaps([start - step] + inside + [end + step], step)
+
+
+class GapIndex:
+    """
+    缺口索引文件
+    用法：
+        index = GapIndex('data/market_store/rule_type=1H/symbol=BTC-USDT/_gaps.json', pd.Timedelta(hours=1))
+        index.add([(a, b)])
+        for gap in index.pending(max_attempts=3):
+            ...  # 下载 [gap.start, gap.end] 并合并
+            index.resolve(gap, 仍缺失的区间)
+    """
+
+    def __init__(self, path: Union[str, Path], step: pd.Timedelta):
+        self.path = Path(path)
+        self.step = step
+
+    def exists(self) -> bool:
+        """索引是否已建立 (建立后没有缺口时为空列表)"""
+        return self.path.exists()
+
+    def load(self) -> List[Gap]:
+        if not self.path.exists():
+            return []
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        return [Gap(pd.Timestamp(g['start']), pd.Timestamp(g['end']), g.get('attempts', 0)) for g in data['gaps']]
+
+    def save(self, gaps: List[Gap]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {'gaps': [{'start': g.start.isoformat(), 'end': g.end.isoformat(), 'attempts': g.attempts}
+                         for g in sorted(gaps, key=lambda g: g.start)]}
+        tmp = self.path.parent / f'.{self.path.name}-{uuid.uuid4().hex[:8]}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        """数据整体重写后清空 (索引仍视为已建立)"""
+        self.save([])
+
+    def add(self, ranges: Iterable[Tuple[pd.Timestamp, pd.Timestamp]]) -> List[Gap]:
+        """
+        记录新发现的缺口：已在索引中的区间保持原有的尝试次数 (重新扫描不会让补不到的缺口无限重试)，
+        其余与已有区间重叠或相接的合并，尝试次数取较小值
+        :return: 合并后的全部缺口
+        """
+        known = self.load()
+        new = [Gap(pd.Timestamp(a), pd.Timestamp(b)) for a, b in ranges]
+        new = [g for g in new if not any(k.start <= g.start and g.end <= k.end for k in known)]
+        if not new and self.exists():
+            return known
+        gaps = sorted(known + new, key=lambda g: g.start)
+        merged = []
+        for g in gaps:
+            if merged and g.start <= merged[-1].end + self.step:
+                last = merged[-1]
+                last.end = max(last.end, g.end)
+                last.attempts = min(last.attempts, g.attempts)
+            else:
+                merged.append(g)
+        self.save(merged)
+        return merged
+
+    def pending(self, max_attempts: int = 3) -> List[Gap]:
+        """尚需补数的缺口 (尝试次数未达上限)"""
+        return [g for g in self.load() if g.attempts < max_attempts]
+
+    def resolve(self, gap: Gap, remaining: Iterable[Tuple[pd.Timestamp, pd.Timestamp]]) -> None:
+        """一次补数之后，用仍缺失的区间替换 gap，尝试次数加一"""
+        gaps = [g for g in self.load() if (g.start, g.end) != (gap.start, gap.end)]
+        gaps += [Gap(pd.Timestamp(a), pd.Timestamp(b), gap.attempts + 1) for a, b in remaining]
+        self.save(gaps)
@@ -0,0 +1,117 @@
+"""
+带缓存的常用指标 (MA / EMA / ATR / RSI / 唐奇安通道)
+参数扫描时同一币种的各组参数、各个因子会反复计算相同周期的指标，这里按
+(行情指纹, 指标名, 参数) 缓存计算结果，每个指标序列在一个进程内只计算一次
+缓存为 cta_api.cache.indicator_cache (LRU，带内存预算)，命中统计见 indicator_cache_stats()
+
+用法 (因子内)：
+    from cta_api.indicators import ema
+    df['ema_short'] = ema(df, short_period)
+    df['kama'] = cached_indicator(df, 'kama', (period,), lambda: kama(df['close'], period))
+"""
+import hashlib
+from typing import Callable, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from cta_api.cache import indicator_cache
+from cta_api.rolling import rolling_max_min
+
+
+def data_fingerprint(df: pd.DataFrame, columns: Sequence[str]) -> tuple:
+    """
+    行情数据指纹
+    引擎加载的数据带有 attrs['data_key'] (币种、周期、offset、数据版本、数据根目录)，直接使用；
+    否则对用到的列做哈希。两种情况都带上行数和首尾索引，切片后的数据不会与原数据混用
+    """
+    n = len(df)
+    bounds = (n, df.index[0], df.index[-1]) if n else (0,)
+    data_key = df.attrs.get('data_key')
+    if data_key is not None:
+        return (data_key,) + bounds
+    h = hashlib.blake2b(digest_size=16)
+    for c in columns:
+        h.update(np.ascontiguousarray(df[c].to_numpy(dtype=np.float64)).view(np.uint8))
+    return (h.hexdigest(),) + bounds
+
+
+def _freeze(values) -> np.ndarray:
+    """缓存中的数组设为只读，避免调用方原地修改污染缓存"""
+    arr = np.array(values, dtype=np.float64)
+    arr.flags.writeable = False
+    return arr
+
+
+def cached_indicator(df: pd.DataFrame, name: str, params: tuple, func: Callable[[], object],
+                     columns: Sequence[str] = ('close',)) -> Union[pd.Series, Tuple[pd.Series, ...]]:
+    """
+    通用的指标缓存入口
+    :param df: 行情数据
+    :param name: 指标名，与 params 一起区分不同指标
+    :param params: 指标参数 (可哈希)
+    :param func: 无参函数，返回一个序列或序列组成的 tuple
+    :param columns: 指标依赖的原始列，用于计算指纹
+    :return: 与 df 同索引的 Series (func 返回 tuple 时为 Series 组成的 tuple)
+    """
+    key = (data_fingerprint(df, columns), name, tuple(columns), tuple(params))
+
+    def _compute():
+        out = func()
+        if isinstance(out, tuple):
+            return tuple(_freeze(v) for v in out)
+        return _freeze(out)
+
+    values = indicator_cache.get_or_compute(key, _compute)
+    if isinstance(values, tuple):
+        return tuple(pd.Series(v, index=df.index) for v in values)
+    return pd.Series(values, index=df.index)
+
+
+def ma(df: pd.DataFrame, period: int, column: str = 'close', min_periods: int = 1) -> pd.Series:
+    """简单移动平均：df[column].rolling(period, min_periods).mean()"""
+    return cached_indicator(df, 'ma', (period, min_periods),
+                            lambda: df[column].rolling(window=period, min_periods=min_periods).mean(),
+                            columns=(column,))
+
+
+def ema(df: pd.DataFrame, period: int, column: str = 'close') -> pd.Series:
+    """指数移动平均：df[column].ewm(span=period, adjust=False).mean()"""
+    return cached_indicator(df, 'ema', (period,),
+                            lambda: df[column].ewm(span=period, adjust=False).mean(),
+                            columns=(column,))
+
+
+def atr(df: pd.DataFrame, period: int, min_periods: int = None) -> pd.Series:
+    """
+    平均真实波幅：TR = max(最高-最低, |最高-前收|, |最低-前收|) 的 period 期简单平均
+    第一根K线没有前收，TR 为空
+    """
+    def _compute():
+        prev_close = df['close'].shift(1)
+        tr = np.maximum(df['high'] - df['low'],
+                        np.maximum(abs(df['high'] - prev_close), abs(df['low'] - prev_close)))
+        return tr.rolling(window=period, min_periods=min_periods).mean()
+    return cached_indicator(df, 'atr', (period, min_periods), _compute, columns=('high', 'low', 'close'))
+
+
+def rsi(df: pd.DataFrame, period: int, column: str = 'close') -> pd.Series:
+    """相对强弱指标：涨幅、跌幅分别取 period 期简单平均 (min_periods=1)，RSI = 100 - 100 / (1 + 涨幅/跌幅)"""
+    def _compute():
+        delta = df[column].diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=period, min_periods=1).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=period, min_periods=1).mean()
+        return 100 - (100 / (1 + gain / loss))
+    return cached_indicator(df, 'rsi', (period,), _compute, columns=(column,))
+
+
+def donchian(df: pd.DataFrame, period: int, min_periods: int = 1) -> Tuple[pd.Series, pd.Series]:
+    """唐奇安通道：period 期最高价的最大值、最低价的最小值"""
+    return cached_indicator(df, 'donchian', (period, min_periods),
+                            lambda: rolling_max_min(df['high'], df['low'], period, min_periods=min_periods),
+                            columns=('high', 'low'))
+
+
+def indicator_cache_stats() -> dict:
+    """指标缓存的条目数、占用内存和命中率"""
+    return indicator_cache.stats()
@@ -0,0 +1,531 @@
+import json
+import os
+import shutil
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from cta_api.gap_index import Gap, GapIndex, find_gaps, missing_ranges
+
+# 回测使用的行情列 (0_1_数据转换 / 追加下载写入的列)
+STORE_COLUMNS = ['candle_begin_time', 'open', 'high', 'low', 'close', 'volume', 'quote_volume', 'trade_num',
+                 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'taker_sell_quote_asset_volume',
+                 'offset', 'kline_pct']
+
+# 每个 row group 的行数：按时间排序写入，row group 的 candle_begin_time 统计信息可用于谓词下推
+ROW_GROUP_SIZE = 8192
+
+MONTH_FORMAT = '%Y-%m'
+
+# 紧凑存储格式 (compact=True)：价格列保持 float64 (无损)，成交量类列存 float32，成交笔数存 int32，时间存 int64 纳秒，
+# 可由其他列推出的 offset (全为 0 时) 和 kline_pct (逐根涨跌幅时) 不落盘，读取时由引擎补全
+COMPACT_TYPES = {
+    'volume': 'float32',
+    'quote_volume': 'float32',
+    'taker_buy_base_asset_volume': 'float32',
+    'taker_buy_quote_asset_volume': 'float32',
+    'taker_sell_quote_asset_volume': 'float32',
+    'trade_num': 'int32',
+}
+
+# 追加写入 (append) 的文件名前缀：month=2024-05/part-<第一根K线的纳秒时间>.parquet
+PART_PREFIX = 'part-'
+
+# 单个月份的追加文件数超过该值时合并为 data.parquet，避免小文件过多拖慢读取
+MAX_PARTS = 32
+
+# 高水位线索引文件 (每个币种目录下一个)，记录已存储的最后一根K线，增量更新时不需要读取数据文件
+HWM_FILE = '_hwm.json'
+
+# 缺口索引文件 (每个币种目录下一个，见 cta_api.gap_index)
+GAPS_FILE = '_gaps.json'
+
+# 内存映射快照目录 (相对于存储根目录)，每个币种一个未压缩的 Arrow IPC 文件
+SNAPSHOT_DIR = '_mmap'
+
+
+@dataclass
+class AppendResult:
+    """append 的结果"""
+    rows: int = 0
+    first: Optional[pd.Timestamp] = None
+    last: Optional[pd.Timestamp] = None
+    # 新数据内部及与高水位线之间缺失的区间 [(第一根缺失K线, 最后一根缺失K线), ...]
+    gaps: List[Tuple[pd.Timestamp, pd.Timestamp]] = field(default_factory=list)
+
+
+def arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """Arrow 表转 DataFrame，list 列 (kline_pct) 保持为 Arrow 列，不展开成逐行的数组对象"""
+    return table.to_pandas(
+        types_mapper=lambda t: pd.ArrowDtype(t) if pa.types.is_list(t) or pa.types.is_large_list(t) else None)
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """转换为紧凑存储格式 (见 COMPACT_TYPES)"""
+    df = df.copy()
+    df['candle_begin_time'] = df['candle_begin_time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    for col, dtype in COMPACT_TYPES.items():
+        if col not in df.columns:
+            continue
+        values = pd.to_numeric(df[col], errors='coerce')
+        # 有缺失值或非整数的成交笔数无法存为整数，退回 float32
+        if dtype == 'int32' and not (values.notna().all() and (values % 1 == 0).all()):
+            dtype = 'float32'
+        df[col] = values.astype(dtype)
+    if 'offset' in df.columns and (df['offset'] == 0).all():
+        df = df.drop(columns='offset')
+    if 'kline_pct' in df.columns and not isinstance(df['kline_pct'].dtype, pd.ArrowDtype):
+        df = df.drop(columns='kline_pct')
+    return df
+
+
+def upcast_frame(df: pd.DataFrame, deep: bool = True) -> pd.DataFrame:
+    """
+    紧凑格式的行情转回回测使用的 float64：不足 64 位的数值列转为 float64，其余列原样复制
+    :param deep: False 时 float64 列不复制 (内存映射的只读列)
+    """
+    narrow = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])
+              and not isinstance(df[c].dtype, pd.ArrowDtype) and df[c].dtype.itemsize < 8]
+    out = df.copy(deep=deep)
+    if narrow:
+        out = out.astype({c: np.float64 for c in narrow}, copy=False)
+    return out
+
+
+def _restore_time(df: pd.DataFrame) -> pd.DataFrame:
+    """紧凑格式的 int64 纳秒时间还原为 datetime64 (同一块内存的视图)"""
+    if 'candle_begin_time' in df.columns and pd.api.types.is_integer_dtype(df['candle_begin_time']):
+        df['candle_begin_time'] = df['candle_begin_time'].to_numpy().view('datetime64[ns]')
+    return df
+
+
+def mapped_frame(table: pa.Table) -> pd.DataFrame:
+    """
+    由内存映射的 Arrow 表构造 DataFrame，无缺失值的数值 / 时间列直接引用映射的缓冲区 (只读，零拷贝)
+    因子新增列不受影响；对原始列做 inplace 修改会报错，而不会改动快照文件
+    """
+    columns = {}
+    for name, col in zip(table.column_names, table.columns):
+        if pa.types.is_list(col.type) or pa.types.is_large_list(col.type):
+            columns[name] = pd.array(col, dtype=pd.ArrowDtype(col.type))
+        elif col.num_chunks == 1 and col.null_count == 0 and (
+                pa.types.is_floating(col.type) or pa.types.is_integer(col.type) or pa.types.is_timestamp(col.type)):
+            columns[name] = col.chunk(0).to_numpy(zero_copy_only=True)
+        else:
+            columns[name] = col.to_pandas()
+    return _restore_time(pd.DataFrame(columns, copy=False))
+
+
+def _time_scalar(value: pd.Timestamp, time_type: pa.DataType) -> pa.Scalar:
+    """与时间列同类型的比较值 (紧凑格式的时间列为 int64 纳秒)"""
+    if pa.types.is_integer(time_type):
+        return pa.scalar(value.value, type=time_type)
+    return pa.scalar(value, type=time_type)
+
+
+def _column_values(table: pa.Table, name: str) -> np.ndarray:
+    """单个 chunk 的列直接取映射缓冲区的视图"""
+    col = table.column(name)
+    return col.chunk(0).to_numpy() if col.num_chunks == 1 else col.to_numpy()
+
+
+class MarketStore:
+    """
+    行情分区存储 (Parquet，按周期 / 币种 / 月份分区)
+    目录结构为 rule_type=1H/symbol=BTC-USDT/month=2023-01/data.parquet，每个文件内按 candle_begin_time 排序
+    (增量追加的K线先写成同目录下的 part-*.parquet，文件数过多时再合并进 data.parquet)
+    读取：先按月份裁剪文件，再用 candle_begin_time 条件跳过无关的 row group，只解码需要的列
+    写入：write 整体替换某个币种，update 只重写新数据涉及的月份，append 只追加高水位线之后的K线 (不读取已有数据)，
+         单个文件先写临时文件再替换，读取方不会读到半个文件
+    内存映射：read_mapped 读取由分区数据生成的未压缩 Arrow IPC 快照 (按 offset、时间排序)，
+         同一主机上的多个进程共享系统页缓存，不再各自持有一份解码后的数据
+    用法：
+        store = MarketStore('data/market_store')
+        store.write(df, 'BTC-USDT', '1H')
+        store.append(new_bars, 'BTC-USDT', '1H', step=pd.Timedelta(hours=1))
+        store.read('BTC-USDT', '1H', start='2023-01-01', end='2023-12-31', columns=['close'])
+    """
+
+    def __init__(self, root: Union[str, Path], row_group_size: int = ROW_GROUP_SIZE, compact: bool = False,
+                 max_parts: int = MAX_PARTS):
+        """
+        :param compact: 写入时使用紧凑格式 (见 COMPACT_TYPES)，读取时两种格式都能识别
+        :param max_parts: 单个月份追加文件数的上限，超过后合并
+        """
+        self.root = Path(root)
+        self.row_group_size = row_group_size
+        self.compact = compact
+        self.max_parts = max_parts
+
+    # ===== 路径 =====
+    def symbol_dir(self, symbol: str, rule_type: str) -> Path:
+        return self.root / f'rule_type={rule_type.upper()}' / f'symbol={symbol}'
+
+    def exists(self, symbol: str, rule_type: str) -> bool:
+        """该币种该周期是否已有数据"""
+        return bool(self._month_files(symbol, rule_type))
+
+    def symbols(self, rule_type: str) -> List[str]:
+        """某周期下已有数据的币种"""
+        rule_dir = self.root / f'rule_type={rule_type.upper()}'
+        if not rule_dir.exists():
+            return []
+        return sorted(p.name.split('=', 1)[1] for p in rule_dir.iterdir()
+                      if p.is_dir() and p.name.startswith('symbol=') and any(p.glob('month=*/*.parquet')))
+
+    def months(self, symbol: str, rule_type: str) -> List[str]:
+        """已有数据的月份，如 ['2023-01', '2023-02']"""
+        return list(self._month_files(symbol, rule_type))
+
+    def version(self, symbol: str, rule_type: str) -> tuple:
+        """
+        数据版本：各月份文件的 (文件数, 最大 mtime)，任一月份被重写后都会变化，用作行情缓存的 key
+        """
+        files = [f for month in self._month_files(symbol, rule_type).values() for f in month]
+        return len(files), max((f.stat().st_mtime_ns for f in files), default=0)
+
+    def _month_files(self, symbol: str, rule_type: str) -> dict:
+        """{月份: [文件路径]}，按月份排序；每个月份先是合并后的 data.parquet，再是按时间排序的追加文件"""
+        sym_dir = self.symbol_dir(symbol, rule_type)
+        if not sym_dir.exists():
+            return {}
+        files = {}
+        for p in sym_dir.iterdir():
+            if not p.name.startswith('month='):
+                continue
+            month = sorted(p.glob(f'{PART_PREFIX}*.parquet'))
+            if (p / 'data.parquet').exists():
+                month.insert(0, p / 'data.parquet')
+            if month:
+                files[p.name.split('=', 1)[1]] = month
+        return dict(sorted(files.items()))
+
+    # ===== 写入 =====
+    def write(self, df: pd.DataFrame, symbol: str, rule_type: str) -> int:
+        """
+        整体替换某个币种某个周期的数据 (0_1_数据转换 重新转换时使用)
+        :return: 写入行数
+        """
+        sym_dir = self.symbol_dir(symbol, rule_type)
+        if sym_dir.exists():
+            shutil.rmtree(sym_dir)
+        return self._write_months(df, symbol, rule_type)
+
+    def update(self, df: pd.DataFrame, symbol: str, rule_type: str) -> int:
+        """
+        合并新数据：只重写 df 涉及的月份，同一 (candle_begin_time, offset) 以新数据为准，其余月份不动
+        :return: 写入行数
+        """
+        if df.empty:
+            return 0
+        files = self._month_files(symbol, rule_type)
+        months = df['candle_begin_time'].dt.strftime(MONTH_FORMAT)
+        old = [_restore_time(arrow_to_pandas(pq.read_table(f))) for m in months.unique() for f in files.get(m, [])]
+        if old:
+            keys = ['candle_begin_time', 'offset'] if 'offset' in df.columns else ['candle_begin_time']
+            # 紧凑格式不保存全为 0 的 offset 列
+            old = [x.assign(offset=0) if 'offset' in keys and 'offset' not in x.columns else x for x in old]
+            df = pd.concat([upcast_frame(x, deep=False) for x in old] + [df], ignore_index=True)
+            df = df.drop_duplicates(keys, keep='last')
+        return self._write_months(df, symbol, rule_type)
+
+    def _write_months(self, df: pd.DataFrame, symbol: str, rule_type: str) -> int:
+        if df.empty:
+            return 0
+        sort_cols = ['candle_begin_time', 'offset'] if 'offset' in df.columns else ['candle_begin_time']
+        df = df.sort_values(sort_cols, kind='stable').reset_index(drop=True)
+        months = df['candle_begin_time'].dt.strftime(MONTH_FORMAT)
+        table = pa.Table.from_pandas(compact_frame(df) if self.compact else df, preserve_index=False)
+        sym_dir = self.symbol_dir(symbol, rule_type)
+
+        # 已按时间排序，同一月份的行是连续的
+        bounds = months.ne(months.shift()).to_numpy().nonzero()[0].tolist() + [len(df)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            month_dir = sym_dir / f'month={months.iat[start]}'
+            month_dir.mkdir(parents=True, exist_ok=True)
+            tmp = month_dir / f'.data-{uuid.uuid4().hex[:8]}.tmp'
+            pq.write_table(table.slice(start, end - start), tmp, row_group_size=self.row_group_size)
+            os.replace(tmp, month_dir / 'data.parquet')
+            # 追加文件的数据已合并进 data.parquet
+            for part in month_dir.glob(f'{PART_PREFIX}*.parquet'):
+                part.unlink()
+        self._advance_hwm(df, symbol, rule_type)
+        return len(df)
+
+    def append(self, df: pd.DataFrame, symbol: str, rule_type: str,
+               step: Optional[pd.Timedelta] = None) -> AppendResult:
+        """
+        追加新K线：只保留晚于高水位线的行，写成所在月份的一个新文件，不读取、不重写已有数据
+        只校验新数据本身及其与高水位线的衔接，缺口记录在返回值和缺口索引中；
+        K线数据缺少 offset / kline_pct 列时补全，第一根的涨跌幅用高水位线处的收盘价计算 (其他数据如持仓量原样写入)
+        某月份的追加文件超过 max_parts 个时合并为 data.parquet
+        :param step: K线周期，用于检查连续性，None 表示不检查
+        """
+        df = df.dropna(subset=['candle_begin_time'])
+        df = df.drop_duplicates('candle_begin_time', keep='last').sort_values('candle_begin_time')
+        hwm = self.high_water_mark(symbol, rule_type)
+        if hwm is not None:
+            df = df[df['candle_begin_time'] > hwm['last']]
+        if df.empty:
+            return AppendResult()
+        df = df.reset_index(drop=True)
+        if 'offset' not in df.columns and 'close' in df.columns:
+            df['offset'] = 0
+        if 'kline_pct' not in df.columns and 'close' in df.columns:
+            close = pd.to_numeric(df['close'], errors='coerce')
+            pct = close.pct_change()
+            if hwm is not None and hwm.get('close'):
+                pct.iat[0] = close.iat[0] / hwm['close'] - 1
+            df['kline_pct'] = pct.fillna(0.0)
+
+        times = df['candle_begin_time']
+        result = AppendResult(rows=len(df), first=times.iat[0], last=times.iat[-1])
+        if step is not None:
+            result.gaps = find_gaps(([hwm['last']] if hwm is not None else []) + times.tolist(), step)
+            if result.gaps:
+                self.gap_index(symbol, rule_type, step).add(result.gaps)
+
+        months = times.dt.strftime(MONTH_FORMAT)
+        files = self._month_files(symbol, rule_type)
+        table = pa.Table.from_pandas(compact_frame(df) if self.compact else df, preserve_index=False)
+        if files:
+            # 与已有文件保持相同的 schema，同一月份的文件才能作为一个 dataset 读取
+            schema = pq.read_schema(next(reversed(files.values()))[-1]).remove_metadata()
+            try:
+                table = pa.Table.from_arrays(
+                    [table.column(f.name).cast(f.type) if f.name in table.column_names else pa.nulls(len(table), f.type)
+                     for f in schema], schema=schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                # 类型无法无损转换 (如紧凑格式的整数列遇到缺失值)：退回按月份合并重写
+                self.update(df, symbol, rule_type)
+                return result
+
+        sym_dir = self.symbol_dir(symbol, rule_type)
+        bounds = months.ne(months.shift()).to_numpy().nonzero()[0].tolist() + [len(df)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            month_dir = sym_dir / f'month={months.iat[start]}'
+            month_dir.mkdir(parents=True, exist_ok=True)
+            # 文件名带第一根K线的时间，按文件名排序即按时间排序
+            name = f'{PART_PREFIX}{times.iat[start].value:020d}.parquet'
+            tmp = month_dir / f'.{name}-{uuid.uuid4().hex[:8]}.tmp'
+            pq.write_table(table.slice(start, end - start), tmp, row_group_size=self.row_group_size)
+            os.replace(tmp, month_dir / name)
+            parts = sum(f.name.startswith(PART_PREFIX) for f in files.get(months.iat[start], [])) + 1
+            if parts > self.max_parts:
+                self.compact_month(symbol, rule_type, months.iat[start])
+        self._advance_hwm(df, symbol, rule_type)
+        return result
+
+    def compact_month(self, symbol: str, rule_type: str, month: str) -> int:
+        """把某月份的 data.parquet 和追加文件合并为一个 data.parquet"""
+        files = self._month_files(symbol, rule_type).get(month, [])
+        if not any(f.name.startswith(PART_PREFIX) for f in files):
+            return 0
+        df = pd.concat([_restore_time(arrow_to_pandas(pq.read_table(f))) for f in files], ignore_index=True)
+        keys = ['candle_begin_time', 'offset'] if 'offset' in df.columns else ['candle_begin_time']
+        return self._write_months(upcast_frame(df, deep=False).drop_duplicates(keys, keep='last'), symbol, rule_type)
+
+    # ===== 缺口 =====
+    def gap_index(self, symbol: str, rule_type: str, step: pd.Timedelta) -> GapIndex:
+        """该币种该周期的缺口索引 (write 整体替换数据时随目录一起删除)"""
+        return GapIndex(self.symbol_dir(symbol, rule_type) / GAPS_FILE, step)
+
+    def scan_gaps(self, symbol: str, rule_type: str, step: pd.Timedelta) -> List[Gap]:
+        """
+        扫描已有数据 (只读取 offset 0 的时间列) 建立缺口索引，用于索引建立之前写入的数据
+        :return: 全部缺口
+        """
+        index = self.gap_index(symbol, rule_type, step)
+        if not self.exists(symbol, rule_type):
+            return []
+        times = self.read(symbol, rule_type, columns=[], offset=0)['candle_begin_time']
+        ranges = find_gaps(times.drop_duplicates(), step)
+        if not ranges:
+            if not index.exists():
+                index.clear()
+            return index.load()
+        return index.add(ranges)
+
+    def fill_gap(self, df: pd.DataFrame, symbol: str, rule_type: str, step: pd.Timedelta, gap: Gap) -> list:
+        """
+        用补数下载的 df 填补一个缺口：只合并 gap 内的K线，重新计算缺口内及其后一根K线的 kline_pct，
+        只重写涉及的月份；再用缺口前后的K线重新校验，缺口索引中以仍缺失的区间替换 gap (尝试次数加一)
+        :return: 仍缺失的区间
+        """
+        lo, hi = gap.start - step, gap.end + step
+        around = self.read(symbol, rule_type, start=lo, end=hi, offset=0)
+        if df is not None and not df.empty:
+            df = df[(df['candle_begin_time'] >= gap.start) & (df['candle_begin_time'] <= gap.end)]
+        if df is not None and not df.empty and not around.empty:
+            df = df[[c for c in around.columns if c in df.columns]]
+            if 'offset' in around.columns:
+                df = df.assign(offset=0)
+            merged = pd.concat([upcast_frame(around, deep=False), df], ignore_index=True)
+            merged = merged.drop_duplicates('candle_begin_time', keep='first').sort_values('candle_begin_time')
+            merged = merged.reset_index(drop=True)
+            if 'kline_pct' in merged.columns and not isinstance(merged['kline_pct'].dtype, pd.ArrowDtype):
+                pct = pd.to_numeric(merged['close'], errors='coerce').pct_change().fillna(0.0)
+                pct.iat[0] = merged['kline_pct'].iat[0]
+                merged['kline_pct'] = pct
+            self.update(merged, symbol, rule_type)
+            around = merged
+        remaining = missing_ranges(around['candle_begin_time'], gap.start, gap.end, step)
+        self.gap_index(symbol, rule_type, step).resolve(gap, remaining)
+        return remaining
+
+    # ===== 高水位线 =====
+    def _hwm_path(self, symbol: str, rule_type: str) -> Path:
+        return self.symbol_dir(symbol, rule_type) / HWM_FILE
+
+    def high_water_mark(self, symbol: str, rule_type: str) -> Optional[dict]:
+        """
+        已存储的最后一根 (offset 0) K线：{'last': 开盘时间, 'close': 收盘价}，没有数据时返回 None
+        索引文件缺失 (旧数据) 时从最后一个月份的文件重建
+        """
+        path = self._hwm_path(symbol, rule_type)
+        if path.exists():
+            with open(path, encoding='utf-8') as f:
+                info = json.load(f)
+            return {'last': pd.Timestamp(info['last']), 'close': info.get('close')}
+        files = self._month_files(symbol, rule_type)
+        if not files:
+            return None
+        df = pd.concat([_restore_time(arrow_to_pandas(pq.read_table(f))) for f in next(reversed(files.values()))])
+        if not self._advance_hwm(df.sort_values('candle_begin_time', kind='stable'), symbol, rule_type):
+            return None
+        return self.high_water_mark(symbol, rule_type)
+
+    def _advance_hwm(self, df: pd.DataFrame, symbol: str, rule_type: str) -> bool:
+        """df (已按时间排序) 的最后一根 offset 0 K线晚于高水位线时更新索引文件"""
+        if 'offset' in df.columns:
+            df = df[df['offset'] == 0]
+        if df.empty:
+            return False
+        last = pd.Timestamp(df['candle_begin_time'].iat[-1])
+        path = self._hwm_path(symbol, rule_type)
+        if path.exists():
+            with open(path, encoding='utf-8') as f:
+                if pd.Timestamp(json.load(f)['last']) > last:
+                    return False
+        close = pd.to_numeric(df['close'], errors='coerce').iat[-1] if 'close' in df.columns else None
+        info = {'last': last.isoformat(), 'close': None if close is None or pd.isna(close) else float(close)}
+        tmp = path.parent / f'.{HWM_FILE}-{uuid.uuid4().hex[:8]}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(tmp, path)
+        return True
+
+    # ===== 读取 =====
+    def read(self, symbol: str, rule_type: str, start=None, end=None, columns: Optional[Sequence[str]] = None,
+             offset: Optional[int] = None) -> pd.DataFrame:
+        """
+        读取 [start, end] 内的行情 (两端都包含)
+        :param start: 开始时间，None 表示最早
+        :param end: 结束时间，None 表示最新
+        :param columns: 需要的列，None 表示全部，candle_begin_time 总是返回
+        :param offset: 只返回该 offset 的行，None 表示全部 offset
+        :return: 按 candle_begin_time 排序的 DataFrame
+        """
+        files = self._month_files(symbol, rule_type)
+        if not files:
+            raise FileNotFoundError(f"Data not found in market store: {self.symbol_dir(symbol, rule_type)}")
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+
+        # 按月份裁剪文件
+        lo = start.strftime(MONTH_FORMAT) if start is not None else None
+        hi = end.strftime(MONTH_FORMAT) if end is not None else None
+        paths = [str(f) for m, month in files.items() if (lo is None or m >= lo) and (hi is None or m <= hi)
+                 for f in month]
+        if not paths:
+            paths = [str(next(iter(files.values()))[0])]
+
+        dataset = ds.dataset(paths, format='parquet')
+        time_type = dataset.schema.field('candle_begin_time').type
+        filter = None
+        if start is not None:
+            filter = ds.field('candle_begin_time') >= _time_scalar(start, time_type)
+        if end is not None:
+            cond = ds.field('candle_begin_time') <= _time_scalar(end, time_type)
+            filter = cond if filter is None else filter & cond
+        if offset is not None:
+            # 紧凑格式不保存全为 0 的 offset 列
+            cond = ds.field('offset') == offset if 'offset' in dataset.schema.names else ds.scalar(offset == 0)
+            filter = cond if filter is None else filter & cond
+
+        if columns is not None:
+            columns = list(dict.fromkeys(['candle_begin_time'] + [c for c in columns if c in dataset.schema.names]))
+        return _restore_time(arrow_to_pandas(dataset.to_table(columns=columns, filter=filter)))
+
+    # ===== 内存映射快照 =====
+    def snapshot_path(self, symbol: str, rule_type: str) -> Path:
+        return self.root / SNAPSHOT_DIR / f'rule_type={rule_type.upper()}' / f'{symbol}.arrow'
+
+    def open_snapshot(self, symbol: str, rule_type: str) -> pa.Table:
+        """
+        内存映射打开快照，快照不存在或分区数据已更新 (version 变化) 时先重新生成
+        :return: 缓冲区直接指向映射文件的 Arrow 表
+        """
+        version = repr(self.version(symbol, rule_type)).encode()
+        path = self.snapshot_path(symbol, rule_type)
+        if path.exists():
+            table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+            if (table.schema.metadata or {}).get(b'store_version') == version:
+                return table
+
+        df = self.read(symbol, rule_type)
+        if 'offset' in df.columns:
+            df = df.sort_values(['offset', 'candle_begin_time'], kind='stable').reset_index(drop=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'store_version': version})
+        # 整表写成一个 record batch，不压缩，映射后每列是一段连续的缓冲区
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.parent / f'.{path.name}-{uuid.uuid4().hex[:8]}.tmp'
+        with pa.OSFile(str(tmp), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=None)) as writer:
+                writer.write_table(table, max_chunksize=max(len(table), 1))
+        os.replace(tmp, path)
+        return pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+
+    def mapped_offsets(self, symbol: str, rule_type: str) -> List[int]:
+        """快照中的全部 offset"""
+        table = self.open_snapshot(symbol, rule_type)
+        if 'offset' not in table.column_names:
+            return [0]
+        return np.unique(_column_values(table, 'offset')).tolist()
+
+    def read_mapped(self, symbol: str, rule_type: str, start=None, end=None,
+                    columns: Optional[Sequence[str]] = None, offset: Optional[int] = None) -> pd.DataFrame:
+        """
+        与 read 参数、结果相同，但数据来自内存映射的快照，数值列零拷贝 (只读)
+        快照按 (offset, 时间) 排序，任意 offset 和时间范围都是连续的一段，用二分查找定位后直接切片
+        """
+        table = self.open_snapshot(symbol, rule_type)
+        lo, hi = 0, len(table)
+        if offset is not None and 'offset' in table.column_names:
+            offsets = _column_values(table, 'offset')
+            lo, hi = np.searchsorted(offsets, offset, 'left'), np.searchsorted(offsets, offset, 'right')
+        elif offset is not None and offset != 0:
+            hi = 0
+        times = _column_values(table, 'candle_begin_time')[lo:hi].view('datetime64[ns]')
+        if end is not None:
+            hi = lo + np.searchsorted(times, pd.Timestamp(end).to_datetime64(), 'right')
+        if start is not None:
+            lo = min(lo + np.searchsorted(times, pd.Timestamp(start).to_datetime64(), 'left'), hi)
+        table = table.slice(lo, hi - lo)
+        if columns is not None:
+            columns = ['candle_begin_time'] + [c for c in columns if c in table.column_names]
+            table = table.select(list(dict.fromkeys(columns)))
+        return mapped_frame(table)
+
+    def import_feather(self, file_path: Union[str, Path], symbol: str, rule_type: str) -> int:
+        """把旧的单文件 feather 数据 (data/pickle_data/{周期}/{币种}.pkl) 导入分区存储"""
+        return self.write(arrow_to_pandas(feather.read_table(file_path)), symbol, rule_type)
@@ -1,77 +1,323 @@
+"""
+持仓量 / 资金费率采集服务 (长期运行)
+- 每个周期 (默认整点) 开始后并发采集全部合约的当前持仓量，资金费率和标记价格由一次 premiumIndex 请求取得全部合约；
+  请求共用 async_fetcher 的连接池和请求权重预算，失败的合约在本周期的窗口内重试
+- 样本先缓存在内存中，每 flush_every 个周期 (以及退出时) 按币种批量追加到分区存储 (MarketStore.append)，
+  不再每个样本都读取、重写整个 CSV
+- 启动时用 openInterestHist 补齐最近的历史 (包括上次退出前尚未写入的周期)，旧的 data/oi_history CSV 在存储为空时导入
+- 每个周期结束后写健康文件 (JSON)：采集延迟、缺失合约、错误数、缓存行数、最近写入时间等，供监控读取
+用法：
+    python -m cta_api.oi_collector
+"""
+import asyncio
+import json
 import os
 import time
-import requests
+import uuid
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
 import pandas as pd
-from datetime import datetime
+
 from config import root_path
+import config as global_config
+from cta_api.async_fetcher import AsyncKlineFetcher
+from cta_api.binance_fetcher import BASE
+from cta_api.market_store import MarketStore
 
-BASE = "https://fapi.binance.com"
-
-def symbols():
-    r = requests.get(f"{BASE}/fapi/v1/exchangeInfo", timeout=20)
-    r.raise_for_status()
-    info = r.json()
-    out = []
-    for s in info.get("symbols", []):
-        if s.get("contractType") == "PERPETUAL" and s.get("quoteAsset") == "USDT":
-            out.append(s["symbol"])
-    return out
-
-def seed_last_month(symbol, period="1h"):
-    r = requests.get(f"{BASE}/futures/data/openInterestHist", params={"symbol": symbol, "period": period, "limit": 500}, timeout=30)
-    if r.status_code != 200:
-        return pd.DataFrame()
-    data = r.json()
-    if not data:
-        return pd.DataFrame()
-    df = pd.DataFrame(data)
-    ts = df["timestamp"] if "timestamp" in df.columns else df["time"]
-    df = pd.DataFrame({
-        "candle_begin_time": pd.to_datetime(ts, unit="ms"),
-        "open_interest": pd.to_numeric(df["sumOpenInterest"], errors="coerce") if "sumOpenInterest" in df.columns else pd.to_numeric(df["openInterest"], errors="coerce")
-    })
-    return df
-
-def present_oi(symbol):
-    r = requests.get(f"{BASE}/fapi/v1/openInterest", params={"symbol": symbol}, timeout=10)
-    r.raise_for_status()
-    j = r.json()
-    t = pd.Timestamp.utcnow().floor("H")
-    return pd.DataFrame([{"candle_begin_time": t, "open_interest": float(j["openInterest"])}])
-
-def write_csv(path, df):
-    if os.path.exists(path):
-        old = pd.read_csv(path, parse_dates=["candle_begin_time"])
-        all_df = pd.concat([old, df], ignore_index=True)
-        all_df.drop_duplicates(subset=["candle_begin_time"], keep="last", inplace=True)
-        all_df.sort_values("candle_begin_time", inplace=True)
-        all_df.to_csv(path, index=False, encoding="utf-8")
-    else:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        df.sort_values("candle_begin_time", inplace=True)
-        df.to_csv(path, index=False, encoding="utf-8")
-
-def run(interval="1h"):
-    out_dir = os.path.join(root_path, "data", "oi_history", interval.upper())
-    os.makedirs(out_dir, exist_ok=True)
-    syms = symbols()
-    for s in syms:
-        path = os.path.join(out_dir, f"{s.replace('USDT','-USDT')}_oi.csv")
-        df = seed_last_month(s, period="1h")
-        if not df.empty:
-            write_csv(path, df)
-    while True:
-        for s in syms:
-            path = os.path.join(out_dir, f"{s.replace('USDT','-USDT')}_oi.csv")
-            try:
-                df = present_oi(s)
-                write_csv(path, df)
-            except Exception:
+# 各接口的请求权重
+OI_WEIGHT = 1
+PREMIUM_INDEX_WEIGHT = 10
+EXCHANGE_INFO_WEIGHT = 1
+OI_HIST_WEIGHT = 1
+
+# 存储的列 (历史补齐和旧 CSV 导入的行没有的列为空)
+OI_COLUMNS = ["candle_begin_time", "open_interest", "funding_rate", "mark_price", "sample_time"]
+
+# openInterestHist 单次最多返回的条数 (接口只保留最近 30 天)
+OI_HIST_LIMIT = 500
+
+
+@dataclass
+class CollectorMetrics:
+    """采集指标，每个周期结束后写入健康文件"""
+    started: str
+    status: str = "starting"
+    cycles: int = 0
+    # 最近一个周期对应的时间 (样本的 candle_begin_time)
+    last_cycle: Optional[str] = None
+    next_cycle: Optional[str] = None
+    last_cycle_seconds: float = 0.0
+    # 最近周期最后一个样本相对周期起点的延迟 (秒)
+    lag_seconds: float = 0.0
+    symbols: int = 0
+    samples: int = 0
+    missing: List[str] = field(default_factory=list)
+    samples_total: int = 0
+    errors_total: int = 0
+    # 最近周期的错误：合约 -> 错误信息
+    errors: Dict[str, str] = field(default_factory=dict)
+    buffered_rows: int = 0
+    last_flush: Optional[str] = None
+    flushed_rows_total: int = 0
+    requests: int = 0
+    weight: float = 0
+    throttled: int = 0
+
+
+def _now() -> pd.Timestamp:
+    return pd.Timestamp.utcnow().tz_localize(None)
+
+
+def _dash(symbol: str) -> str:
+    return symbol if "-" in symbol else symbol.replace("USDT", "-USDT")
+
+
+class OiCollector:
+    """
+    持仓量 / 资金费率采集器
+    用法：
+        collector = OiCollector(MarketStore('data/oi_store'), interval='1h', concurrency=32)
+        collector.run()            # 一直运行
+        collector.run(cycles=1)    # 采集一个周期后写入并退出
+    """
+
+    def __init__(self, store: MarketStore, interval: str = "1h", base_url: str = BASE, concurrency: int = 32,
+                 weight_limit_1m: int = 2400, flush_every: int = 6, poll_delay: float = 5.0,
+                 window: Optional[float] = None, health_path: Union[str, Path, None] = None,
+                 symbols: Optional[List[str]] = None, legacy_dir: Union[str, Path, None] = None):
+        """
+        :param store: 样本写入的分区存储 (与行情存储分开的目录)
+        :param interval: 采集周期
+        :param concurrency: 同时进行的请求数
+        :param flush_every: 每隔多少个周期把缓存写入存储
+        :param poll_delay: 周期开始后等待的秒数 (交易所数据在整点后稍晚更新)
+        :param window: 失败合约的重试窗口 (秒)，默认为周期的一半
+        :param health_path: 健康文件路径，默认为存储目录下的 _health.json
+        :param symbols: 固定的合约列表，None 表示每个周期从 exchangeInfo 获取全部 USDT 永续合约
+        :param legacy_dir: 旧版 CSV 目录 (data/oi_history/1H)，存储中没有该合约时导入
+        """
+        self.store = store
+        self.interval = interval
+        self.rule_type = interval.upper()
+        self.step = pd.Timedelta(interval)
+        self.client = AsyncKlineFetcher(base_url=base_url, concurrency=concurrency, weight_limit_1m=weight_limit_1m)
+        self.flush_every = flush_every
+        self.poll_delay = poll_delay
+        self.window = window if window is not None else self.step.total_seconds() / 2
+        self.health_path = Path(health_path) if health_path else Path(store.root) / "_health.json"
+        self.symbol_list = symbols
+        self.legacy_dir = Path(legacy_dir) if legacy_dir else None
+        # 合约 (BTC-USDT) -> 尚未写入存储的样本
+        self.buffer: Dict[str, List[dict]] = {}
+        self.metrics = CollectorMetrics(started=_now().isoformat())
+        self._symbols: List[str] = list(symbols or [])
+
+    # ===== 请求 =====
+    async def refresh_symbols(self, session) -> List[str]:
+        """全部 USDT 永续合约，请求失败时沿用上一次的列表"""
+        if self.symbol_list is not None:
+            return self._symbols
+        try:
+            info = await self.client.get(session, "/fapi/v1/exchangeInfo", {}, EXCHANGE_INFO_WEIGHT)
+            syms = [s["symbol"] for s in info.get("symbols", [])
+                    if s.get("contractType") == "PERPETUAL" and s.get("quoteAsset") == "USDT"
+                    and s.get("status", "TRADING") == "TRADING"]
+            if syms:
+                self._symbols = syms
+        except Exception as e:
+            print("oi collector: exchangeInfo error, keep", len(self._symbols), "symbols:", repr(e))
+        return self._symbols
+
+    async def _open_interest(self, session, symbol: str) -> float:
+        j = await self.client.get(session, "/fapi/v1/openInterest", {"symbol": symbol}, OI_WEIGHT)
+        return float(j["openInterest"])
+
+    async def _premium_index(self, session) -> Dict[str, dict]:
+        """全部合约的资金费率和标记价格 (一次请求)"""
+        try:
+            data = await self.client.get(session, "/fapi/v1/premiumIndex", {}, PREMIUM_INDEX_WEIGHT)
+        except Exception as e:
+            print("oi collector: premiumIndex error:", repr(e))
+            return {}
+        return {d["symbol"]: d for d in data if isinstance(d, dict) and "symbol" in d}
+
+    async def _oi_hist(self, session, symbol: str) -> pd.DataFrame:
+        data = await self.client.get(session, "/futures/data/openInterestHist",
+                                     {"symbol": symbol, "period": self.interval, "limit": OI_HIST_LIMIT},
+                                     OI_HIST_WEIGHT)
+        if not data:
+            return pd.DataFrame()
+        df = pd.DataFrame(data)
+        ts = df["timestamp"] if "timestamp" in df.columns else df["time"]
+        oi = df["sumOpenInterest"] if "sumOpenInterest" in df.columns else df["openInterest"]
+        return pd.DataFrame({"candle_begin_time": pd.to_datetime(pd.to_numeric(ts), unit="ms"),
+                             "open_interest": pd.to_numeric(oi, errors="coerce")})
+
+    # ===== 采集 =====
+    def _buffer(self, symbol: str, rows: List[dict]) -> None:
+        self.buffer.setdefault(_dash(symbol), []).extend(rows)
+
+    async def seed(self, session) -> int:
+        """
+        启动时补齐历史：存储中没有的合约先导入旧 CSV，再用 openInterestHist 补上高水位线之后的周期
+        :return: 缓存的行数
+        """
+        syms = await self.refresh_symbols(session)
+        n = 0
+        for sym in syms:
+            legacy = self.legacy_dir / f"{_dash(sym)}_oi.csv" if self.legacy_dir else None
+            if legacy is not None and legacy.exists() and not self.store.exists(_dash(sym), self.rule_type):
+                df = pd.read_csv(legacy, parse_dates=["candle_begin_time"])
+                self._buffer(sym, df.to_dict("records"))
+                n += len(df)
+        results = await asyncio.gather(*[self._oi_hist(session, s) for s in syms], return_exceptions=True)
+        for sym, df in zip(syms, results):
+            if isinstance(df, BaseException) or df.empty:
+                continue
+            hwm = self.store.high_water_mark(_dash(sym), self.rule_type)
+            if hwm is not None:
+                df = df[df["candle_begin_time"] > hwm["last"]]
+            self._buffer(sym, df.to_dict("records"))
+            n += len(df)
+        return n
+
+    async def collect_once(self, session, cycle: pd.Timestamp) -> None:
+        """
+        采集一个周期：全部合约并发请求，失败的合约在 window 秒内重试，样本写入缓存并更新指标
+        :param cycle: 周期起点 (样本的 candle_begin_time)
+        """
+        t0 = time.monotonic()
+        syms = await self.refresh_symbols(session)
+        premium = await self._premium_index(session)
+        pending, errors, lag = list(syms), {}, 0.0
+        deadline = t0 + self.window
+        while pending:
+            results = await asyncio.gather(*[self._open_interest(session, s) for s in pending],
+                                           return_exceptions=True)
+            sampled = _now()
+            failed = []
+            for sym, res in zip(pending, results):
+                if isinstance(res, BaseException):
+                    errors[sym] = f"{type(res).__name__}: {res}"[:200]
+                    failed.append(sym)
+                    continue
+                errors.pop(sym, None)
+                p = premium.get(sym, {})
+                self._buffer(sym, [{
+                    "candle_begin_time": cycle,
+                    "open_interest": res,
+                    "funding_rate": pd.to_numeric(p.get("lastFundingRate"), errors="coerce"),
+                    "mark_price": pd.to_numeric(p.get("markPrice"), errors="coerce"),
+                    "sample_time": sampled,
+                }])
+                lag = max(lag, (sampled - cycle).total_seconds())
+            pending = failed
+            pause = min(10.0, self.window / 6)
+            if pending and time.monotonic() + pause < deadline:
+                await asyncio.sleep(pause)
+            else:
+                break
+
+        m = self.metrics
+        m.cycles += 1
+        m.last_cycle = cycle.isoformat()
+        m.last_cycle_seconds = round(time.monotonic() - t0, 3)
+        m.lag_seconds = round(lag, 3)
+        m.symbols = len(syms)
+        m.samples = len(syms) - len(pending)
+        m.missing = sorted(pending)
+        m.samples_total += m.samples
+        m.errors_total += len(errors)
+        m.errors = errors
+        m.status = "ok" if not pending else "degraded"
+
+    def flush(self) -> int:
+        """缓存的样本按合约批量追加到存储 (每个合约一个文件)，返回写入行数"""
+        n = 0
+        for symbol in list(self.buffer):
+            rows = self.buffer[symbol]
+            if not rows:
                 continue
-        now = pd.Timestamp.utcnow()
-        sleep_s = max(60, (now.ceil("H") - now).total_seconds())
-        time.sleep(sleep_s)
+            df = pd.DataFrame(rows).reindex(columns=OI_COLUMNS)
+            for col in ["candle_begin_time", "sample_time"]:
+                df[col] = pd.to_datetime(df[col], utc=True).dt.tz_localize(None)
+            df = df.astype({"open_interest": "float64", "funding_rate": "float64", "mark_price": "float64"})
+            try:
+                n += self.store.append(df, symbol, self.rule_type).rows
+                del self.buffer[symbol]
+            except Exception as e:
+                self.metrics.errors[symbol] = f"flush error: {e!r}"
+                self.metrics.errors_total += 1
+        self.metrics.last_flush = _now().isoformat()
+        self.metrics.flushed_rows_total += n
+        return n
+
+    def write_health(self) -> None:
+        """原子地写入健康文件"""
+        m = self.metrics
+        m.buffered_rows = sum(len(v) for v in self.buffer.values())
+        st = self.client.stats
+        m.requests, m.weight, m.throttled = st.requests, st.weight, st.throttled
+        info = {**asdict(m), "updated": _now().isoformat()}
+        self.health_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.health_path.parent / f".{self.health_path.name}-{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=1, default=str)
+        os.replace(tmp, self.health_path)
+
+    # ===== 主循环 =====
+    async def serve(self, cycles: Optional[int] = None) -> None:
+        """
+        采集 cycles 个周期 (None 表示一直运行)，退出 (包括被中断) 时写入剩余的缓存
+        """
+        async with self.client.session() as session:
+            try:
+                n = await self.seed(session)
+                print("oi collector: seeded", n, "rows, flushed", self.flush())
+                self.write_health()
+                done = 0
+                while cycles is None or done < cycles:
+                    cycle = _now().floor(self.step)
+                    await self.collect_once(session, cycle)
+                    done += 1
+                    if done % self.flush_every == 0 or done == cycles:
+                        self.flush()
+                    nxt = cycle + self.step
+                    self.metrics.next_cycle = nxt.isoformat()
+                    self.write_health()
+                    m = self.metrics
+                    print(f"oi collector: {cycle} samples {m.samples}/{m.symbols}, lag {m.lag_seconds:.1f}s, "
+                          f"errors {len(m.errors)}, buffered {m.buffered_rows}")
+                    if cycles is not None and done >= cycles:
+                        break
+                    await asyncio.sleep(max(0.0, (nxt - _now()).total_seconds() + self.poll_delay))
+            finally:
+                self.flush()
+                self.metrics.status = "stopped"
+                self.write_health()
+
+    def run(self, cycles: Optional[int] = None) -> None:
+        asyncio.run(self.serve(cycles))
+
+
+def run(interval: str = "1h", cycles: Optional[int] = None):
+    store = MarketStore(getattr(global_config, "oi_store_path", os.path.join(root_path, "data", "oi_store")))
+    collector = OiCollector(
+        store,
+        interval=interval,
+        concurrency=getattr(global_config, "oi_collector_concurrency", 32),
+        weight_limit_1m=getattr(global_config, "data_fetch_weight_limit", 2400),
+        flush_every=getattr(global_config, "oi_collector_flush_every", 6),
+        health_path=getattr(global_config, "oi_collector_health_path", None),
+        legacy_dir=os.path.join(root_path, "data", "oi_history", interval.upper()),
+    )
+    try:
+        collector.run(cycles)
+    except KeyboardInterrupt:
+        pass
+
 
 if __name__ == "__main__":
     run("1h")
-
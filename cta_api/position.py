@@ -1,4 +1,120 @@
+import numpy as np
 import pandas as pd
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+def _merge_signal_core(signal_long: np.ndarray, signal_short: np.ndarray, drop_duplicates: bool) -> np.ndarray:
+    """
+    合并多空信号核心函数：signal_long + signal_short (两者皆空时为空)，可选去除与上一个非空信号相同的重复信号
+    """
+    length = len(signal_long)
+    signal = np.full(length, np.nan)
+    last_signal = np.nan
+    for i in range(length):
+        s_long = signal_long[i]
+        s_short = signal_short[i]
+        if np.isnan(s_long) and np.isnan(s_short):
+            continue
+        curr = (0.0 if np.isnan(s_long) else s_long) + (0.0 if np.isnan(s_short) else s_short)
+        if drop_duplicates and curr == last_signal:
+            continue
+        signal[i] = curr
+        last_signal = curr
+    return signal
+
+
+def _signal_to_pos_core(signal: np.ndarray) -> tuple:
+    """
+    由 signal 计算持仓核心函数：signal_ 为向前填充后的信号 (初始为0)，pos 为上一根K线的 signal_
+    :return: (signal_数组, pos数组)
+    """
+    length = len(signal)
+    signal_ = np.zeros(length)
+    pos = np.zeros(length)
+    last_signal = 0.0
+    for i in range(length):
+        pos[i] = last_signal
+        if not np.isnan(signal[i]):
+            last_signal = signal[i]
+        signal_[i] = last_signal
+    return signal_, pos
+
+
+# 如果安装了 Numba，则进行 JIT 编译
+if HAS_NUMBA:
+    _merge_signal_optimized = numba.jit(nopython=True)(_merge_signal_core)
+    _signal_to_pos_optimized = numba.jit(nopython=True)(_signal_to_pos_core)
+else:
+    _merge_signal_optimized = _merge_signal_core
+    _signal_to_pos_optimized = _signal_to_pos_core
+
+
+def _column_values(df: pd.DataFrame, col: str) -> np.ndarray:
+    """取出信号列的 float64 数组，列不存在时视为全空"""
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return df[col].to_numpy(dtype=np.float64)
+
+
+def merge_signal(df: pd.DataFrame, drop_duplicates: bool = True,
+                 long_col: str = 'signal_long', short_col: str = 'signal_short') -> np.ndarray:
+    """
+    合并做多、做空信号并去除重复信号，等价于：
+        df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
+        temp = df[df['signal'].notnull()][['signal']]
+        temp = temp[temp['signal'] != temp['signal'].shift(1)]
+        df['signal'] = temp['signal']
+    :param df: 包含 signal_long / signal_short 列的 DataFrame (缺失的列视为全空)
+    :param drop_duplicates: 是否去除重复信号
+    :return: signal 数组，用法 df['signal'] = merge_signal(df)
+    """
+    return _merge_signal_optimized(_column_values(df, long_col), _column_values(df, short_col), drop_duplicates)
+
+
+def drop_duplicate_signal(signal) -> np.ndarray:
+    """
+    去除与上一个非空信号相同的重复信号
+    :param signal: signal 列 (Series 或数组)
+    :return: 去重后的 signal 数组
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    return _merge_signal_optimized(signal, np.full(len(signal), np.nan), True)
+
+
+def merge_signal_matrix(signal_long, signal_short=None, drop_duplicates: bool = True) -> np.ndarray:
+    """
+    merge_signal 的矩阵版本：逐列合并 (K线数 × 参数组数) 的多空信号并去除重复信号
+    :param signal_long: 做多信号矩阵，未触发处为空
+    :param signal_short: 做空信号矩阵，None 视为全空
+    :return: signal 矩阵
+    """
+    signal_long = np.asarray(signal_long, dtype=np.float64)
+    if signal_short is None:
+        signal_short = np.full_like(signal_long, np.nan)
+    signal_short = np.asarray(signal_short, dtype=np.float64)
+    signal = np.empty(signal_long.shape, order='F')
+    for j in range(signal_long.shape[1]):
+        signal[:, j] = _merge_signal_optimized(np.ascontiguousarray(signal_long[:, j]),
+                                               np.ascontiguousarray(signal_short[:, j]), drop_duplicates)
+    return signal
+
+
+def position_matrix(signal) -> np.ndarray:
+    """
+    由 signal 矩阵逐列计算实际持仓，口径与 position_for_future 一致
+    :param signal: (K线数 × 参数组数) 的 signal 矩阵
+    :return: pos 矩阵
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    pos = np.empty(signal.shape, order='F')
+    for j in range(signal.shape[1]):
+        pos[:, j] = _signal_to_pos_optimized(np.ascontiguousarray(signal[:, j]))[1]
+    return pos
+
 
 # 由交易信号产生实际持仓
 def position_for_future(df):
@@ -10,15 +126,9 @@ def position_for_future(df):
     """
 
     # ===由signal计算出实际的每天持有仓位
-    df['signal_'] = df['signal']
-    # 在产生signal的k线结束的时候，进行买入
-    df['signal_'].ffill(inplace=True)
-    df['signal_'].fillna(value=0, inplace=True)  # 将初始行数的signal补全为0
-    df['pos'] = df['signal_'].shift()
-    df['pos'].fillna(value=0, inplace=True)  # 将初始行数的pos补全为0
-
+    # 在产生signal的k线结束的时候，进行买入：signal_ 为向前填充的信号 (初始为0)，pos 为上一根K线的 signal_
     # pos为空的时，不能买卖，只能和前一周期保持一致。
-    df['pos'].ffill(inplace=True)
+    df['signal_'], df['pos'] = _signal_to_pos_optimized(df['signal'].to_numpy(dtype=np.float64))
 
     # 在实际操作中，不一定会直接跳过4点这个周期，而是会停止N分钟下单。此时可以注释掉上面的代码。
 
@@ -26,4 +136,4 @@ def position_for_future(df):
     # 删除无关中间变量
     # df.drop(['signal'], axis=1, inplace=True)
 
-    return df
\ No newline at end of file
+    return df
@@ -1,8 +1,8 @@
 import pandas as pd
-import numpy as np
 import os
 import ast
 from config import root_path, para_equity
+from cta_api.function import parse_kline_pct
 
 def read_csv(path):
     '''
@@ -23,8 +23,8 @@ def shift_read(equity_name):
     else:
         path = os.path.join(root_path,f'data/output/equity_curve/{equity_name}.csv')
     df = pd.read_csv(path,encoding='gbk',parse_dates=['candle_begin_time'])
-    # 解析字符串并转换为 NumPy 数组
-    df['kline_pct'] = df['kline_pct'].apply(lambda x: np.fromstring(x.strip('[]'), sep=' '))
+    # 一次解析全部K线内涨跌幅，存为 Arrow list 列 (偏移量 + 数值)，需要数组时用 ragged_to_numpy
+    df['kline_pct'] = parse_kline_pct(df['kline_pct'])
     # 删除无用列
     # df = df[['candle_begin_time','close','signal','pos','r_line_equity_curve']]
     df.rename({'r_line_equity_curve':'equity'},axis=1,inplace=True)
@@ -0,0 +1,221 @@
+"""
+递归型指标的编译内核 (当前值依赖前一根K线的结果，无法直接向量化)
+各内核与对应因子原有的逐行循环逐位一致，包括 NaN 的传播方式
+"""
+import numpy as np
+import pandas as pd
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+# ===== 自适应 EMA 类滤波 =====
+def _adaptive_ema_core(values: np.ndarray, alpha: np.ndarray, start: int, seed: float) -> np.ndarray:
+    """
+    out[start] = seed，之后 out[i] = out[i-1] + alpha[i] * (values[i] - out[i-1])，start 之前保持原值
+    """
+    out = values.copy()
+    length = len(values)
+    if start >= length:
+        return out
+    out[start] = seed
+    for i in range(start + 1, length):
+        out[i] = out[i - 1] + alpha[i] * (values[i] - out[i - 1])
+    return out
+
+
+def _kalman_core(values: np.ndarray, delta: float, observation_noise: float) -> tuple:
+    """
+    一维常值模型 Kalman 滤波，初始估计为第一个值、初始误差为1
+    :return: (估计值数组, 误差数组)
+    """
+    length = len(values)
+    estimate = np.zeros(length)
+    error = np.zeros(length)
+    if length == 0:
+        return estimate, error
+    estimate[0] = values[0]
+    error[0] = 1.0
+    for i in range(1, length):
+        prediction = estimate[i - 1]
+        prediction_error = error[i - 1] + delta
+        k = prediction_error / (prediction_error + observation_noise)
+        estimate[i] = prediction + k * (values[i] - prediction)
+        error[i] = (1 - k) * prediction_error
+    return estimate, error
+
+
+# ===== 累积量指标 =====
+def _accumulate_where_core(init: np.ndarray, delta: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    out[0] = init[0]，之后 mask[i] 为真时 out[i] = out[i-1] + delta[i]，否则 out[i] = out[i-1]
+    """
+    out = init.copy()
+    for i in range(1, len(out)):
+        if mask[i]:
+            out[i] = out[i - 1] + delta[i]
+        else:
+            out[i] = out[i - 1]
+    return out
+
+
+def _obv_core(close: np.ndarray, volume: np.ndarray, hold_on_flat: bool) -> np.ndarray:
+    """
+    能量潮：收盘价上涨加成交量、下跌减成交量
+    收盘价持平 (或有空值) 时，hold_on_flat 为真则沿用上一个值，否则归零
+    """
+    length = len(close)
+    obv = np.zeros(length)
+    for i in range(1, length):
+        if close[i] > close[i - 1]:
+            obv[i] = obv[i - 1] + volume[i]
+        elif close[i] < close[i - 1]:
+            obv[i] = obv[i - 1] - volume[i]
+        elif hold_on_flat:
+            obv[i] = obv[i - 1]
+    return obv
+
+
+# ===== 跟踪止损 / 通道 =====
+def _sar_recursion_core(close: np.ndarray, low: np.ndarray, ep: np.ndarray, sar0: np.ndarray,
+                        step: float, max_val: float) -> tuple:
+    """
+    parabolic_sar 因子的逐K线更新 (从第3根K线开始)：
+    收盘价高于 ep 时趋势为1、低于 ep 时为0；趋势为1时 sar 向 max_val 靠拢，否则向 ep 靠拢；
+    趋势为1且最低价跌破 sar 时趋势记为-1。每根K线在 sar0 中自身的初值上更新
+    :return: (sar数组, trend数组)
+    """
+    length = len(close)
+    sar = sar0.copy()
+    trend = np.zeros(length)
+    for i in range(2, length):
+        if close[i] > ep[i]:
+            trend[i] = 1
+        elif close[i] < ep[i]:
+            trend[i] = 0
+
+        if trend[i] == 1:
+            sar[i] = sar[i] + step * (max_val - sar[i])
+        else:
+            sar[i] = sar[i] + step * (ep[i] - sar[i])
+
+        if trend[i] == 1 and low[i] < sar[i]:
+            trend[i] = -1
+    return sar, trend
+
+
+def _trailing_band_core(close: np.ndarray, basic_upper: np.ndarray, basic_lower: np.ndarray,
+                        init_trend: float, skip_nan: bool) -> tuple:
+    """
+    SuperTrend 式跟踪通道：
+    上轨只在新上轨更低或上一根收盘价突破上轨时更新，下轨同理；
+    趋势为1时收盘价跌破下轨转为-1，否则收盘价突破上轨转为1
+    :param init_trend: 第一根K线之前的趋势 (0 视为非多头)
+    :param skip_nan: 为真时跳过 basic_upper 为空的K线 (状态不变，该K线 trend 输出0)
+    :return: (final_upper, final_lower, trend)，第一根K线的 trend 为0
+    """
+    length = len(close)
+    final_upper = np.zeros(length)
+    final_lower = np.zeros(length)
+    trend = np.zeros(length)
+    if length == 0:
+        return final_upper, final_lower, trend
+    curr_upper = basic_upper[0]
+    curr_lower = basic_lower[0]
+    curr_trend = init_trend
+    final_upper[0] = curr_upper
+    final_lower[0] = curr_lower
+    for i in range(1, length):
+        if skip_nan and np.isnan(basic_upper[i]):
+            final_upper[i] = curr_upper
+            final_lower[i] = curr_lower
+            continue
+        if basic_upper[i] < curr_upper or close[i - 1] > curr_upper:
+            curr_upper = basic_upper[i]
+        if basic_lower[i] > curr_lower or close[i - 1] < curr_lower:
+            curr_lower = basic_lower[i]
+
+        if curr_trend == 1:
+            if close[i] < curr_lower:
+                curr_trend = -1
+            else:
+                curr_trend = 1
+        else:
+            if close[i] > curr_upper:
+                curr_trend = 1
+            else:
+                curr_trend = -1
+        final_upper[i] = curr_upper
+        final_lower[i] = curr_lower
+        trend[i] = curr_trend
+    return final_upper, final_lower, trend
+
+
+# 如果安装了 Numba，则进行 JIT 编译
+if HAS_NUMBA:
+    _adaptive_ema_optimized = numba.jit(nopython=True)(_adaptive_ema_core)
+    _kalman_optimized = numba.jit(nopython=True)(_kalman_core)
+    _accumulate_where_optimized = numba.jit(nopython=True)(_accumulate_where_core)
+    _obv_optimized = numba.jit(nopython=True)(_obv_core)
+    _sar_recursion_optimized = numba.jit(nopython=True)(_sar_recursion_core)
+    _trailing_band_optimized = numba.jit(nopython=True)(_trailing_band_core)
+else:
+    _adaptive_ema_optimized = _adaptive_ema_core
+    _kalman_optimized = _kalman_core
+    _accumulate_where_optimized = _accumulate_where_core
+    _obv_optimized = _obv_core
+    _sar_recursion_optimized = _sar_recursion_core
+    _trailing_band_optimized = _trailing_band_core
+
+
+def _values(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64)
+
+
+def kama(series: pd.Series, period: int, fastest: float = 2 / 3, slowest: float = 2 / 31) -> pd.Series:
+    """
+    自适应移动平均线 (KAMA)
+    1. 效率比率 ER = |period 期价格变化| / period 期逐根波动之和
+    2. 平滑常数 SC = (ER * (fastest - slowest) + slowest)^2
+    3. 第 period 根K线取前 period+1 根的均值，之后 KAMA = 前值 + SC * (价格 - 前值)，之前保持原价格
+    """
+    change = series.diff(period).abs()
+    volatility = series.diff().abs().rolling(window=period).sum()
+    er = (change / volatility).fillna(0)
+    sc = (er * (fastest - slowest) + slowest) ** 2
+
+    seed = series.iloc[:period + 1].mean() if period < len(series) else np.nan
+    out = _adaptive_ema_optimized(_values(series), _values(sc), int(period), float(seed))
+    return pd.Series(out, index=series.index, name=series.name)
+
+
+def kalman_filter(values, delta: float, observation_noise: float) -> tuple:
+    """
+    一维 Kalman 滤波
+    :return: (估计值数组, 误差数组)
+    """
+    return _kalman_optimized(_values(values), float(delta), float(observation_noise))
+
+
+def accumulate_where(init, delta, mask) -> np.ndarray:
+    """条件累加：从 init 的第一个值开始，mask 为真的K线累加 delta，否则沿用前值 (如 NVI / PVI)"""
+    return _accumulate_where_optimized(_values(init), _values(delta), np.asarray(mask, dtype=np.bool_))
+
+
+def obv(close, volume, hold_on_flat: bool = True) -> np.ndarray:
+    """能量潮 OBV，第一根K线为0"""
+    return _obv_optimized(_values(close), _values(volume), hold_on_flat)
+
+
+def sar_recursion(close, low, ep, sar0, step: float, max_val: float) -> tuple:
+    """parabolic_sar 因子的 sar 递推，见 _sar_recursion_core"""
+    return _sar_recursion_optimized(_values(close), _values(low), _values(ep), _values(sar0),
+                                    float(step), float(max_val))
+
+
+def trailing_band(close, basic_upper, basic_lower, init_trend: float = 0, skip_nan: bool = False) -> tuple:
+    """SuperTrend 跟踪通道，见 _trailing_band_core，返回 (final_upper, final_lower, trend)"""
+    return _trailing_band_optimized(_values(close), _values(basic_upper), _values(basic_lower),
+                                    float(init_trend), skip_nan)
@@ -0,0 +1,206 @@
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# 分区列：目录结构为 factor=.../symbol=.../rule_type=.../{run_id}-{序号}-{i}.parquet
+PARTITION_COLUMNS = ('factor', 'symbol', 'rule_type')
+
+# 结果表的列及类型 (与 strategy_evaluate_numeric 的指标一致)，不在此列表中的列不会写入
+RESULT_SCHEMA = pa.schema([
+    ('run_id', pa.string()),
+    ('created_at', pa.timestamp('ns')),
+    ('para', pa.string()),
+    ('task_key', pa.string()),
+    ('累积净值', pa.float64()),
+    ('年化收益', pa.float64()),
+    ('最大回撤', pa.float64()),
+    ('最大回撤开始时间', pa.timestamp('ns')),
+    ('最大回撤结束时间', pa.timestamp('ns')),
+    ('年化收益/回撤比', pa.float64()),
+    ('夏普比率', pa.float64()),
+    ('盈利笔数', pa.int64()),
+    ('亏损笔数', pa.int64()),
+    ('胜率', pa.float64()),
+    ('每笔交易平均盈亏', pa.float64()),
+    ('盈亏收益比', pa.float64()),
+    ('单笔最大盈利', pa.float64()),
+    ('单笔最大亏损', pa.float64()),
+    ('单笔最长持有时间', pa.float64()),
+    ('单笔最短持有时间', pa.float64()),
+    ('平均持仓周期', pa.float64()),
+    ('最大连续盈利笔数', pa.int64()),
+    ('最大连续亏损笔数', pa.int64()),
+    ('月化收益', pa.float64()),
+])
+
+PARTITION_SCHEMA = pa.schema([(c, pa.string()) for c in PARTITION_COLUMNS])
+
+
+def new_run_id() -> str:
+    """生成本次回测的 run_id：时间戳 + 随机后缀，按字符串排序即按时间排序"""
+    return pd.Timestamp.now().strftime('%Y%m%d_%H%M%S') + '_' + uuid.uuid4().hex[:6]
+
+
+class ResultStore:
+    """
+    参数扫描结果库 (Parquet 数据集，按 factor / symbol / rule_type 分区)
+    写入：append 先缓存在内存，满 flush_rows 行、距上次写入超过 flush_seconds 秒或 flush / 退出 with 时
+         追加写成新文件，不改动已有文件 (异常退出 with 时也会写入，已完成的结果不会丢失)
+    合并：compact 把本次运行在每个分区写下的多个小文件合并成一个
+    查询：query / aggregate / top 通过 pyarrow.dataset 按分区裁剪、谓词下推，只读取需要的列
+    用法：
+        with ResultStore(path) as store:
+            store.append(records)
+        store.query(factor='sma', symbol='BTC-USDT')
+    """
+
+    def __init__(self, root: Union[str, Path], run_id: Optional[str] = None, flush_rows: int = 10000,
+                 flush_seconds: float = 60):
+        self.root = Path(root)
+        self.run_id = run_id or new_run_id()
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._buffer: List[dict] = []
+        self._seq = 0
+        self._last_flush = time.monotonic()
+
+    # ===== 写入 =====
+    def append(self, records: Iterable[dict]) -> None:
+        """
+        追加结果记录，每条记录需包含 factor / symbol / rule_type / para 以及评价指标
+        """
+        self._buffer.extend(records)
+        if len(self._buffer) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self) -> int:
+        """把缓存的记录写成新的 parquet 文件，返回写入行数"""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return 0
+        df = pd.DataFrame(self._buffer)
+        self._buffer = []
+        df['run_id'] = self.run_id
+        df['created_at'] = pd.Timestamp.now()
+
+        columns = {}
+        for field in RESULT_SCHEMA:
+            if field.name in df.columns:
+                columns[field.name] = pa.array(df[field.name], type=field.type, from_pandas=True)
+            else:
+                columns[field.name] = pa.nulls(len(df), type=field.type)
+        for c in PARTITION_COLUMNS:
+            columns[c] = pa.array(df[c].astype(str), type=pa.string())
+        table = pa.table(columns)
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        pq.write_to_dataset(table, self.root, partition_cols=list(PARTITION_COLUMNS),
+                            basename_template=f'{self.run_id}-{self._seq}-{{i}}.parquet',
+                            existing_data_behavior='overwrite_or_ignore')
+        self._seq += 1
+        return len(df)
+
+    def compact(self) -> int:
+        """
+        把本次运行 (run_id) 在每个分区中写下的多个文件合并为一个，用于频繁 flush 之后 (如每完成一块就写入)
+        合并文件先写成以 . 开头的临时文件 (数据集不读取)，改名后再删除原文件；
+        中途被结束时最多留下重复的行 (task_key 相同)，不会丢失结果
+        :return: 合并掉的文件数
+        """
+        self.flush()
+        groups: Dict[Path, List[Path]] = {}
+        pattern = '/'.join(['*'] * len(PARTITION_COLUMNS)) + f'/{self.run_id}-*.parquet'
+        for path in self.root.glob(pattern):
+            groups.setdefault(path.parent, []).append(path)
+        removed = 0
+        for folder, files in groups.items():
+            if len(files) < 2:
+                continue
+            table = pa.concat_tables([pq.read_table(f) for f in sorted(files, key=lambda f: f.stat().st_mtime_ns)])
+            tmp = folder / f'.{self.run_id}-{uuid.uuid4().hex[:8]}.tmp'
+            pq.write_table(table, tmp)
+            os.replace(tmp, folder / f'{self.run_id}-compact-{uuid.uuid4().hex[:8]}.parquet')
+            for f in files:
+                f.unlink()
+            removed += len(files) - 1
+        return removed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    # ===== 查询 =====
+    def dataset(self) -> ds.Dataset:
+        """整个结果库的 pyarrow Dataset (尚未读取任何数据)"""
+        schema = pa.unify_schemas([RESULT_SCHEMA, PARTITION_SCHEMA])
+        return ds.dataset(self.root, format='parquet', schema=schema,
+                          partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'))
+
+    @staticmethod
+    def _build_filter(filter: Optional[ds.Expression] = None, **equals) -> Optional[ds.Expression]:
+        """等值条件 (列表表示 isin) 与自定义表达式取交集"""
+        for col, value in equals.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                cond = ds.field(col).isin(list(value))
+            else:
+                cond = ds.field(col) == value
+            filter = cond if filter is None else filter & cond
+        return filter
+
+    def query(self, columns: Optional[List[str]] = None, filter: Optional[ds.Expression] = None,
+              **equals) -> pd.DataFrame:
+        """
+        读取满足条件的结果
+        :param columns: 需要的列，None 表示全部
+        :param filter: pyarrow 表达式，如 ds.field('夏普比率') > 1
+        :param equals: 等值条件，如 factor='sma', symbol=['BTC-USDT', 'ETH-USDT'], run_id=store.run_id
+        """
+        if not self.root.exists():
+            return pd.DataFrame(columns=columns)
+        table = self.dataset().to_table(columns=columns, filter=self._build_filter(filter, **equals))
+        return table.to_pandas()
+
+    def aggregate(self, by: List[str], metrics: Dict[str, Union[str, List[str]]],
+                  filter: Optional[ds.Expression] = None, **equals) -> pd.DataFrame:
+        """
+        分组聚合，只读取分组列和指标列
+        :param by: 分组列，如 ['factor', 'symbol']
+        :param metrics: {指标列: 聚合方式}，聚合方式为 pyarrow 的 'mean' / 'max' / 'min' / 'count' 等
+        :return: 每组一行，列名为 '指标_聚合方式'
+        """
+        aggs = [(col, how) for col, hows in metrics.items()
+                for how in ([hows] if isinstance(hows, str) else hows)]
+        if not self.root.exists():
+            return pd.DataFrame(columns=list(by) + [f'{c}_{h}' for c, h in aggs])
+        columns = list(dict.fromkeys(list(by) + [c for c, _ in aggs]))
+        table = self.dataset().to_table(columns=columns, filter=self._build_filter(filter, **equals))
+        return table.group_by(list(by)).aggregate(aggs).to_pandas()
+
+    def top(self, n: int = 10, sort_by: str = '夏普比率', columns: Optional[List[str]] = None,
+            filter: Optional[ds.Expression] = None, **equals) -> pd.DataFrame:
+        """按指标从高到低取前 n 条"""
+        if columns is not None and sort_by not in columns:
+            columns = list(columns) + [sort_by]
+        df = self.query(columns=columns, filter=filter, **equals)
+        return df.sort_values(sort_by, ascending=False).head(n).reset_index(drop=True)
+
+    def finished_keys(self, **equals) -> set:
+        """结果库中已完成任务的 task_key 集合 (只读取 task_key 列)"""
+        df = self.query(columns=['task_key'], filter=ds.field('task_key').is_valid(), **equals)
+        return set(df['task_key'])
+
+    def runs(self) -> pd.DataFrame:
+        """历次运行的 run_id、结果条数和写入时间"""
+        df = self.aggregate(['run_id'], {'para': 'count', 'created_at': 'min'})
+        return df.rename(columns={'para_count': 'results', 'created_at_min': 'created_at'}).sort_values('run_id')
@@ -0,0 +1,352 @@
+"""
+滚动窗口指标的编译内核，一次遍历同时得到多个输出
+空值处理、min_periods 的口径与 pandas rolling 一致：窗口内非空值个数不足 min_periods 时输出空值
+均值 / 标准差沿用 pandas 的 Kahan 补偿与相同值修正，结果与 rolling().mean() / rolling().std() 逐位一致
+"""
+import math
+
+import numpy as np
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+def _rolling_mean_std_core(values: np.ndarray, window: int, min_periods: int, ddof: int) -> tuple:
+    """
+    滚动均值 (Kahan 求和) + 滚动标准差 (Welford 增量方差)，窗口滑动时只加入新值、移除旧值
+    :return: (均值数组, 标准差数组)
+    """
+    length = len(values)
+    mean = np.empty(length)
+    std = np.empty(length)
+
+    # 均值状态
+    sum_x = 0.0
+    sum_comp_add = 0.0
+    sum_comp_remove = 0.0
+    neg_ct = 0
+    # 方差状态
+    mean_x = 0.0
+    ssqdm_x = 0.0
+    var_comp_add = 0.0
+    var_comp_remove = 0.0
+    # 公共状态：非空值个数、末尾连续相同值的个数 (用于消除浮点误差)
+    nobs = 0
+    same_ct = 0
+    prev_value = np.nan
+
+    for i in range(length):
+        s = max(0, i - window + 1)
+        if i == 0 or s >= i:
+            # 窗口与上一个窗口不重叠，重新开始
+            sum_x = 0.0
+            sum_comp_add = 0.0
+            sum_comp_remove = 0.0
+            neg_ct = 0
+            mean_x = 0.0
+            ssqdm_x = 0.0
+            var_comp_add = 0.0
+            var_comp_remove = 0.0
+            nobs = 0
+            same_ct = 0
+            prev_value = np.nan
+            add_from = s
+            remove_from = s
+        else:
+            add_from = i
+            remove_from = max(0, i - window)
+
+        # 移除离开窗口的值
+        for j in range(remove_from, s):
+            val = values[j]
+            if val == val:
+                nobs -= 1
+                y = -val - sum_comp_remove
+                t = sum_x + y
+                sum_comp_remove = t - sum_x - y
+                sum_x = t
+                if math.copysign(1.0, val) < 0:
+                    neg_ct -= 1
+                if nobs:
+                    prev_mean = mean_x - var_comp_remove
+                    y = val - var_comp_remove
+                    t = y - mean_x
+                    var_comp_remove = t + mean_x - y
+                    mean_x = mean_x - t / nobs
+                    ssqdm_x = ssqdm_x - (val - prev_mean) * (val - mean_x)
+                else:
+                    mean_x = 0.0
+                    ssqdm_x = 0.0
+
+        # 加入新进入窗口的值
+        for j in range(add_from, i + 1):
+            val = values[j]
+            if val == val:
+                nobs += 1
+                y = val - sum_comp_add
+                t = sum_x + y
+                sum_comp_add = t - sum_x - y
+                sum_x = t
+                if math.copysign(1.0, val) < 0:
+                    neg_ct += 1
+                if val == prev_value:
+                    same_ct += 1
+                else:
+                    same_ct = 1
+                prev_value = val
+
+                prev_mean = mean_x - var_comp_add
+                y = val - var_comp_add
+                t = y - mean_x
+                var_comp_add = t + mean_x - y
+                mean_x = mean_x + t / nobs
+                ssqdm_x = ssqdm_x + (val - prev_mean) * (val - mean_x)
+
+        # 输出均值
+        if nobs >= min_periods and nobs > 0:
+            result = sum_x / nobs
+            if same_ct >= nobs:
+                result = prev_value
+            elif neg_ct == 0 and result < 0:
+                result = 0.0
+            elif neg_ct == nobs and result > 0:
+                result = 0.0
+            mean[i] = result
+        else:
+            mean[i] = np.nan
+
+        # 输出标准差
+        if nobs >= min_periods and nobs > ddof:
+            if nobs == 1 or same_ct >= nobs:
+                var = 0.0
+            else:
+                var = ssqdm_x / (nobs - ddof)
+            std[i] = math.sqrt(var) if var > 0 else 0.0
+        else:
+            std[i] = np.nan
+
+    return mean, std
+
+
+def _rolling_max_min_core(high: np.ndarray, low: np.ndarray, window: int, min_periods: int) -> tuple:
+    """
+    单调队列求滚动最大值 (high) 与滚动最小值 (low)，每个元素最多进出队列一次
+    :return: (最大值数组, 最小值数组)
+    """
+    length = len(high)
+    out_max = np.empty(length)
+    out_min = np.empty(length)
+    max_q = np.empty(length, dtype=np.int64)
+    min_q = np.empty(length, dtype=np.int64)
+    max_head, max_tail = 0, 0
+    min_head, min_tail = 0, 0
+    nobs_high = 0
+    nobs_low = 0
+
+    for i in range(length):
+        s = i - window + 1
+        # 移除离开窗口的值
+        if s > 0:
+            if high[s - 1] == high[s - 1]:
+                nobs_high -= 1
+            if low[s - 1] == low[s - 1]:
+                nobs_low -= 1
+        while max_head < max_tail and max_q[max_head] < s:
+            max_head += 1
+        while min_head < min_tail and min_q[min_head] < s:
+            min_head += 1
+
+        # 加入新值，队列中保持单调
+        h = high[i]
+        if h == h:
+            nobs_high += 1
+            while max_head < max_tail and high[max_q[max_tail - 1]] <= h:
+                max_tail -= 1
+            max_q[max_tail] = i
+            max_tail += 1
+        lo = low[i]
+        if lo == lo:
+            nobs_low += 1
+            while min_head < min_tail and low[min_q[min_tail - 1]] >= lo:
+                min_tail -= 1
+            min_q[min_tail] = i
+            min_tail += 1
+
+        out_max[i] = high[max_q[max_head]] if nobs_high >= min_periods and nobs_high > 0 else np.nan
+        out_min[i] = low[min_q[min_head]] if nobs_low >= min_periods and nobs_low > 0 else np.nan
+
+    return out_max, out_min
+
+
+def _rolling_quantile_core(values: np.ndarray, window: int, min_periods: int, quantiles: np.ndarray) -> np.ndarray:
+    """
+    有序窗口求滚动分位数 (线性插值)，窗口滑动时二分查找定位旧值、新值，
+    再原地平移元素完成删除、插入，每根K线 O(w)
+    :return: (K线数 × 分位数个数) 数组
+    """
+    length = len(values)
+    nq = len(quantiles)
+    out = np.empty((length, nq))
+    window_sorted = np.empty(window)
+    nobs = 0
+
+    for i in range(length):
+        # 移除离开窗口的值
+        s = i - window + 1
+        if s > 0:
+            old = values[s - 1]
+            if old == old:
+                pos = np.searchsorted(window_sorted[:nobs], old)
+                for j in range(pos, nobs - 1):
+                    window_sorted[j] = window_sorted[j + 1]
+                nobs -= 1
+        # 插入新值
+        val = values[i]
+        if val == val:
+            pos = np.searchsorted(window_sorted[:nobs], val)
+            for j in range(nobs, pos, -1):
+                window_sorted[j] = window_sorted[j - 1]
+            window_sorted[pos] = val
+            nobs += 1
+
+        for k in range(nq):
+            if nobs >= min_periods and nobs > 0:
+                idx_with_fraction = quantiles[k] * (nobs - 1)
+                idx = int(idx_with_fraction)
+                if idx_with_fraction == idx:
+                    out[i, k] = window_sorted[idx]
+                else:
+                    vlow = window_sorted[idx]
+                    vhigh = window_sorted[idx + 1]
+                    out[i, k] = vlow + (vhigh - vlow) * (idx_with_fraction - idx)
+            else:
+                out[i, k] = np.nan
+    return out
+
+
+def _rolling_linreg_core(values: np.ndarray, window: int) -> tuple:
+    """
+    滚动线性回归 (x 为窗口内位置 0..window-1)，窗口内有空值时输出空值
+    Σy、Σxy 随窗口滑动增量更新，每 window 根K线重新求和一次以消除累积误差
+    :return: (斜率, 截距, 窗口末端回归值)
+    """
+    length = len(values)
+    slope = np.full(length, np.nan)
+    intercept = np.full(length, np.nan)
+    endpoint = np.full(length, np.nan)
+    n = float(window)
+    sum_x = n * (n - 1) / 2
+    denom = n * (n - 1) * n * (2 * n - 1) / 6 - sum_x * sum_x  # n·Σx² - (Σx)²
+
+    sum_y = 0.0
+    sum_xy = 0.0
+    nan_ct = 0
+    since_refresh = window  # 第一次满窗口时重新求和
+    for i in range(length):
+        if values[i] != values[i]:
+            nan_ct += 1
+        if i >= window and values[i - window] != values[i - window]:
+            nan_ct -= 1
+        if i < window - 1:
+            continue
+        s = i - window + 1
+        if nan_ct > 0:
+            since_refresh = window
+            continue
+        if since_refresh >= window:
+            sum_y = 0.0
+            sum_xy = 0.0
+            for j in range(window):
+                sum_y += values[s + j]
+                sum_xy += j * values[s + j]
+            since_refresh = 0
+        else:
+            y_out = values[s - 1]
+            y_in = values[i]
+            # 保留下来的值 x 各减1，新值 x = window-1
+            sum_xy = sum_xy - (sum_y - y_out) + (n - 1) * y_in
+            sum_y = sum_y - y_out + y_in
+            since_refresh += 1
+        b = (n * sum_xy - sum_x * sum_y) / denom
+        a = (sum_y - b * sum_x) / n
+        slope[i] = b
+        intercept[i] = a
+        endpoint[i] = a + b * (n - 1)
+    return slope, intercept, endpoint
+
+
+# 如果安装了 Numba，则进行 JIT 编译
+if HAS_NUMBA:
+    _rolling_mean_std_optimized = numba.jit(nopython=True)(_rolling_mean_std_core)
+    _rolling_max_min_optimized = numba.jit(nopython=True)(_rolling_max_min_core)
+    _rolling_quantile_optimized = numba.jit(nopython=True)(_rolling_quantile_core)
+    _rolling_linreg_optimized = numba.jit(nopython=True)(_rolling_linreg_core)
+else:
+    _rolling_mean_std_optimized = _rolling_mean_std_core
+    _rolling_max_min_optimized = _rolling_max_min_core
+    _rolling_quantile_optimized = _rolling_quantile_core
+    _rolling_linreg_optimized = _rolling_linreg_core
+
+
+def _values(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64)
+
+
+def _min_periods(window: int, min_periods) -> int:
+    return int(window) if min_periods is None else int(min_periods)
+
+
+def rolling_mean_std(values, window: int, min_periods: int = None, ddof: int = 1) -> tuple:
+    """
+    滚动均值和标准差，等价于 s.rolling(window, min_periods).mean() / .std(ddof)
+    :return: (均值数组, 标准差数组)
+    """
+    return _rolling_mean_std_optimized(_values(values), int(window), _min_periods(window, min_periods), int(ddof))
+
+
+def rolling_mean_batch(values, windows, min_periods: int = None) -> np.ndarray:
+    """
+    多个窗口的滚动均值，结果与 rolling(window, min_periods).mean() 逐位一致
+    :param values: 一维数组 (各窗口共用)，或 (K线数 × 窗口数) 矩阵 (第 j 列使用 windows[j])
+    :param windows: 窗口列表
+    :param min_periods: 为空时等于各自的窗口
+    :return: (K线数 × 窗口数) 矩阵
+    """
+    values = _values(values)
+    out = np.empty((len(values), len(windows)), order='F')  # 按列存储，逐列计算时无需拷贝
+    for j, window in enumerate(windows):
+        col = values if values.ndim == 1 else np.ascontiguousarray(values[:, j])
+        out[:, j] = rolling_mean_std(col, window, min_periods)[0]
+    return out
+
+
+def rolling_max_min(high, low=None, window: int = 20, min_periods: int = None) -> tuple:
+    """
+    滚动最大值 (取自 high) 和滚动最小值 (取自 low)，等价于 high.rolling(...).max() / low.rolling(...).min()
+    :param low: 为空时与 high 相同
+    :return: (最大值数组, 最小值数组)
+    """
+    high = _values(high)
+    low = high if low is None else _values(low)
+    return _rolling_max_min_optimized(high, low, int(window), _min_periods(window, min_periods))
+
+
+def rolling_quantile(values, window: int, quantiles, min_periods: int = None) -> np.ndarray:
+    """
+    滚动分位数 (线性插值)，等价于 s.rolling(window, min_periods).quantile(q)
+    :param quantiles: 单个分位数或分位数列表
+    :return: 单个分位数时返回一维数组，否则为 (K线数 × 分位数个数) 数组
+    """
+    qs = np.atleast_1d(np.asarray(quantiles, dtype=np.float64))
+    out = _rolling_quantile_optimized(_values(values), int(window), _min_periods(window, min_periods), qs)
+    return out[:, 0] if np.ndim(quantiles) == 0 else out
+
+
+def rolling_linreg(values, window: int) -> tuple:
+    """
+    滚动线性回归，回归值与 rolling(window).apply(np.polyfit(..., 1)) 在浮点误差范围内一致
+    :return: (斜率, 截距, 窗口末端回归值)
+    """
+    return _rolling_linreg_optimized(_values(values), int(window))
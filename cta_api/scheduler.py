@@ -0,0 +1,195 @@
+import hashlib
+import importlib.util
+import json
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from cta_api.base import BacktestConfig
+from cta_api.engine import BacktestEngine
+
+
+@dataclass
+class TaskChunk:
+    """
+    一组同币种、同周期、同因子的参数，由一个 worker 连续执行
+    数据只加载一次、因子只导入一次，再逐个参数回测
+    """
+    symbol: str
+    factor_name: str
+    rule_type: str
+    para_list: List[list]
+    start: str
+    end: str
+    source_hash: str = ''
+    data_version: str = ''
+    min_amount: Optional[float] = None
+
+
+# 各因子共用的计算模块 (指标、信号与持仓、资金曲线、评价指标、引擎的切片和止盈止损)，修改后全部任务都需要重新回测
+KERNEL_MODULES = ['cta_api.function', 'cta_api.position', 'cta_api.rolling', 'cta_api.recursion',
+                  'cta_api.indicators', 'cta_api.statistics', 'cta_api.engine']
+
+
+def _module_source_hash(module_name: str) -> str:
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or not spec.origin:
+        return ''
+    with open(spec.origin, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def factor_source_hash(factor_name: str) -> str:
+    """因子源码的哈希，因子文件修改后其任务 key 随之变化，需要重新回测"""
+    return _module_source_hash(f'factors.{factor_name}')
+
+
+@lru_cache(maxsize=None)
+def kernel_source_hash() -> str:
+    """共用计算模块 (KERNEL_MODULES) 源码的哈希"""
+    return hashlib.sha1(''.join(_module_source_hash(m) for m in KERNEL_MODULES).encode()).hexdigest()
+
+
+def data_versions(engine: BacktestEngine, symbols: List[str], rule_type: str) -> Dict[str, str]:
+    """
+    各币种行情的数据版本 (分区存储的文件数与最大 mtime，或 .pkl 的 mtime)
+    数据被追加、补缺口或重新转换后任务 key 随之变化，断点续跑不会沿用旧数据的结果
+    """
+    versions = {}
+    for symbol in symbols:
+        try:
+            versions[symbol] = str(engine.data_version(symbol, rule_type))
+        except FileNotFoundError:
+            versions[symbol] = ''
+    return versions
+
+
+def task_key(factor_name: str, source_hash: str, symbol: str, para: list, rule_type: str,
+             start: str, end: str, config: BacktestConfig, data_version: str = '',
+             min_amount: Optional[float] = None) -> str:
+    """
+    单个回测任务的内容哈希：因子 (含源码哈希)、共用计算模块源码、币种、行情数据版本、参数、周期、时间区间、
+    交易成本配置、最小下单量、预热K线数完全相同即为同一任务
+    :param min_amount: 该币种的最小下单量 (最小下单量.csv 中没有的币种为 None)
+    """
+    content = {
+        'factor': factor_name, 'source': source_hash, 'kernels': kernel_source_hash(), 'symbol': symbol,
+        'data': data_version, 'para': list(para),
+        'rule_type': rule_type.upper(), 'start': str(start), 'end': str(end),
+        'c_rate': config.c_rate, 'slippage': config.slippage, 'leverage_rate': config.leverage_rate,
+        'min_margin_ratio': config.min_margin_ratio, 'proportion': config.proportion,
+        'min_amount': min_amount, 'warmup': config.data_warmup_bars,
+    }
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def adaptive_chunk_size(total_tasks: int, n_jobs: int, chunks_per_job: int = 4,
+                        min_size: int = 4, max_size: int = 64) -> int:
+    """
+    自适应分块大小：每个 worker 大约分到 chunks_per_job 块，保证负载均衡；
+    块不小于 min_size (摊薄数据加载和因子导入的开销)，也不大于 max_size (避免单块拖尾)
+    """
+    target = math.ceil(total_tasks / max(1, n_jobs * chunks_per_job))
+    return max(min_size, min(max_size, target))
+
+
+def build_task_chunks(symbols: List[str],
+                      factor_params: Dict[str, List[list]],
+                      rule_type: str,
+                      start: str,
+                      end: str,
+                      n_jobs: int = 1,
+                      chunk_size: int = 0,
+                      data_versions: Optional[Dict[str, str]] = None,
+                      min_amounts: Optional[Dict[str, float]] = None) -> List[TaskChunk]:
+    """
+    把 (币种 × 因子 × 参数) 的任务按 (symbol, rule_type, factor) 分组后切块
+    :param factor_params: {因子名: 参数列表}
+    :param chunk_size: 每块参数个数，0 表示按任务总量和 n_jobs 自适应
+    :param data_versions: {币种: 数据版本}，见 data_versions，写入任务 key
+    :param min_amounts: {币种: 最小下单量}，一般为 engine.min_amount_dict，写入任务 key
+    :return: TaskChunk 列表
+    """
+    total = len(symbols) * sum(len(p) for p in factor_params.values())
+    if chunk_size <= 0:
+        chunk_size = adaptive_chunk_size(total, n_jobs)
+
+    source_hashes = {f: factor_source_hash(f) for f in factor_params}
+    chunks = []
+    for symbol in symbols:
+        for factor_name, para_list in factor_params.items():
+            for i in range(0, len(para_list), chunk_size):
+                chunks.append(TaskChunk(symbol=symbol, factor_name=factor_name, rule_type=rule_type,
+                                        para_list=para_list[i:i + chunk_size], start=start, end=end,
+                                        source_hash=source_hashes[factor_name],
+                                        data_version=(data_versions or {}).get(symbol, ''),
+                                        min_amount=(min_amounts or {}).get(symbol)))
+    return chunks
+
+
+def split_finished_tasks(symbols: List[str],
+                         factor_params: Dict[str, List[list]],
+                         rule_type: str,
+                         start: str,
+                         end: str,
+                         config: BacktestConfig,
+                         finished_keys: set,
+                         data_versions: Optional[Dict[str, str]] = None,
+                         min_amounts: Optional[Dict[str, float]] = None) -> Tuple[Dict[str, List[list]], List[str]]:
+    """
+    按任务 key 去掉已完成的参数 (用于断点续跑)
+    :param finished_keys: 已完成任务的 key 集合，一般来自结果库的 task_key 列
+    :param data_versions: {币种: 数据版本}，须与 build_task_chunks 使用的一致
+    :param min_amounts: {币种: 最小下单量}，须与 build_task_chunks 使用的一致
+    :return: (剩余的 {因子名: 参数列表} (对全部 symbols 都已完成的参数才会去掉), 全部任务的 key 列表)
+    """
+    remaining = {}
+    all_keys = []
+    for factor_name, para_list in factor_params.items():
+        source_hash = factor_source_hash(factor_name)
+        todo = []
+        for para in para_list:
+            keys = [task_key(factor_name, source_hash, symbol, para, rule_type, start, end, config,
+                             (data_versions or {}).get(symbol, ''), (min_amounts or {}).get(symbol))
+                    for symbol in symbols]
+            all_keys.extend(keys)
+            if not all(k in finished_keys for k in keys):
+                todo.append(para)
+        if todo:
+            remaining[factor_name] = todo
+    return remaining, all_keys
+
+
+def run_chunk(engine: BacktestEngine, chunk: TaskChunk, with_last_row: bool = False) -> List[dict]:
+    """
+    执行一个任务块 (用于并行调用)
+    :param with_last_row: 是否把资金曲线最后一行的数据一并放入结果
+    :return: 每个参数一条结果记录 (symbol / factor / rule_type / para + 全部数值评价指标)
+    """
+    try:
+        results = engine.run_backtest_batch(
+            symbol=chunk.symbol,
+            factor_name=chunk.factor_name,
+            para_list=chunk.para_list,
+            rule_type=chunk.rule_type,
+            start_date=chunk.start,
+            end_date=chunk.end,
+        )
+    except Exception as e:
+        print(f"Error in {chunk.symbol} {chunk.factor_name}: {e}")
+        return []
+
+    records = []
+    for para, df, metrics in results:
+        res = df.iloc[-1].to_dict() if with_last_row else {}
+        res['symbol'] = chunk.symbol
+        res['factor'] = chunk.factor_name
+        res['rule_type'] = chunk.rule_type
+        res['para'] = str(para)
+        res['task_key'] = task_key(chunk.factor_name, chunk.source_hash, chunk.symbol, para,
+                                   chunk.rule_type, chunk.start, chunk.end, engine.config, chunk.data_version,
+                                   chunk.min_amount)
+        res.update(metrics)
+        records.append(res)
+    return records
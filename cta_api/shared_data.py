@@ -0,0 +1,119 @@
+import sys
+from dataclasses import dataclass
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 本进程发布的共享内存段 (名称 -> SharedMemory)，由 SharedMarketData 负责释放
+_PUBLISHED: Dict[str, shared_memory.SharedMemory] = {}
+# 本进程已挂载的共享内存段，保持引用以免映射被回收
+_ATTACHED: Dict[str, shared_memory.SharedMemory] = {}
+
+
+@dataclass(frozen=True)
+class SharedFrameHandle:
+    """
+    共享内存中一张行情表的描述 (可 pickle，传给 joblib 子进程)
+    内存布局：[时间列 int64 × nrows][数值列 float64 × (ncols × nrows)]
+    """
+    shm_name: str
+    nrows: int
+    time_column: str
+    float_columns: Tuple[str, ...]
+
+
+def _open_segment(name: str) -> shared_memory.SharedMemory:
+    """挂载已存在的共享内存段，不交给子进程的 resource_tracker 管理 (否则子进程退出时会被提前删除)"""
+    if name in _PUBLISHED:
+        return _PUBLISHED[name]
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Python 3.13 之前挂载也会登记到 resource_tracker，这里临时跳过登记
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def attach_frame(handle: SharedFrameHandle) -> pd.DataFrame:
+    """
+    按 handle 挂载共享行情，数值列直接引用共享内存 (只读，零拷贝)
+    因子新增列不受影响；对原始列做 inplace 修改会报错，而不会污染其他进程的数据
+    """
+    shm = _ATTACHED.get(handle.shm_name)
+    if shm is None:
+        shm = _open_segment(handle.shm_name)
+        _ATTACHED[handle.shm_name] = shm
+
+    n = handle.nrows
+    times = np.ndarray((n,), dtype='datetime64[ns]', buffer=shm.buf, offset=0)
+    values = np.ndarray((len(handle.float_columns), n), dtype=np.float64, buffer=shm.buf, offset=n * 8)
+    values.flags.writeable = False
+
+    df = pd.DataFrame(values.T, columns=list(handle.float_columns), copy=False)
+    df.insert(0, handle.time_column, times)
+    df.attrs['shared_memory'] = True
+    df.attrs['data_key'] = ('shm', handle.shm_name)
+    return df
+
+
+class SharedMarketData:
+    """
+    在主进程把行情数据发布到 multiprocessing.shared_memory，子进程通过 attach_frame 零拷贝读取
+    用法：
+        with SharedMarketData() as shared:
+            handle = shared.publish(df)
+            ...  # 把 handle 传给子进程
+    退出 with 时释放全部共享内存
+    """
+
+    def __init__(self):
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+
+    def publish(self, df: pd.DataFrame, time_column: str = 'candle_begin_time') -> SharedFrameHandle:
+        """
+        发布一张行情表：时间列 + 全部数值列 (统一存为 float64)，非数值列 (如 kline_pct 列表) 不发布
+        :return: SharedFrameHandle
+        """
+        float_columns = tuple(c for c in df.columns
+                              if c != time_column and pd.api.types.is_numeric_dtype(df[c])
+                              and not pd.api.types.is_bool_dtype(df[c]))
+        n = len(df)
+        size = max(1, n * 8 * (1 + len(float_columns)))
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        self._segments[shm.name] = shm
+        _PUBLISHED[shm.name] = shm
+
+        times = np.ndarray((n,), dtype='datetime64[ns]', buffer=shm.buf, offset=0)
+        times[:] = pd.to_datetime(df[time_column]).to_numpy(dtype='datetime64[ns]')
+        values = np.ndarray((len(float_columns), n), dtype=np.float64, buffer=shm.buf, offset=n * 8)
+        for i, c in enumerate(float_columns):
+            values[i] = df[c].to_numpy(dtype=np.float64)
+
+        return SharedFrameHandle(shm_name=shm.name, nrows=n, time_column=time_column, float_columns=float_columns)
+
+    def close(self) -> None:
+        """释放本对象发布的全部共享内存"""
+        for name, shm in self._segments.items():
+            _PUBLISHED.pop(name, None)
+            _ATTACHED.pop(name, None)
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+            try:
+                shm.close()
+            except BufferError:
+                # 本进程仍有 DataFrame 引用这段内存，映射随对象回收释放
+                pass
+        self._segments.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
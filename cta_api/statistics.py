@@ -23,38 +23,64 @@ def transfer_equity_curve_to_trade(equity_curve):
         equity_curve['start_time'].fillna(method='ffill', inplace=True)
         equity_curve.loc[equity_curve['pos'] == 0, 'start_time'] = pd.NaT
 
-    # =对每次交易进行分组，遍历每笔交易
-    trade = pd.DataFrame()  # 计算结果放在trade变量中
-
-    for _index, group in equity_curve.groupby('start_time'):
-
-        # 记录每笔交易
-        # 本次交易方向
-        trade.loc[_index, 'signal'] = group['pos'].iloc[0]
-
-        # 本次交易杠杆倍数
-        if 'leverage_rate' in group:
-            trade.loc[_index, 'leverage_rate'] = group['leverage_rate'].iloc[0]
-
-        g = group[group['pos'] != 0]  # 去除pos=0的行
-        # 本次交易结束那根K线的开始时间
-        trade.loc[_index, 'end_bar'] = g.iloc[-1]['candle_begin_time']
-        # 开仓价格
-        trade.loc[_index, 'start_price'] = g.iloc[0]['open']
-        # 平仓信号的价格
-        trade.loc[_index, 'end_price'] = g.iloc[-1]['close']
-        # 持仓k线数量
-        trade.loc[_index, 'bar_num'] = g.shape[0]
-        # 本次交易收益
-        trade.loc[_index, 'change'] = (group['equity_change'] + 1).prod() - 1
-        # 本次交易结束时资金曲线
-        trade.loc[_index, 'end_equity_curve'] = g.iloc[-1]['equity_curve']
-        # 本次交易中资金曲线最低值
-        trade.loc[_index, 'min_equity_curve'] = g['equity_curve'].min()
+    # =按start_time切分每笔交易：同一笔交易的K线是连续的，start_time变化处即为交易边界
+    start_time = equity_curve['start_time'].to_numpy(dtype='datetime64[ns]')
+    in_trade = ~np.isnat(start_time)
+    if not in_trade.any():
+        return pd.DataFrame()
+    rows = np.flatnonzero(in_trade)
+    new_trade = np.r_[True, start_time[rows[1:]] != start_time[rows[:-1]]] | np.r_[True, np.diff(rows) != 1]
+    bounds = np.flatnonzero(new_trade)  # 每笔交易在rows中的起始位置
+
+    pos = equity_curve['pos'].to_numpy(dtype=np.float64)[rows]
+    holding = pos != 0  # 去除pos=0的行
+    idx = np.arange(len(rows))
+    first = np.minimum.reduceat(np.where(holding, idx, len(rows)), bounds)  # 每笔交易第一根持仓K线
+    last = np.maximum.reduceat(np.where(holding, idx, -1), bounds)  # 每笔交易最后一根持仓K线
+
+    candle_begin_time = equity_curve['candle_begin_time'].to_numpy()[rows]
+    equity = equity_curve['equity_curve'].to_numpy(dtype=np.float64)[rows]
+    equity_change = equity_curve['equity_change'].to_numpy(dtype=np.float64)[rows] + 1
+
+    trade = pd.DataFrame(index=pd.DatetimeIndex(start_time[rows][bounds]))
+    # 本次交易方向
+    trade['signal'] = pos[bounds]
+    # 本次交易杠杆倍数
+    if 'leverage_rate' in equity_curve:
+        trade['leverage_rate'] = equity_curve['leverage_rate'].to_numpy(dtype=np.float64)[rows][bounds]
+    # 本次交易结束那根K线的开始时间
+    trade['end_bar'] = candle_begin_time[last]
+    # 开仓价格
+    trade['start_price'] = equity_curve['open'].to_numpy(dtype=np.float64)[rows][first]
+    # 平仓信号的价格
+    trade['end_price'] = equity_curve['close'].to_numpy(dtype=np.float64)[rows][last]
+    # 持仓k线数量
+    trade['bar_num'] = np.add.reduceat(holding, bounds).astype(np.float64)
+    # 本次交易收益 (与pandas的prod一致，跳过空值)
+    trade['change'] = np.multiply.reduceat(np.where(np.isnan(equity_change), 1.0, equity_change), bounds) - 1
+    # 本次交易结束时资金曲线
+    trade['end_equity_curve'] = equity[last]
+    # 本次交易中资金曲线最低值 (与pandas的min一致，跳过空值)
+    trade['min_equity_curve'] = np.fmin.reduceat(np.where(holding, equity, np.nan), bounds)
 
     return trade
 
 
+# 每天的K线数量，用于年化波动率
+def _bars_per_day(rule_type):
+    if rule_type.endswith('T') or rule_type.endswith('min'):
+        rule = int(rule_type[:-1]) if rule_type[:-1].isdigit() else int(rule_type[:-3])
+        return 24 * 60 / rule
+    elif rule_type.lower().endswith('h'):
+        rule = int(rule_type[:-1])
+        return 24 / rule
+    elif rule_type.lower().endswith('d'):
+        rule = int(rule_type[:-1])
+        return 1 / rule
+    # Default fallback or error handling
+    return 24  # Assume 1H if unknown
+
+
 # 计算策略评价指标
 def strategy_evaluate(equity_curve, trade, rule_type):
     """
@@ -70,19 +96,7 @@ def strategy_evaluate(equity_curve, trade, rule_type):
     results.loc[0, '累积净值'] = round(equity_curve['equity_curve'].iloc[-1], 2)
 
     # ===计算年化收益
-    if rule_type.endswith('T') or rule_type.endswith('min'):
-        rule = int(rule_type[:-1]) if rule_type[:-1].isdigit() else int(rule_type[:-3])
-        n = 24*60/rule
-    elif rule_type.lower().endswith('h'):
-        rule = int(rule_type[:-1])
-        n = 24/rule
-    elif rule_type.lower().endswith('d'):
-        rule = int(rule_type[:-1])
-        n = 1/rule
-    else:
-        # Default fallback or error handling
-        n = 24 # Assume 1H if unknown
-
+    n = _bars_per_day(rule_type)
 
     # 计算总收益
     total_return = equity_curve['equity_curve'].iloc[-1] / equity_curve['equity_curve'].iloc[0]
@@ -194,6 +208,90 @@ def strategy_evaluate(equity_curve, trade, rule_type):
     return results.T, monthly_return
 
 
+def _max_run(mask):
+    """布尔数组中最长的连续 True 个数"""
+    if not mask.any():
+        return 0
+    edges = np.diff(np.r_[0, mask.astype(np.int8), 0])
+    return int((np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)).max())
+
+
+# 计算策略评价指标 (纯数值版本，用于批量回测)
+def strategy_evaluate_numeric(equity_curve, trade, rule_type, monthly=False):
+    """
+    与 strategy_evaluate 相同的指标，但全部以数值返回，不做字符串格式化，不修改 equity_curve
+    百分比指标为小数 (如 -0.25 表示 -25%)，持有时间单位为天，最大回撤起止时间为 Timestamp
+    :param equity_curve: 带资金曲线的df
+    :param trade: transfer_equity_curve_to_trade的输出结果，每笔交易的df
+    :param monthly: 是否计算每月收益率 (resample 较慢，批量回测时默认不计算)
+    :return: (指标 dict, 每月收益率 或 None)
+    """
+    equity = equity_curve['equity_curve'].to_numpy(dtype=np.float64)
+    candle_begin_time = equity_curve['candle_begin_time']
+    record = {'累积净值': equity[-1]}
+
+    # ===计算年化收益
+    total_return = equity[-1] / equity[0]
+    time_difference = candle_begin_time.iloc[-1] - candle_begin_time.iloc[0]
+    time_difference_in_days = int(time_difference.total_seconds() / (60 * 60 * 24))
+    if time_difference_in_days > 0:
+        annual_return = total_return ** (365 / time_difference_in_days) - 1
+        monthly_return_mean = total_return ** (30 / time_difference_in_days) - 1
+    else:
+        annual_return = monthly_return_mean = np.nan
+    record['年化收益'] = annual_return
+
+    # ===计算最大回撤：一次遍历得到历史最高点，不排序
+    dd2here = equity / np.maximum.accumulate(equity) - 1
+    end = int(np.nanargmin(dd2here)) if not np.isnan(dd2here).all() else len(equity) - 1
+    start = int(np.nanargmax(equity[:end + 1])) if not np.isnan(equity[:end + 1]).all() else 0
+    max_draw_down = dd2here[end]
+    record['最大回撤'] = max_draw_down
+    record['最大回撤开始时间'] = candle_begin_time.iloc[start]
+    record['最大回撤结束时间'] = candle_begin_time.iloc[end]
+
+    # ===年化收益/回撤比
+    record['年化收益/回撤比'] = annual_return / abs(max_draw_down) if max_draw_down != 0 else np.nan
+
+    # ===夏普比率
+    volatility = equity_curve['equity_change'].std() * ((_bars_per_day(rule_type) * 365) ** 0.5)
+    record['夏普比率'] = annual_return / volatility if volatility != 0 else 0.0
+
+    # ===统计每笔交易
+    change = trade['change'].to_numpy(dtype=np.float64) if not trade.empty else np.array([])
+    win, loss = change > 0, change < 0
+    record['盈利笔数'] = int(win.sum())
+    record['亏损笔数'] = int((change <= 0).sum())
+    if len(change):
+        hold_days = (trade['end_bar'] - trade.index).dt.total_seconds().to_numpy() / (60 * 60 * 24)
+        avg_loss = change[loss].mean() if loss.any() else np.nan
+        record['胜率'] = win.sum() / len(change)
+        record['每笔交易平均盈亏'] = change.mean()
+        record['盈亏收益比'] = change[win].mean() / avg_loss * (-1) if win.any() and loss.any() and avg_loss != 0 else 0.0
+        record['单笔最大盈利'] = change.max()
+        record['单笔最大亏损'] = change.min()
+        record['单笔最长持有时间'] = hold_days.max()
+        record['单笔最短持有时间'] = hold_days.min()
+        record['平均持仓周期'] = hold_days.mean()
+    else:
+        for k in ['胜率', '每笔交易平均盈亏', '盈亏收益比', '单笔最大盈利', '单笔最大亏损',
+                  '单笔最长持有时间', '单笔最短持有时间', '平均持仓周期']:
+            record[k] = 0.0
+    record['最大连续盈利笔数'] = _max_run(win)
+    record['最大连续亏损笔数'] = _max_run(loss)
+
+    # ===平均月化收益
+    record['月化收益'] = monthly_return_mean
+
+    # ===每月收益率
+    monthly_return = None
+    if monthly:
+        monthly_return = equity_curve.set_index('candle_begin_time')[['equity_change']].resample(rule='M').apply(
+            lambda x: (1 + x).prod() - 1)
+
+    return record, monthly_return
+
+
 def return_drawdown_ratio(equity_curve):
     """
     :param equity_curve: 带资金曲线的df
@@ -0,0 +1,325 @@
+"""
+增量 (流式) 回测
+0_数据获取 增量补了几根K线之后，不必对多年的历史重新 run_backtest：
+检查点中保存策略的全部状态 (止损持仓与开仓价、向前填充的信号、资金曲线的账户状态、因子预热窗口内的信号)，
+新K线写入 pickle_data 后，从检查点逐根K线续算，耗时只与新增K线数 (加上预热窗口) 有关
+
+口径说明：
+- 最后一根K线是否平仓、止损开仓价都取决于下一根K线，因此检查点停在倒数第二根K线，最后一根K线每次更新时重算
+- 因子以止盈止损比例为 inf 调用得到原始信号，止盈止损由这里带状态统一处理 (与 signal_batch 路径一致)
+- 因子是整段向量化计算的，其滚动窗口 / EMA 等状态由最近 warmup 根K线承载：每次只在
+  (预热窗口 + 新K线) 上重算因子。窗口不足以让递推类指标收敛时，会与检查点中的历史信号比对并给出警告
+"""
+import os
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from cta_api.engine import BacktestEngine
+from cta_api.function import (_process_stop_loss_optimized, cal_equity_curve_batch, equity_state,
+                              stop_loss_state, drop_duplicate_signal, format_kline_pct)
+from cta_api.position import _signal_to_pos_optimized
+
+# 输出的资金曲线列 (与 BacktestEngine._save_results 的基础列一致)
+OUTPUT_COLS = ['candle_begin_time', 'open', 'high', 'low', 'close', 'signal', 'pos',
+               'quote_volume', 'kline_pct', 'r_line_equity_curve']
+
+
+@dataclass
+class StreamState:
+    """
+    增量回测检查点，last_time 为最后一根已确定的K线 (数据中最后一根K线的前一根)
+    """
+    symbol: str
+    factor_name: str
+    para: list
+    rule_type: str
+    offset: int
+    start_date: pd.Timestamp
+    settings: tuple  # (c_rate, slippage, leverage_rate, min_margin_ratio, proportion, min_amount)，变化后需重建
+    warmup: int
+    last_time: pd.Timestamp
+    raw_last: float  # 截至 last_time 最后一个非空的原始信号 (信号去重用)
+    signal_last: float  # 截至 last_time 向前填充后的信号 signal_ (计算持仓用)
+    stop_state: np.ndarray  # 止损状态，见 stop_loss_state()
+    equity: np.ndarray  # 资金曲线账户状态，见 equity_state()
+    tail_time: np.ndarray  # 最近 warmup 根已确定K线的时间 (int64 纳秒)
+    tail_raw: np.ndarray  # 对应的原始信号，用于检查预热窗口是否足够
+    n_bars: int  # 已确定的K线数
+    csv_bytes: int  # 资金曲线文件中已确定部分的字节数
+
+
+class StreamingBacktest:
+    """
+    单个 (币种, 因子, 参数) 的增量回测
+    用法：
+        stream = StreamingBacktest(engine, 'BTC-USDT', 'sma', [200], start_date='2021-01-01')
+        new_rows = stream.run()   # 没有检查点时全量初始化，之后每次只处理新增K线
+    """
+
+    def __init__(self, engine: BacktestEngine, symbol: str, factor_name: str, para: list,
+                 rule_type: str = '1H', start_date: str = '2020-01-01', offset: int = 0,
+                 warmup: int = 2000, state_path: Optional[str] = None):
+        """
+        :param warmup: 因子预热窗口 (K线数)，需覆盖因子最长的回看周期；递推类指标 (EMA / KAMA / SAR 等) 需留足收敛长度
+        :param state_path: 检查点目录，默认 data/stream_state
+        """
+        self.engine = engine
+        self.symbol = symbol
+        self.factor_name = factor_name
+        self.para = para
+        self.rule_type = rule_type
+        self.start_date = pd.to_datetime(start_date)
+        self.offset = offset
+        self.warmup = int(warmup)
+
+        name = f"{factor_name}&{symbol.split('-')[0]}&{rule_type}&{str(para)}"
+        state_dir = Path(state_path) if state_path else engine.root_path / 'data/stream_state'
+        state_dir.mkdir(parents=True, exist_ok=True)
+        (engine.output_path / 'stream').mkdir(exist_ok=True)
+        self.state_file = state_dir / f"{name}.pkl"
+        self.equity_file = engine.output_path / 'stream' / f"{name}.csv"
+        self.state: Optional[StreamState] = self._load_state()
+
+        # 原始信号：止盈止损比例为 inf 时因子内的止损不会触发
+        self._signal_func = engine._load_signal_func(factor_name, proportion=np.inf)
+
+    # ===== 检查点
+    @property
+    def settings(self) -> tuple:
+        cfg = self.engine.config
+        min_amount = self.engine.min_amount_dict.get(self.symbol, 0.001)
+        return (cfg.c_rate, cfg.slippage, cfg.leverage_rate, cfg.min_margin_ratio, cfg.proportion, min_amount)
+
+    def _load_state(self) -> Optional[StreamState]:
+        if not self.state_file.exists():
+            return None
+        try:
+            with open(self.state_file, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            self.engine.logger.warning(f"Failed to load stream state {self.state_file.name}: {e}")
+            return None
+
+    def _save_state(self) -> None:
+        """先写临时文件再替换，中途退出不会留下损坏的检查点"""
+        tmp = self.state_file.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(self.state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.state_file)
+
+    def _compatible(self) -> bool:
+        """检查点与当前的参数、费用设置是否一致"""
+        s = self.state
+        return (s is not None and s.para == self.para and s.offset == self.offset and s.warmup == self.warmup
+                and s.start_date == self.start_date and s.settings == self.settings
+                and self.equity_file.exists() and self.equity_file.stat().st_size >= s.csv_bytes)
+
+    # ===== 计算
+    def _raw_signal(self, df: pd.DataFrame) -> np.ndarray:
+        """因子的原始信号 (已去重、未止盈止损)"""
+        out = self._signal_func(df, self.para)
+        if len(out) != len(df):
+            raise ValueError(f"factor returned {len(out)} rows, expected {len(df)}")
+        return out['signal'].to_numpy(dtype=np.float64)
+
+    def _advance(self, seg: pd.DataFrame, raw: np.ndarray, raw_last: float, signal_last: float,
+                 stop: np.ndarray, equity: np.ndarray) -> tuple:
+        """
+        从给定状态出发逐根K线计算 seg 的止损信号、持仓和资金曲线，状态数组原地更新到 seg 倒数第二根K线之后
+        :return: (seg 的输出列, 去重后的原始信号, 向前填充后的信号 signal_)
+        """
+        raw = drop_duplicate_signal(np.r_[raw_last, raw])[1:]
+        open_arr = seg['open'].to_numpy(dtype=np.float64)
+        close_arr = seg['close'].to_numpy(dtype=np.float64)
+        signal = _process_stop_loss_optimized(open_arr, close_arr, raw, self.engine.config.proportion,
+                                              self.engine.config.leverage_rate, stop)[0]
+        signal_, pos = _signal_to_pos_optimized(np.r_[signal_last, signal])
+        signal_, pos = signal_[1:], pos[1:]
+
+        cfg = self.engine.config
+        _, equity_curve = cal_equity_curve_batch(
+            pos, open_arr, seg['high'].to_numpy(), seg['low'].to_numpy(), close_arr,
+            slippage=cfg.slippage, c_rate=cfg.c_rate, leverage_rate=cfg.leverage_rate,
+            min_amount=self.settings[-1], min_margin_ratio=cfg.min_margin_ratio, state=equity
+        )
+
+        out = seg[[c for c in OUTPUT_COLS if c in seg.columns]].copy()
+        out['signal'] = signal
+        out['pos'] = pos
+        out['r_line_equity_curve'] = equity_curve[:, 0]
+        return out[[c for c in OUTPUT_COLS if c in out.columns]], raw, signal_
+
+    def _write_equity(self, out: pd.DataFrame, truncate_at: int, header: bool) -> int:
+        """
+        资金曲线文件：截掉上次未确定的最后一行，追加新的已确定K线，再追加新的最后一行
+        :return: 已确定部分的字节数
+        """
+        if 'kline_pct' in out.columns:
+            out = out.assign(kline_pct=format_kline_pct(out['kline_pct']))
+        mode = 'r+b' if truncate_at > 0 else 'wb'
+        with open(self.equity_file, mode) as f:
+            f.truncate(truncate_at)
+            f.seek(truncate_at)
+            f.write(out.iloc[:-1].to_csv(index=False, header=header).encode('gbk'))
+            committed = f.tell()
+            f.write(out.iloc[-1:].to_csv(index=False, header=False).encode('gbk'))
+        return committed
+
+    def initialize(self) -> pd.DataFrame:
+        """全量计算一次并建立检查点，返回回测区间内的全部K线"""
+        df = self.engine.load_data(self.symbol, self.rule_type, self.offset)
+        in_range = (df['candle_begin_time'] >= self.start_date).to_numpy()
+        if in_range.sum() < 2:
+            raise ValueError(f"Not enough data after {self.start_date} for {self.symbol}")
+
+        # 全历史的原始信号和止损，回测区间之前的部分只用于确定区间起点的持仓
+        raw = self._raw_signal(df.copy())
+        n_pre = int(np.argmax(in_range))
+        stop = stop_loss_state()
+        signal_last, raw_last = 0.0, np.nan
+        if n_pre > 0:
+            pre = df.iloc[:n_pre + 1]
+            signal_ = self._advance(pre, raw[:n_pre + 1], np.nan, 0.0, stop, equity_state())[2]
+            signal_last = signal_[-2]
+            raw_last = _last_valid(raw[:n_pre])
+
+        equity = equity_state()
+        seg = df.iloc[n_pre:]
+        out, seg_raw, signal_ = self._advance(seg, raw[n_pre:], raw_last, signal_last, stop, equity)
+
+        all_raw = np.r_[raw[:n_pre], seg_raw]
+        times = df['candle_begin_time'].to_numpy().astype('datetime64[ns]').astype(np.int64)
+        tail = slice(max(0, len(df) - 1 - self.warmup), len(df) - 1)
+        self.state = StreamState(
+            symbol=self.symbol, factor_name=self.factor_name, para=self.para, rule_type=self.rule_type,
+            offset=self.offset, start_date=self.start_date, settings=self.settings, warmup=self.warmup,
+            last_time=df['candle_begin_time'].iloc[-2],
+            raw_last=_last_valid(all_raw[:-1]),
+            signal_last=signal_[-2],
+            stop_state=stop, equity=equity,
+            tail_time=times[tail], tail_raw=all_raw[tail],
+            n_bars=len(out) - 1,
+            csv_bytes=0,
+        )
+        self.state.csv_bytes = self._write_equity(out, 0, header=True)
+        self._save_state()
+        self.engine.logger.info(f"[{self.symbol}] {self.factor_name} {self.para} stream initialized: "
+                                f"{len(out)} bars, equity {out['r_line_equity_curve'].iloc[-1]:.4f}")
+        return out
+
+    def update(self) -> pd.DataFrame:
+        """
+        从检查点续算新增的K线
+        :return: 重算的K线 (上次的最后一根 + 新增K线)，没有新K线时为空
+        """
+        s = self.state
+        df = self.engine.load_data(self.symbol, self.rule_type, self.offset)
+        times = df['candle_begin_time']
+        pos_last = int(np.searchsorted(times.to_numpy(), np.datetime64(s.last_time), side='left'))
+        if pos_last >= len(df) or times.iloc[pos_last] != s.last_time:
+            raise ValueError(f"{s.last_time} not found in data, history was rewritten")
+        seg_start = pos_last + 1
+        if len(df) - seg_start < 2:
+            return df.iloc[0:0]
+
+        # 在 (预热窗口 + 新K线) 上重算因子
+        win_start = max(0, seg_start - self.warmup)
+        win = df.iloc[win_start:]
+        raw_win = self._raw_signal(win.copy())
+        self._check_warmup(win['candle_begin_time'], raw_win[:seg_start - win_start])
+
+        stop, equity = s.stop_state.copy(), s.equity.copy()
+        seg = df.iloc[seg_start:]
+        out, seg_raw, signal_ = self._advance(seg, raw_win[seg_start - win_start:], s.raw_last, s.signal_last,
+                                              stop, equity)
+
+        # 更新检查点
+        seg_raw = seg_raw[:-1]
+        seg_time = seg['candle_begin_time'].to_numpy()[:-1].astype('datetime64[ns]').astype(np.int64)
+        s.tail_time = np.r_[s.tail_time, seg_time][-self.warmup:]
+        s.tail_raw = np.r_[s.tail_raw, seg_raw][-self.warmup:]
+        s.last_time = seg['candle_begin_time'].iloc[-2]
+        s.raw_last = _last_valid(np.r_[s.raw_last, seg_raw])
+        s.signal_last = signal_[-2]
+        s.stop_state, s.equity = stop, equity
+        s.n_bars += len(out) - 1
+        s.csv_bytes = self._write_equity(out, s.csv_bytes, header=False)
+        self._save_state()
+        self.engine.logger.info(f"[{self.symbol}] {self.factor_name} {self.para} stream +{len(out) - 1} bars, "
+                                f"equity {out['r_line_equity_curve'].iloc[-1]:.4f}")
+        return out
+
+    def _check_warmup(self, win_time: pd.Series, win_raw: np.ndarray) -> None:
+        """
+        预热窗口后半段的已确定K线，信号应与检查点中的历史信号一致
+        (前半段留给指标预热；窗口内第一个信号之后，去重口径与全历史相同)，不一致说明预热窗口不足以让指标收敛
+        """
+        s = self.state
+        first = np.flatnonzero(~np.isnan(win_raw))
+        if len(first) == 0:
+            return
+        t = win_time.to_numpy()[:len(win_raw)].astype('datetime64[ns]').astype(np.int64)
+        idx = np.searchsorted(s.tail_time, t)
+        found = (idx < len(s.tail_time)) & (s.tail_time[np.minimum(idx, len(s.tail_time) - 1)] == t)
+        found[:max(first[0] + 1, len(win_raw) // 2)] = False
+        if not found.any():
+            return
+        a, b = win_raw[found], s.tail_raw[idx[found]]
+        n_diff = int((~((a == b) | (np.isnan(a) & np.isnan(b)))).sum())
+        if n_diff:
+            self.engine.logger.warning(f"[{self.symbol}] {self.factor_name} {self.para}: {n_diff} signals in the "
+                                       f"warmup window differ from history, consider a larger warmup than {self.warmup}")
+
+    def run(self) -> pd.DataFrame:
+        """有可用检查点时增量更新，否则 (首次运行、参数或费用变化、历史被改写) 全量初始化"""
+        if self._compatible():
+            try:
+                return self.update()
+            except ValueError as e:
+                self.engine.logger.warning(f"[{self.symbol}] {self.factor_name} {self.para}: {e}, rebuilding")
+        return self.initialize()
+
+    def load_equity(self) -> pd.DataFrame:
+        """读取完整的资金曲线"""
+        return pd.read_csv(self.equity_file, encoding='gbk', parse_dates=['candle_begin_time'],
+                           float_precision='round_trip')
+
+
+def _last_valid(values: np.ndarray) -> float:
+    """最后一个非空值，没有时返回 nan"""
+    valid = np.flatnonzero(~np.isnan(values))
+    return values[valid[-1]] if len(valid) else np.nan
+
+
+def run_stream_book(engine: BacktestEngine, book: List[tuple], rule_type: str = '1H',
+                    start_date: str = '2020-01-01', warmup: int = 2000,
+                    state_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    增量更新一组策略
+    :param book: [(symbol, factor_name, para), ...]
+    :return: 每个策略一行：本次处理的K线数、最新时间、最新持仓和资金曲线
+    """
+    rows = []
+    for symbol, factor_name, para in book:
+        try:
+            stream = StreamingBacktest(engine, symbol, factor_name, para, rule_type, start_date,
+                                       warmup=warmup, state_path=state_path)
+            out = stream.run()
+        except Exception as e:
+            engine.logger.error(f"[{symbol}] {factor_name} {para} stream failed: {e}")
+            continue
+        row = {'symbol': symbol, 'factor': factor_name, 'para': str(para), 'new_bars': max(len(out) - 1, 0)}
+        if stream.state is not None:
+            row['last_time'] = stream.state.last_time
+            row['bars'] = stream.state.n_bars
+        if len(out):
+            row['candle_begin_time'] = out['candle_begin_time'].iloc[-1]
+            row['pos'] = out['pos'].iloc[-1]
+            row['equity_curve'] = out['r_line_equity_curve'].iloc[-1]
+        rows.append(row)
+    return pd.DataFrame(rows)
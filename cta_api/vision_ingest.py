@@ -0,0 +1,259 @@
+"""
+Binance Vision 历史K线批量导入
+- 已结束的月份下载月度压缩包 (一个月一个文件)，当月及月度包缺失的月份按天下载，只下载请求范围内的日期
+- 文件地址按命名规则直接拼出，不再抓取目录页面
+- 压缩包下载到本地缓存目录 (与 data.binance.vision 的路径一致)，边下载边计算 sha256 并与 .CHECKSUM 核对，
+  核对通过后才放入缓存；已缓存的文件不再下载，404 的文件在 missing_ttl 内不再重复请求
+- 多个 (币种, 文件) 由线程池并行下载、解压，CSV 从缓存中的 zip 流式解压解析，不把整个文件读进内存
+- ingest 把结果按月份合并写入分区存储 (MarketStore.update)
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow.csv as pv
+import requests
+from joblib import Parallel, delayed
+
+from cta_api.market_store import MarketStore
+
+VISION_URL = "https://data.binance.vision"
+
+# K线 CSV 的列 (新文件带表头，早期文件没有表头，统一按位置命名)
+KLINE_CSV_COLUMNS = ["open_time", "open", "high", "low", "close", "volume", "close_time", "quote_volume",
+                     "count", "taker_buy_volume", "taker_buy_quote_volume", "ignore"]
+
+OUTPUT_COLUMNS = ["candle_begin_time", "open", "high", "low", "close", "volume", "quote_volume", "trade_num",
+                  "taker_buy_base_asset_volume", "taker_buy_quote_asset_volume", "taker_sell_quote_asset_volume"]
+
+
+def plan_files(symbol: str, interval: str, start, end, today: Optional[pd.Timestamp] = None) -> List[Tuple[str, str]]:
+    """
+    [start, end] 需要的文件
+    :return: [('monthly', '2023-01'), ..., ('daily', '2024-05-01'), ...]，已结束的月份用月度包，当月按天 (到昨天为止)
+    """
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    today = (today or pd.Timestamp.utcnow().tz_localize(None)).normalize()
+    end = min(end, today - pd.Timedelta(days=1))
+    this_month = today.to_period("M")
+    files = []
+    for month in pd.period_range(start.to_period("M"), end.to_period("M"), freq="M") if start <= end else []:
+        if month < this_month:
+            files.append(("monthly", month.strftime("%Y-%m")))
+        else:
+            files.extend(("daily", d.strftime("%Y-%m-%d"))
+                         for d in pd.date_range(max(start, month.start_time), min(end, month.end_time.normalize())))
+    return files
+
+
+def month_days(month: str, start, end) -> List[Tuple[str, str]]:
+    """月度包缺失时改为下载该月在 [start, end] 内的每日文件"""
+    period = pd.Period(month, freq="M")
+    lo = max(pd.Timestamp(start).normalize(), period.start_time)
+    hi = min(pd.Timestamp(end).normalize(), period.end_time.normalize())
+    return [("daily", d.strftime("%Y-%m-%d")) for d in pd.date_range(lo, hi)]
+
+
+def read_kline_zip(path: Union[str, Path]) -> pd.DataFrame:
+    """从 zip 中流式解压并解析K线 CSV，输出与 binance_fetcher.fetch_klines 相同的列"""
+    with zipfile.ZipFile(path) as z:
+        name = z.namelist()[0]
+        with z.open(name) as f:
+            first = f.readline()
+        has_header = not first[:1].isdigit()
+        with z.open(name) as f:
+            table = pv.read_csv(f, read_options=pv.ReadOptions(column_names=KLINE_CSV_COLUMNS,
+                                                               skip_rows=1 if has_header else 0))
+    df = table.to_pandas()
+    out = pd.DataFrame({"candle_begin_time": pd.to_datetime(df["open_time"], unit="ms")})
+    for src, dst in [("open", "open"), ("high", "high"), ("low", "low"), ("close", "close"), ("volume", "volume"),
+                     ("quote_volume", "quote_volume"), ("count", "trade_num"),
+                     ("taker_buy_volume", "taker_buy_base_asset_volume"),
+                     ("taker_buy_quote_volume", "taker_buy_quote_asset_volume")]:
+        out[dst] = pd.to_numeric(df[src], errors="coerce").astype(np.float64)
+    out["taker_sell_quote_asset_volume"] = out["quote_volume"] - out["taker_buy_quote_asset_volume"]
+    return out[OUTPUT_COLUMNS]
+
+
+class VisionIngester:
+    """
+    Binance Vision K线下载器 (U 本位合约)
+    用法：
+        ingester = VisionIngester(cache_dir='data/vision_cache', workers=8)
+        df = ingester.fetch('BTCUSDT', '1h', '2021-01-01', '2024-01-01')
+        ingester.ingest_many(['BTCUSDT', 'ETHUSDT'], '1h', '2021-01-01', '2024-01-01', MarketStore(...))
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], workers: int = 8, base_url: str = VISION_URL,
+                 missing_ttl: float = 86400, max_retries: int = 3, timeout: float = 60):
+        """
+        :param cache_dir: zip 缓存目录
+        :param workers: 并行下载的线程数
+        :param base_url: Vision 地址，测试时可指向本地服务器
+        :param missing_ttl: 404 结果的缓存时间 (秒)，期间不再请求该文件
+        :param max_retries: 网络错误或校验失败的重试次数
+        """
+        self.cache_dir = Path(cache_dir)
+        self.workers = workers
+        self.base_url = base_url.rstrip("/")
+        self.missing_ttl = missing_ttl
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._local = threading.local()
+        # 下载或校验失败的币种 -> 错误信息
+        self.errors = {}
+
+    # ===== 下载 =====
+    def _session(self) -> requests.Session:
+        """每个线程一个 Session，复用连接"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    @staticmethod
+    def file_path(symbol: str, interval: str, kind: str, period: str) -> str:
+        """文件在 Vision 上的相对路径"""
+        sym = symbol.replace("-", "")
+        return f"data/futures/um/{kind}/klines/{sym}/{interval}/{sym}-{interval}-{period}.zip"
+
+    def _expected_sha256(self, url: str) -> Optional[str]:
+        r = self._session().get(url + ".CHECKSUM", timeout=self.timeout)
+        if r.status_code != 200:
+            return None
+        return r.text.split()[0].strip().lower() if r.text.strip() else None
+
+    def download(self, rel_path: str) -> Optional[Path]:
+        """
+        下载一个文件到缓存 (已缓存则直接返回)
+        :return: 缓存中的 zip 路径，文件不存在 (404) 时返回 None
+        """
+        path = self.cache_dir / rel_path
+        if path.exists():
+            return path
+        missing = path.parent / (path.name + ".missing")
+        if missing.exists() and time.time() - missing.stat().st_mtime < self.missing_ttl:
+            return None
+
+        url = f"{self.base_url}/{rel_path}"
+        for attempt in range(self.max_retries + 1):
+            tmp = path.parent / f".{path.name}-{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                with self._session().get(url, stream=True, timeout=self.timeout) as r:
+                    if r.status_code == 404:
+                        missing.parent.mkdir(parents=True, exist_ok=True)
+                        missing.touch()
+                        return None
+                    r.raise_for_status()
+                    expected = self._expected_sha256(url)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    digest = hashlib.sha256()
+                    with open(tmp, "wb") as f:
+                        for chunk in r.iter_content(chunk_size=1 << 20):
+                            digest.update(chunk)
+                            f.write(chunk)
+                if expected is not None and digest.hexdigest() != expected:
+                    raise ValueError(f"checksum mismatch: {rel_path}")
+                os.replace(tmp, path)
+                if missing.exists():
+                    missing.unlink()
+                return path
+            except (requests.RequestException, ValueError):
+                if tmp.exists():
+                    tmp.unlink()
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(min(2 ** attempt, 30))
+
+    def _load(self, symbol: str, interval: str, kind: str, period: str):
+        """下载 (或读取缓存) 并解析一个文件，文件不存在时返回 None，出错时返回异常 (不中断其他文件)"""
+        try:
+            path = self.download(self.file_path(symbol, interval, kind, period))
+            return None if path is None else read_kline_zip(path)
+        except Exception as e:
+            return e
+
+    def _load_all(self, tasks: List[tuple]) -> List[Optional[pd.DataFrame]]:
+        if not tasks:
+            return []
+        return Parallel(n_jobs=self.workers, prefer="threads")(delayed(self._load)(*t) for t in tasks)
+
+    # ===== 读取 =====
+    def fetch_many(self, symbols: List[str], interval: str, start, end) -> List[pd.DataFrame]:
+        """
+        多个币种同一时间范围的K线，所有文件在同一个线程池中并行下载
+        :return: 与 symbols 对应的 DataFrame 列表 (只包含 [start, end] 内的K线)
+        """
+        tasks = [(s, interval) + f for s in symbols for f in plan_files(s, interval, start, end)]
+        frames = self._load_all(tasks)
+
+        # 月度包缺失 (如上架当月、刚结束的月份尚未发布)：改为下载该月的每日文件
+        retry = [(s, i) + f for s, i, kind, period in
+                 [t for t, df in zip(tasks, frames) if df is None and t[2] == "monthly"]
+                 for f in month_days(period, start, end)]
+        tasks += retry
+        frames += self._load_all(retry)
+
+        lo, hi = pd.Timestamp(start), pd.Timestamp(end)
+        out = []
+        for symbol in symbols:
+            parts = [df for t, df in zip(tasks, frames) if t[0] == symbol and df is not None]
+            # 有文件下载或校验失败的币种整体返回空表，不写入缺了一段的数据
+            failed = [(t, e) for t, e in zip(tasks, frames) if t[0] == symbol and isinstance(e, Exception)]
+            if failed:
+                self.errors[symbol] = f"{len(failed)} files failed, first: {failed[0][0][2:]} {failed[0][1]!r}"
+            if failed or not parts:
+                out.append(pd.DataFrame(columns=OUTPUT_COLUMNS))
+                continue
+            df = pd.concat(parts, ignore_index=True)
+            df = df[(df["candle_begin_time"] >= lo) & (df["candle_begin_time"] <= hi)]
+            out.append(df.drop_duplicates("candle_begin_time").sort_values("candle_begin_time")
+                       .reset_index(drop=True))
+        return out
+
+    def fetch(self, symbol: str, interval: str, start, end) -> pd.DataFrame:
+        return self.fetch_many([symbol], interval, start, end)[0]
+
+    # ===== 写入分区存储 =====
+    def ingest_many(self, symbols: List[str], interval: str, start, end, store: MarketStore) -> dict:
+        """
+        下载并按月份合并写入分区存储 (只重写涉及的月份)
+        :return: {symbol: 写入行数}
+        """
+        result = {}
+        # 每次处理 workers 个币种，线程池保持满载，同时只有这几个币种的数据在内存中
+        step = max(1, self.workers)
+        for i in range(0, len(symbols), step):
+            batch = symbols[i:i + step]
+            for symbol, df in zip(batch, self.fetch_many(batch, interval, start, end)):
+                s = symbol if "-" in symbol else symbol.replace("USDT", "-USDT")
+                if df.empty:
+                    result[s] = 0
+                    continue
+                result[s] = store.update(with_kline_pct(df, store, s, interval), s, interval)
+        return result
+
+
+def with_kline_pct(df: pd.DataFrame, store: MarketStore, symbol: str, rule_type: str) -> pd.DataFrame:
+    """
+    补充 offset / kline_pct 列 (与 0_1_数据转换 一致)，第一根K线的涨跌幅用存储中前一根K线的收盘价计算
+    """
+    df = df.copy()
+    df["offset"] = 0
+    close = pd.to_numeric(df["close"], errors="coerce")
+    pct = close.pct_change()
+    first = df["candle_begin_time"].iat[0]
+    if store.exists(symbol, rule_type):
+        prev = store.read(symbol, rule_type, start=first - pd.Timedelta(days=31),
+                          end=first - pd.Timedelta(1), columns=["close"], offset=0)
+        if not prev.empty:
+            pct.iat[0] = close.iat[0] / prev["close"].iat[-1] - 1
+    df["kline_pct"] = pct.fillna(0.0)
+    return df
@@ -0,0 +1,158 @@
+"""
+滚动优化 (walk-forward)
+按 per_eva (年 / 月 / 周) 把历史切成滚动的样本内 / 样本外区间：
+样本内遍历全部参数，按指标选出最优参数，用它回测紧随其后的样本外区间，最后把各段样本外资金曲线首尾相接
+信号和持仓只在整段历史上计算一次，各区间直接截取持仓矩阵 (与 run_backtest_batch 按时间截取的口径一致)
+各区间互不依赖，用 joblib 并行
+"""
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from cta_api.engine import BacktestEngine
+from cta_api.statistics import transfer_equity_curve_to_trade, strategy_evaluate_numeric
+
+# per_eva 对应的区间划分频率 (区间起点为自然年 / 自然月 / 周一)
+PERIOD_FREQ = {'y': 'YS', 'm': 'MS', 'w': 'W-MON'}
+
+
+@dataclass(frozen=True)
+class Fold:
+    """一个滚动区间，时间均为左闭右开"""
+    index: int
+    train_start: pd.Timestamp
+    train_end: pd.Timestamp
+    test_start: pd.Timestamp
+    test_end: pd.Timestamp
+
+
+@dataclass
+class WalkForwardResult:
+    """
+    folds: 每个区间一行，包含区间时间、选中的参数、样本内指标和样本外指标
+    equity: 拼接后的样本外资金曲线 (含 fold / para 列)
+    metrics: 拼接后资金曲线的整体评价指标 (strategy_evaluate_numeric)
+    """
+    folds: pd.DataFrame
+    equity: pd.DataFrame
+    metrics: dict
+
+
+def make_folds(start, end, per_eva: str, train_periods: int = 3, test_periods: int = 1) -> List[Fold]:
+    """
+    生成滚动区间：样本内 train_periods 个周期，样本外紧随其后的 test_periods 个周期，每次向后滚动 test_periods 个周期
+    :param per_eva: 'y' / 'm' / 'w'，即按年 / 月 / 周划分
+    :return: Fold 列表，最后一个样本外区间截止到 end
+    """
+    if per_eva not in PERIOD_FREQ:
+        raise ValueError(f"walk-forward requires per_eva in {list(PERIOD_FREQ)}, got {per_eva!r}")
+    if train_periods < 1 or test_periods < 1:
+        raise ValueError("train_periods and test_periods must be >= 1")
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    bounds = [start] + [t for t in pd.date_range(start, end, freq=PERIOD_FREQ[per_eva]) if start < t < end] + [end]
+
+    folds = []
+    i = train_periods
+    while i < len(bounds) - 1:
+        j = min(i + test_periods, len(bounds) - 1)
+        folds.append(Fold(len(folds), bounds[i - train_periods], bounds[i], bounds[i], bounds[j]))
+        i += test_periods
+    return folds
+
+
+def _score(metrics: dict, metric: str) -> float:
+    value = metrics.get(metric)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return value if np.isfinite(value) else np.nan
+
+
+def _run_fold(engine: BacktestEngine, fold: Fold, para_list: List[list],
+              train: tuple, test: tuple, symbol: str, rule_type: str, metric: str) -> Optional[tuple]:
+    """
+    单个区间：样本内全部参数选优，再回测样本外
+    :param train: 样本内的 (行情, signal矩阵, pos矩阵)
+    :param test: 样本外的 (行情, signal矩阵, pos矩阵)
+    :return: (fold, 最优参数, 样本内指标, 样本外指标, 样本外资金曲线 df)
+    """
+    base, signal, pos = train
+    in_sample = engine.evaluate_positions(base, para_list, signal, pos, symbol, rule_type)
+    scores = np.array([_score(m, metric) for _, _, m in in_sample])
+    if np.isnan(scores).all():
+        return None
+    best = int(np.nanargmax(scores))
+
+    base, signal, pos = test
+    _, df, oos_metrics = engine.evaluate_positions(base, [para_list[best]], signal[:, [best]], pos[:, [best]],
+                                                   symbol, rule_type)[0]
+    return fold, para_list[best], in_sample[best][2], oos_metrics, df
+
+
+def stitch_equity(segments: List[pd.DataFrame]) -> pd.DataFrame:
+    """各段样本外资金曲线都从1开始，按上一段的期末净值首尾相接"""
+    out, scale = [], 1.0
+    for seg in segments:
+        seg = seg.copy()
+        seg['equity_curve'] = seg['equity_curve'] * scale
+        scale = seg['equity_curve'].iloc[-1]
+        out.append(seg)
+    return pd.concat(out, ignore_index=True)
+
+
+def run_walk_forward(engine: BacktestEngine,
+                     symbol: str,
+                     factor_name: str,
+                     para_list: List[list],
+                     rule_type: str,
+                     folds: List[Fold],
+                     metric: str = '年化收益/回撤比',
+                     n_jobs: int = 1,
+                     offset: int = 0) -> Optional[WalkForwardResult]:
+    """
+    滚动优化回测
+    :param folds: make_folds 生成的区间
+    :param metric: 样本内选优的指标 (strategy_evaluate_numeric 的键，越大越好)
+    :param n_jobs: 并行的区间数
+    :return: WalkForwardResult，没有可用区间时返回 None
+    """
+    base = engine.load_data(symbol, rule_type, offset)
+    ok_para, signal, pos = engine.signal_and_pos_matrix(base, factor_name, para_list)
+    if not ok_para:
+        return None
+
+    times = base['candle_begin_time']
+    jobs = []
+    for fold in folds:
+        train = ((times >= fold.train_start) & (times < fold.train_end)).to_numpy()
+        test = ((times >= fold.test_start) & (times < fold.test_end)).to_numpy()
+        if not train.any() or not test.any():
+            continue
+        jobs.append(delayed(_run_fold)(engine, fold, ok_para,
+                                       (base[train], signal[train], pos[train]),
+                                       (base[test], signal[test], pos[test]),
+                                       symbol, rule_type, metric))
+    results = [r for r in Parallel(n_jobs=n_jobs)(jobs) if r is not None]
+    if not results:
+        return None
+    results.sort(key=lambda r: r[0].index)
+
+    rows, segments = [], []
+    for fold, para, in_metrics, oos_metrics, df in results:
+        row = {'fold': fold.index, 'train_start': fold.train_start, 'train_end': fold.train_end,
+               'test_start': fold.test_start, 'test_end': fold.test_end, 'para': str(para),
+               f'样本内{metric}': in_metrics.get(metric)}
+        row.update(oos_metrics)
+        rows.append(row)
+        df['fold'] = fold.index
+        df['para'] = str(para)
+        segments.append(df)
+
+    equity = stitch_equity(segments)
+    trade = transfer_equity_curve_to_trade(equity)
+    metrics, _ = strategy_evaluate_numeric(equity, trade, rule_type)
+    return WalkForwardResult(folds=pd.DataFrame(rows), equity=equity, metrics=metrics)
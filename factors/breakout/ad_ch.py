@@ -16,6 +16,7 @@ A/D线突破均线时产生信号。
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[20], proportion=1, leverage_rate=1):
     """
@@ -41,8 +42,7 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     df['ad_ma'] = df['ad'].rolling(window=period, min_periods=1).mean()
 
     # 计算价格突破
-    df['price_high'] = df['high'].rolling(window=period, min_periods=1).max()
-    df['price_low'] = df['low'].rolling(window=period, min_periods=1).min()
+    df['price_high'], df['price_low'] = rolling_max_min(df['high'], df['low'], period, min_periods=1)
 
     # 做多信号: A/D上穿均线且价格突破新高
     condition1 = df['ad'] > df['ad_ma']
@@ -66,16 +66,8 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     condition2 = df['ad'].shift(1) <= df['ad_ma'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    if df['signal'].notnull().any():
-        temp = df[df['signal'].notnull()][['signal']]
-        temp = temp[temp['signal'] != temp['signal'].shift(1)]
-        # 只更新有信号的部分
-        signal_idx = temp.index
-        df.loc[signal_idx, 'signal'] = temp['signal']
+    # 合并多空信号 (原逻辑只把去重结果写回有信号的位置，重复信号并未删除，这里保持一致)
+    df['signal'] = merge_signal(df, drop_duplicates=False)
 
     # 删除中间变量
     cols_to_drop = ['clv', 'ad', 'ad_ma', 'price_high', 'price_low', 'signal_long', 'signal_short']
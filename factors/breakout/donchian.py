@@ -16,12 +16,12 @@ Donchian通道突破策略
 """
 
 from cta_api.function import *
+from cta_api.indicators import donchian
 
 def signal(df, para=[20, 1.0], proportion=1, leverage_rate=1):
     period = para[0]
 
-    df['highest_high'] = df['high'].rolling(window=period, min_periods=1).max()
-    df['lowest_low'] = df['low'].rolling(window=period, min_periods=1).min()
+    df['highest_high'], df['lowest_low'] = donchian(df, period)
 
     buy_signal = (df['close'] > df['highest_high'].shift(1))
     df.loc[buy_signal, 'signal_long'] = 1
@@ -31,10 +31,7 @@ def signal(df, para=[20, 1.0], proportion=1, leverage_rate=1):
     df.loc[sell_signal, 'signal_short'] = -1
     df.loc[df['close'] > df['lowest_low'].shift(2), 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['highest_high', 'lowest_low', 'signal_long', 'signal_short'], axis=1, inplace=True)
     df = process_stop_loss_close(df, proportion, leverage_rate=leverage_rate)
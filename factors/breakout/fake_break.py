@@ -16,6 +16,7 @@
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[5], proportion=1, leverage_rate=1):
     """
@@ -29,8 +30,7 @@ def signal(df, para=[5], proportion=1, leverage_rate=1):
     confirm_period = para[0]
 
     # 计算价格突破
-    df['high_breakout'] = df['high'].rolling(window=confirm_period, min_periods=1).max()
-    df['low_breakout'] = df['low'].rolling(window=confirm_period, min_periods=1).min()
+    df['high_breakout'], df['low_breakout'] = rolling_max_min(df['high'], df['low'], confirm_period, min_periods=1)
 
     # 计算突破方向
     df['upward_breakout'] = df['close'] > df['high_breakout'].shift(1)
@@ -56,13 +56,8 @@ def signal(df, para=[5], proportion=1, leverage_rate=1):
     condition2 = df['close'] > df['low_breakout'].shift(1)
     df.loc[(condition1 | condition2) & df['signal_short'].shift(1).notnull(), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['high_breakout', 'low_breakout', 'upward_breakout', 'downward_breakout', 'signal_long', 'signal_short'], axis=1, inplace=True)
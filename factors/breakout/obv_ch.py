@@ -16,6 +16,8 @@ OBV用于识别资金流向。
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
+from cta_api.recursion import obv
 
 def signal(df, para=[20], proportion=1, leverage_rate=1):
     """
@@ -29,21 +31,13 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     period = para[0]
 
     # 计算OBV
-    df['obv'] = 0
-    for i in range(1, len(df)):
-        if df.iloc[i]['close'] > df.iloc[i-1]['close']:
-            df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv'] + df.iloc[i]['volume']
-        elif df.iloc[i]['close'] < df.iloc[i-1]['close']:
-            df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv'] - df.iloc[i]['volume']
-        else:
-            df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv']
+    df['obv'] = obv(df['close'], df['volume'], hold_on_flat=True)
 
     # 计算OBV均线
     df['obv_ma'] = df['obv'].rolling(window=period, min_periods=1).mean()
 
     # 计算价格突破
-    df['price_high'] = df['high'].rolling(window=period, min_periods=1).max()
-    df['price_low'] = df['low'].rolling(window=period, min_periods=1).min()
+    df['price_high'], df['price_low'] = rolling_max_min(df['high'], df['low'], period, min_periods=1)
 
     # 做多信号: OBV上穿均线且价格突破新高
     condition1 = df['obv'] > df['obv_ma']
@@ -67,13 +61,8 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     condition2 = df['obv'].shift(1) <= df['obv_ma'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['obv', 'obv_ma', 'price_high', 'price_low', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -16,6 +16,7 @@
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[20], proportion=1, leverage_rate=1):
     """
@@ -29,8 +30,7 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     period = para[0]
 
     # 计算突破高低点
-    df['turtle_high'] = df['high'].rolling(window=period, min_periods=1).max()
-    df['turtle_low'] = df['low'].rolling(window=period, min_periods=1).min()
+    df['turtle_high'], df['turtle_low'] = rolling_max_min(df['high'], df['low'], period, min_periods=1)
 
     # 计算ATR
     df['tr'] = df['high'] - df['low']
@@ -54,13 +54,8 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     condition2 = df['close'] > df['turtle_low'].shift(1) + 2 * df['atr'].shift(1)
     df.loc[(condition1 | condition2) & df['signal_short'].shift(1).notnull(), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['turtle_high', 'turtle_low', 'tr', 'atr', 'signal_long', 'signal_short'], axis=1, inplace=True)
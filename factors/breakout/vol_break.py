@@ -17,6 +17,7 @@
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[20, 2], proportion=1, leverage_rate=1):
     """
@@ -34,8 +35,7 @@ def signal(df, para=[20, 2], proportion=1, leverage_rate=1):
     df['vol_ma'] = df['volume'].rolling(window=period, min_periods=1).mean()
 
     # 计算价格高低点
-    df['price_high'] = df['high'].rolling(window=period, min_periods=1).max()
-    df['price_low'] = df['low'].rolling(window=period, min_periods=1).min()
+    df['price_high'], df['price_low'] = rolling_max_min(df['high'], df['low'], period, min_periods=1)
 
     # 计算成交量放大
     df['vol_surge'] = df['volume'] > df['vol_ma'] * multiplier
@@ -60,13 +60,8 @@ def signal(df, para=[20, 2], proportion=1, leverage_rate=1):
     condition2 = df['vol_surge'].shift(1) & ~df['vol_surge']
     df.loc[(condition1 | condition2) & df['signal_short'].shift(1).notnull(), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['vol_ma', 'price_high', 'price_low', 'vol_surge', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -16,6 +16,7 @@ CMA = 成交量的移动平均。
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[20], proportion=1, leverage_rate=1):
     """
@@ -32,8 +33,7 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     df['vol_ma'] = df['volume'].rolling(window=period, min_periods=1).mean()
 
     # 计算价格突破
-    df['price_high'] = df['high'].rolling(window=period, min_periods=1).max()
-    df['price_low'] = df['low'].rolling(window=period, min_periods=1).min()
+    df['price_high'], df['price_low'] = rolling_max_min(df['high'], df['low'], period, min_periods=1)
 
     # 计算成交量突破方向
     df['vol_up'] = df['volume'] > df['vol_ma']
@@ -61,13 +61,8 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     condition2 = df['vol_down'].shift(1) == True
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['vol_ma', 'price_high', 'price_low', 'vol_up', 'vol_down', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -16,6 +16,7 @@ VWAP突破可以识别价格偏离合理区间的机会。
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[30], proportion=1, leverage_rate=1):
     """
@@ -32,8 +33,7 @@ def signal(df, para=[30], proportion=1, leverage_rate=1):
     df['vwap'] = (df['close'] * df['volume']).rolling(window=period, min_periods=1).sum() / df['volume'].rolling(window=period, min_periods=1).sum()
 
     # 计算价格突破
-    df['price_high'] = df['high'].rolling(window=period, min_periods=1).max()
-    df['price_low'] = df['low'].rolling(window=period, min_periods=1).min()
+    df['price_high'], df['price_low'] = rolling_max_min(df['high'], df['low'], period, min_periods=1)
 
     # 计算成交量均线
     df['vol_ma'] = df['volume'].rolling(window=period, min_periods=1).mean()
@@ -61,13 +61,8 @@ def signal(df, para=[30], proportion=1, leverage_rate=1):
     condition2 = df['vol_surge'].shift(1) & ~df['vol_surge']
     df.loc[(condition1 | condition2) & df['signal_short'].shift(1).notnull(), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['vwap', 'price_high', 'price_low', 'vol_ma', 'vol_surge', 'signal_long', 'signal_short'], axis=1, inplace=True)
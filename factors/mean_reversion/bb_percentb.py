@@ -16,6 +16,7 @@
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_mean_std
 
 def signal(df, para=[20, 2], proportion=1, leverage_rate=1):
     """
@@ -30,8 +31,7 @@ def signal(df, para=[20, 2], proportion=1, leverage_rate=1):
     std_dev = para[1]
 
     # 计算布林带
-    df['bb_middle'] = df['close'].rolling(window=period, min_periods=1).mean()
-    df['bb_std'] = df['close'].rolling(window=period, min_periods=1).std()
+    df['bb_middle'], df['bb_std'] = rolling_mean_std(df['close'], period, min_periods=1)
     df['bb_upper'] = df['bb_middle'] + std_dev * df['bb_std']
     df['bb_lower'] = df['bb_middle'] - std_dev * df['bb_std']
 
@@ -67,13 +67,8 @@ def signal(df, para=[20, 2], proportion=1, leverage_rate=1):
     condition3 = df['close'].shift(1) <= df['bb_middle'].shift(1)
     df.loc[(condition1 | condition2 | condition3) & df['signal_short'].shift(1).notnull(), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['bb_middle', 'bb_std', 'bb_upper', 'bb_lower', 'bb_pctb', 'trend',
@@ -35,7 +35,7 @@ def signal(df, para=[10, 3.0], proportion=1, leverage_rate=1):
     df.loc[sell_signal, 'signal_short'] = -1
     df.loc[df['bias_signal'] != 1, 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
+    df['signal'] = merge_signal(df, drop_duplicates=False)
 
     df['signal'] = df['signal'].replace(0, np.nan)
 
@@ -16,8 +16,12 @@
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_mean_std
 import numpy as np
 
+# 因子用到的行情列，批量回测只读取这些列
+columns = ['close']
+
 def signal(df, para=[20, 2.0], proportion=1, leverage_rate=1):
     """
     :param df: 原始数据 (OHLCV)
@@ -30,11 +34,8 @@ def signal(df, para=[20, 2.0], proportion=1, leverage_rate=1):
     period = para[0]
     std_dev = para[1]
 
-    # 计算中轨
-    df['middle_band'] = df['close'].rolling(window=period, min_periods=1).mean()
-
-    # 计算标准差
-    df['std_dev'] = df['close'].rolling(window=period, min_periods=1).std()
+    # 计算中轨和标准差
+    df['middle_band'], df['std_dev'] = rolling_mean_std(df['close'], period, min_periods=1)
 
     # 计算上下轨
     df['upper_band'] = df['middle_band'] + std_dev * df['std_dev']
@@ -67,13 +68,8 @@ def signal(df, para=[20, 2.0], proportion=1, leverage_rate=1):
     # 做空平仓: 回到中轨或触及下轨
     df.loc[back_to_middle, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['middle_band', 'std_dev', 'upper_band', 'lower_band', 'signal_long', 'signal_short'], axis=1, inplace=True)
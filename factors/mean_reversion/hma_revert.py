@@ -17,6 +17,7 @@ HMA是一种快速响应的均线，能减少滞后。
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_mean_std
 import numpy as np
 
 def signal(df, para=[10, 1.0], proportion=1, leverage_rate=1):
@@ -37,8 +38,9 @@ def signal(df, para=[10, 1.0], proportion=1, leverage_rate=1):
     df['hma'] = wma_half.shift(1)
 
     # 计算HMA带
-    df['hma_upper'] = df['hma'] + std_multiplier * df['close'].rolling(window=hma_period, min_periods=1).std()
-    df['hma_lower'] = df['hma'] - std_multiplier * df['close'].rolling(window=hma_period, min_periods=1).std()
+    hma_std = rolling_mean_std(df['close'], hma_period, min_periods=1)[1]
+    df['hma_upper'] = df['hma'] + std_multiplier * hma_std
+    df['hma_lower'] = df['hma'] - std_multiplier * hma_std
 
     # 做多信号: 价格下穿HMA下轨(超卖反弹)
     condition1 = df['close'] < df['hma_lower']
@@ -60,13 +62,8 @@ def signal(df, para=[10, 1.0], proportion=1, leverage_rate=1):
     condition2 = df['close'].shift(1) > df['hma']
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['hma', 'hma_upper', 'hma_lower', 'signal_long', 'signal_short'], axis=1, inplace=True)
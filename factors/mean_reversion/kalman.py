@@ -17,7 +17,7 @@ Kalman滤波是一种贝叶斯滤波方法，能够实时估计价格的真实
 """
 
 from cta_api.function import *
-import numpy as np
+from cta_api.recursion import kalman_filter
 import pandas as pd
 
 def signal(df, para=[20, 0.1], proportion=1, leverage_rate=1):
@@ -37,46 +37,10 @@ def signal(df, para=[20, 0.1], proportion=1, leverage_rate=1):
     observation_noise = process_noise * (1 - delta)
     observation_cov = process_noise ** 2
 
-    # 初始化数组以加速计算
-    close_arr = df['close'].values
-    n = len(df)
-    
-    kalman_estimate = np.zeros(n)
-    kalman_error = np.zeros(n)
-    kalman_gain = np.zeros(n)
-    
-    # 初始值
-    kalman_estimate[0] = close_arr[0]
-    kalman_error[0] = 1.0
-    kalman_gain[0] = 0.0
-    
-    # 迭代计算Kalman估计 (Scalar loop)
-    for i in range(1, n):
-        # 预测
-        # x_pred = x_prev
-        # P_pred = P_prev + Q
-        # 这里简化为：estimate_pred = estimate_prev (假设均值不变模型)
-        # error_pred = error_prev + process_noise
-        
-        # 使用代码中的逻辑 (看起来像EMA变体?)
-        # df.loc[df.index[i], 'kalman_estimate'] = df.loc[df.index[i], 'kalman_estimate'] + \
-        #     df.loc[df.index[i], 'kalman_estimate'] - df['kalman_estimate'].shift(1) * delta
-        # 这逻辑有点奇怪，重写为标准Kalman或保持意图但修复语法
-        
-        # 假设意图是标准一维Kalman Filter for constant position model
-        prediction = kalman_estimate[i-1]
-        prediction_error = kalman_error[i-1] + delta
-        
-        # 更新
-        # K = P_pred / (P_pred + R)
-        k = prediction_error / (prediction_error + observation_noise)
-        kalman_gain[i] = k
-        
-        # x = x_pred + K * (z - x_pred)
-        kalman_estimate[i] = prediction + k * (close_arr[i] - prediction)
-        
-        # P = (1 - K) * P_pred
-        kalman_error[i] = (1 - k) * prediction_error
+    # 一维常值模型 Kalman 滤波 (编译执行)：
+    # 预测 estimate_pred = estimate_prev, error_pred = error_prev + delta
+    # 更新 K = error_pred / (error_pred + observation_noise), estimate = estimate_pred + K * (close - estimate_pred)
+    kalman_estimate, kalman_error = kalman_filter(df['close'], delta, observation_noise)
 
     df['kalman_estimate'] = kalman_estimate
     df['kalman_error'] = kalman_error
@@ -103,13 +67,8 @@ def signal(df, para=[20, 0.1], proportion=1, leverage_rate=1):
     condition2 = df['deviation'].shift(1).abs() >= 1.0
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['kalman_estimate', 'kalman_error', 'deviation', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -17,6 +17,7 @@ KDJ是改进版的随机指标，包含%K、%D、%J三条线。
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[9, 3, 3], proportion=1, leverage_rate=1):
     """
@@ -32,8 +33,7 @@ def signal(df, para=[9, 3, 3], proportion=1, leverage_rate=1):
     j_factor = para[2]
 
     # 计算最高最低价
-    high_n = df['high'].rolling(window=period, min_periods=1).max()
-    low_n = df['low'].rolling(window=period, min_periods=1).min()
+    high_n, low_n = rolling_max_min(df['high'], df['low'], period, min_periods=1)
 
     # 计算%K (未成熟随机值)
     df['k_raw'] = (df['close'] - low_n) / (high_n - low_n) * 100
@@ -66,13 +66,8 @@ def signal(df, para=[9, 3, 3], proportion=1, leverage_rate=1):
     condition3 = df['k'] < 20  # 超卖区域平仓
     df.loc[(condition1 | condition2 | condition3) & df['signal_short'].shift(1).notnull(), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['k_raw', 'k', 'j', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -16,14 +16,14 @@
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_mean_std
 import numpy as np
 
 def signal(df, para=[20, 2.0], proportion=1, leverage_rate=1):
     period = para[0]
     std_multiplier = para[1]
 
-    df['mean'] = df['close'].rolling(window=period, min_periods=1).mean()
-    df['std'] = df['close'].rolling(window=period, min_periods=1).std()
+    df['mean'], df['std'] = rolling_mean_std(df['close'], period, min_periods=1)
 
     df['upper'] = df['mean'] + std_multiplier * df['std']
     df['lower'] = df['mean'] - std_multiplier * df['std']
@@ -36,10 +36,7 @@ def signal(df, para=[20, 2.0], proportion=1, leverage_rate=1):
     df.loc[touch_upper, 'signal_short'] = -1
     df.loc[df['close'] <= df['mean'], 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['mean', 'std', 'upper', 'lower', 'signal_long', 'signal_short'], axis=1, inplace=True)
     df = process_stop_loss_close(df, proportion, leverage_rate=leverage_rate)
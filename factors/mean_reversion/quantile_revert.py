@@ -17,6 +17,7 @@
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_quantile
 import numpy as np
 
 def signal(df, para=[50, 0.25], proportion=1, leverage_rate=1):
@@ -32,7 +33,7 @@ def signal(df, para=[50, 0.25], proportion=1, leverage_rate=1):
     quantile = para[1]
 
     # 计算分位数
-    df['quantile'] = df['close'].rolling(window=period, min_periods=1).quantile(quantile)
+    df['quantile'] = rolling_quantile(df['close'], period, quantile, min_periods=1)
 
     # 做多信号: 价格低于下分位数(超卖)
     condition1 = df['close'] < df['quantile'].shift(1)
@@ -54,13 +55,8 @@ def signal(df, para=[50, 0.25], proportion=1, leverage_rate=1):
     condition2 = df['close'].shift(1) > 0.5
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['quantile', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -17,6 +17,7 @@ RSI背离策略 (RSI Divergence)
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[14, 10], proportion=1, leverage_rate=1):
     """
@@ -39,9 +40,9 @@ def signal(df, para=[14, 10], proportion=1, leverage_rate=1):
     rs = avg_gain / avg_loss
     df['rsi'] = 100 - (100 / (1 + rs))
 
-    # 计算价格高点
-    df['price_high'] = df['high'].rolling(window=divergence_period, min_periods=1).max()
-    df['rsi_high'] = df['rsi'].rolling(window=divergence_period, min_periods=1).max()
+    # 计算价格、RSI 的区间高低点
+    df['price_high'], df['price_low'] = rolling_max_min(df['high'], df['low'], divergence_period, min_periods=1)
+    df['rsi_high'], df['rsi_low'] = rolling_max_min(df['rsi'], window=divergence_period, min_periods=1)
 
     # 计算RSI顶背离: 价格创新高，RSI未创新高
     condition1 = df['close'] == df['price_high']
@@ -52,9 +53,6 @@ def signal(df, para=[14, 10], proportion=1, leverage_rate=1):
     df.loc[condition1 & condition2 & condition3 & condition4 & condition5, 'signal_long'] = 0  # 顶背离平多仓
 
     # 计算RSI底背离: 价格创新低，RSI未创新低
-    df['price_low'] = df['low'].rolling(window=divergence_period, min_periods=1).min()
-    df['rsi_low'] = df['rsi'].rolling(window=divergence_period, min_periods=1).min()
-
     condition1 = df['close'] == df['price_low']
     condition2 = df['rsi'] > df['rsi_low']
     condition3 = df['rsi'] < 50  # RSI在低位区域
@@ -70,9 +68,7 @@ def signal(df, para=[14, 10], proportion=1, leverage_rate=1):
     df['signal'] = df['signal_long'].replace(0, -1)
 
     # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = drop_duplicate_signal(df['signal'])
 
     # 删除中间变量
     df.drop(['rsi_high', 'rsi_low', 'price_high', 'price_low'], axis=1, inplace=True)
@@ -16,6 +16,7 @@ UO上穿50时做多，下穿50时做空。
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[7, 14, 28], proportion=1, leverage_rate=1):
     """
@@ -34,18 +35,15 @@ def signal(df, para=[7, 14, 28], proportion=1, leverage_rate=1):
     df['tp'] = (df['high'] + df['low'] + df['close']) / 3
 
     # 计算短期振荡
-    df['bp_short'] = df['close'].rolling(window=short_period, min_periods=1).min()
-    df['sp_short'] = df['close'].rolling(window=short_period, min_periods=1).max()
+    df['sp_short'], df['bp_short'] = rolling_max_min(df['close'], window=short_period, min_periods=1)
     df['uo_short'] = 100 * (df['tp'] - df['bp_short']) / (df['sp_short'] - df['bp_short'])
 
     # 计算中期振荡
-    df['bp_mid'] = df['close'].rolling(window=mid_period, min_periods=1).min()
-    df['sp_mid'] = df['close'].rolling(window=mid_period, min_periods=1).max()
+    df['sp_mid'], df['bp_mid'] = rolling_max_min(df['close'], window=mid_period, min_periods=1)
     df['uo_mid'] = 100 * (df['tp'] - df['bp_mid']) / (df['sp_mid'] - df['bp_mid'])
 
     # 计算长期振荡
-    df['bp_long'] = df['close'].rolling(window=long_period, min_periods=1).min()
-    df['sp_long'] = df['close'].rolling(window=long_period, min_periods=1).max()
+    df['sp_long'], df['bp_long'] = rolling_max_min(df['close'], window=long_period, min_periods=1)
     df['uo_long'] = 100 * (df['tp'] - df['bp_long']) / (df['sp_long'] - df['bp_long'])
 
     # 计算加权平均UO
@@ -71,13 +69,8 @@ def signal(df, para=[7, 14, 28], proportion=1, leverage_rate=1):
     condition2 = df['uo'].shift(1) <= 50
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['tp', 'bp_short', 'sp_short', 'uo_short', 'bp_mid', 'sp_mid', 'uo_mid',
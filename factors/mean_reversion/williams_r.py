@@ -18,6 +18,7 @@
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[14, -20, -80], proportion=1, leverage_rate=1):
     """
@@ -33,8 +34,7 @@ def signal(df, para=[14, -20, -80], proportion=1, leverage_rate=1):
     oversold = para[2]
 
     # 计算威廉指标%R
-    high_n = df['high'].rolling(window=period, min_periods=1).max()
-    low_n = df['low'].rolling(window=period, min_periods=1).min()
+    high_n, low_n = rolling_max_min(df['high'], df['low'], period, min_periods=1)
     df['williams_r'] = (high_n - df['close']) / (high_n - low_n) * -100
 
     # 做多信号: %R上穿超买线(超卖转超买)
@@ -57,13 +57,8 @@ def signal(df, para=[14, -20, -80], proportion=1, leverage_rate=1):
     condition2 = df['williams_r'].shift(1) >= overbought
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['williams_r', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -16,6 +16,7 @@ Z < -2为超卖(买入)，Z > 2为超买(卖出)。
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_mean_std
 import numpy as np
 
 def signal(df, para=[20, 2.0, -2.0], proportion=1, leverage_rate=1):
@@ -23,8 +24,7 @@ def signal(df, para=[20, 2.0, -2.0], proportion=1, leverage_rate=1):
     threshold = para[1]
     oversold = -threshold
 
-    df['mean'] = df['close'].rolling(window=period, min_periods=1).mean()
-    df['std'] = df['close'].rolling(window=period, min_periods=1).std()
+    df['mean'], df['std'] = rolling_mean_std(df['close'], period, min_periods=1)
 
     df['z_score'] = (df['close'] - df['mean']) / df['std']
 
@@ -36,15 +36,41 @@ def signal(df, para=[20, 2.0, -2.0], proportion=1, leverage_rate=1):
     df.loc[sell_signal, 'signal_short'] = -1
     df.loc[df['z_score'] <= 2, 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['mean', 'std', 'z_score', 'signal_long', 'signal_short'], axis=1, inplace=True)
     df = process_stop_loss_close(df, proportion, leverage_rate=leverage_rate)
     return df
 
+def signal_batch(arrays, para_list):
+    """
+    一次计算多组参数的信号
+    :return: (K线数 × 参数组数) 的 signal 矩阵，每列与 signal() 止盈止损前的 signal 一致
+    """
+    close = arrays['close']
+    periods = [para[0] for para in para_list]
+    threshold = np.array([para[1] for para in para_list], dtype=np.float64)
+    oversold = -threshold
+
+    # 相同周期的均值、标准差只计算一次
+    stats = {period: rolling_mean_std(close, period, min_periods=1) for period in set(periods)}
+    mean = np.column_stack([stats[period][0] for period in periods])
+    std = np.column_stack([stats[period][1] for period in periods])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_score = (close[:, None] - mean) / std
+    z_score_pre = shift_array(z_score)
+
+    signal_long = np.full_like(z_score, np.nan)
+    signal_long[(z_score < oversold) & (z_score_pre >= oversold)] = 1
+    signal_long[z_score >= -threshold] = 0
+
+    signal_short = np.full_like(z_score, np.nan)
+    signal_short[(z_score > threshold) & (z_score_pre <= threshold)] = -1
+    signal_short[z_score <= 2] = 0
+
+    return merge_signal_matrix(signal_long, signal_short)
+
 def para_list():
     periods = [20, 30, 40, 50, 80]
     thresholds = [2.0, 2.5, 3.0]
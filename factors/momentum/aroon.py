@@ -61,13 +61,8 @@ def signal(df, para=[25], proportion=1, leverage_rate=1):
     condition2 = df['aroon_osc'].shift(1) <= df['aroon_down'].shift(1)
     df.loc[(condition1 | condition2) & df['signal_short'].shift(1).notnull(), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['aroon_up', 'aroon_down', 'aroon_osc', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -55,10 +55,7 @@ def signal(df, para=[14], proportion=1, leverage_rate=1):
     condition2 = df['coppock'].shift(1) <= 0
     df.loc[condition1 & condition2, 'signal_short'] = 0
     
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['coppock', 'signal_long', 'signal_short'], axis=1, inplace=True)
     
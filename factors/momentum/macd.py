@@ -60,13 +60,8 @@ def signal(df, para=[12, 26, 9], proportion=1, leverage_rate=1):
     # 做空平仓: DIF上穿DEA 或 DIF > 0
     df.loc[(df['dif'] > df['dea']) | (df['dif'] > 0), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['ema_fast', 'ema_slow', 'dif', 'dea', 'macd_hist', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -16,6 +16,7 @@ NVI上穿均线时做多，下穿时做空。
 """
 
 from cta_api.function import *
+from cta_api.recursion import accumulate_where
 
 def signal(df, para=[100], proportion=1, leverage_rate=1):
     """
@@ -34,12 +35,7 @@ def signal(df, para=[100], proportion=1, leverage_rate=1):
     # 计算NVI
     df['volume_change'] = df['volume'].pct_change()
     df['nvi'] = df['volume'].shift(1) * 0 + df['volume']
-
-    for i in range(1, len(df)):
-        if df.iloc[i]['price_change'] < 0:
-            df.iloc[i, df.columns.get_loc('nvi')] = df.iloc[i-1]['nvi'] + df.iloc[i]['volume_change']
-        else:
-            df.iloc[i, df.columns.get_loc('nvi')] = df.iloc[i-1]['nvi']
+    df['nvi'] = accumulate_where(df['nvi'], df['volume_change'], df['price_change'] < 0)
 
     # 计算NVI均线
     df['nvi_ma'] = df['nvi'].rolling(window=period, min_periods=1).mean()
@@ -64,13 +60,8 @@ def signal(df, para=[100], proportion=1, leverage_rate=1):
     condition2 = df['nvi'].shift(1) <= df['nvi_ma'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['price_change', 'volume_change', 'nvi', 'nvi_ma', 'signal_long', 'signal_short'], axis=1, inplace=True)
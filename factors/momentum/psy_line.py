@@ -44,10 +44,7 @@ def signal(df, para=[12], proportion=1, leverage_rate=1):
     c_cross_up = (df['psy'] > 50) & (df['psy'].shift(1) <= 50)
     df.loc[c_cross_up, 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['psy', 'signal_long', 'signal_short'], axis=1, inplace=True)
     
@@ -16,6 +16,7 @@ PVI上穿均线时做多，下穿时做空。
 """
 
 from cta_api.function import *
+from cta_api.recursion import accumulate_where
 
 def signal(df, para=[100], proportion=1, leverage_rate=1):
     """
@@ -34,12 +35,7 @@ def signal(df, para=[100], proportion=1, leverage_rate=1):
     # 计算PVI
     df['volume_change'] = df['volume'].pct_change()
     df['pvi'] = df['volume'].shift(1) * 0 + df['volume']
-
-    for i in range(1, len(df)):
-        if df.iloc[i]['price_change'] > 0:
-            df.iloc[i, df.columns.get_loc('pvi')] = df.iloc[i-1]['pvi'] + df.iloc[i]['volume_change']
-        else:
-            df.iloc[i, df.columns.get_loc('pvi')] = df.iloc[i-1]['pvi']
+    df['pvi'] = accumulate_where(df['pvi'], df['volume_change'], df['price_change'] > 0)
 
     # 计算PVI均线
     df['pvi_ma'] = df['pvi'].rolling(window=period, min_periods=1).mean()
@@ -64,13 +60,8 @@ def signal(df, para=[100], proportion=1, leverage_rate=1):
     condition2 = df['pvi'].shift(1) <= df['pvi_ma'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['price_change', 'volume_change', 'pvi', 'pvi_ma', 'signal_long', 'signal_short'], axis=1, inplace=True)
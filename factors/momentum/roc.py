@@ -51,13 +51,8 @@ def signal(df, para=[12], proportion=1, leverage_rate=1):
     condition2 = df['roc'].shift(1) <= 0
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['roc', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -68,6 +63,33 @@ def signal(df, para=[12], proportion=1, leverage_rate=1):
     return df
 
 
+def signal_batch(arrays, para_list):
+    """
+    一次计算多组参数的信号
+    :return: (K线数 × 参数组数) 的 signal 矩阵，每列与 signal() 止盈止损前的 signal 一致
+    """
+    close = arrays['close']
+
+    # 计算ROC (每列对应一个周期)
+    close_pre = np.column_stack([shift_array(close, para[0]) for para in para_list])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roc = (close[:, None] - close_pre) / close_pre * 100
+    roc_pre = shift_array(roc)
+
+    # 做多 / 做多平仓信号
+    signal_long = np.full_like(roc, np.nan)
+    signal_long[(roc > 0) & (roc_pre <= 0)] = 1
+    signal_long[(roc < 0) & (roc_pre >= 0)] = 0
+
+    # 做空 / 做空平仓信号
+    signal_short = np.full_like(roc, np.nan)
+    signal_short[(roc < 0) & (roc_pre >= 0)] = -1
+    signal_short[(roc > 0) & (roc_pre <= 0)] = 0
+
+    # 合并多空信号，去除重复信号
+    return merge_signal_matrix(signal_long, signal_short)
+
+
 def para_list():
     """
     生成参数遍历列表
@@ -38,10 +38,7 @@ def signal(df, para=[14, -100, 100], proportion=1, leverage_rate=1):
     df.loc[sell_signal, 'signal_short'] = -1
     df.loc[df['cci'] <= -50, 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['typical_price', 'tp', 'mean_deviation', 'cci', 'signal_long', 'signal_short'], axis=1, inplace=True)
     df = process_stop_loss_close(df, proportion, leverage_rate=leverage_rate)
@@ -42,10 +42,7 @@ def signal(df, para=[9, 3, 3], proportion=1, leverage_rate=1):
     df.loc[sell_signal, 'signal_short'] = -1
     df.loc[df['%k'] <= df['%d'], 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['lowest_low', 'highest_high', '%r', '%k', '%d', '%j', 'kdj_k_signal', 'signal_long', 'signal_short'], axis=1, inplace=True)
     df = process_stop_loss_close(df, proportion, leverage_rate=leverage_rate)
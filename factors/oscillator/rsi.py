@@ -16,6 +16,7 @@ RSI < 30为超卖区(买入信号)，RSI > 70为超买区(卖出信号)。
 """
 
 from cta_api.function import *
+from cta_api.indicators import rsi
 
 def signal(df, para=[14, 30, 70], proportion=1, leverage_rate=1):
     """
@@ -31,12 +32,7 @@ def signal(df, para=[14, 30, 70], proportion=1, leverage_rate=1):
     overbought = para[2]
 
     # 计算RSI
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period, min_periods=1).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period, min_periods=1).mean()
-
-    rs = gain / loss
-    df['rsi'] = 100 - (100 / (1 + rs))
+    df['rsi'] = rsi(df, period)
 
     # 买入信号: RSI上穿超卖线
     prev_rsi = df['rsi'].shift(1)
@@ -53,13 +49,8 @@ def signal(df, para=[14, 30, 70], proportion=1, leverage_rate=1):
     # 做空平仓: RSI回到50或触及超卖线
     df.loc[(df['rsi'] <= 50) | (df['rsi'] <= oversold), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['rsi', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -61,10 +61,7 @@ def signal(df, para=[14, 40], proportion=1, leverage_rate=1):
     df.loc[df['trix'] < df['matrix'], 'signal_long'] = 0
     df.loc[df['trix'] > df['matrix'], 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['trix', 'matrix', 'signal_long', 'signal_short'], axis=1, inplace=True)
     
@@ -1,6 +1,10 @@
 from cta_api.function import *
+from cta_api.rolling import rolling_mean_batch
 from numba import jit
 
+# 因子用到的行情列，批量回测只读取这些列
+columns = ['close']
+
 
 def signal(df, para=[200, 2], proportion=1, leverage_rate=1):
     """
@@ -50,12 +54,7 @@ def signal(df, para=[200, 2], proportion=1, leverage_rate=1):
     df.loc[condition1 & condition2, 'signal_short'] = 0  # 将产生平仓信号当天的signal设置为0，0代表平仓
 
     # ===== 合并做多做空信号，去除重复信号
-    # === 合并做多做空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)  # 合并多空信号，即signal_long与signal_short相加，得到真实的交易信号
-    # === 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]  # 筛选siganla不为空的数据，并另存一个变量
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]  # 筛选出当前周期与上个周期持仓信号不一致的，即去除重复信号
-    df['signal'] = temp['signal']  # 将处理后的signal覆盖到原始数据的signal列
+    df['signal'] = merge_signal(df)  # 合并多空信号，即signal_long与signal_short相加，并去除重复信号
 
     # ===== 删除无关变量
     df.drop(['ma_long', 'ma_short', 'signal_long', 'signal_short'], axis=1, inplace=True)  # 删除std、signal_long、signal_short列
@@ -66,6 +65,33 @@ def signal(df, para=[200, 2], proportion=1, leverage_rate=1):
 
     return df
 
+
+def signal_batch(arrays, para_list):
+    """
+    一次计算多组参数的信号，每列与 signal() 止盈止损前的 signal 一致
+    :param arrays: 行情各列的数组
+    :param para_list: 参数列表
+    :return: (K线数 × 参数组数) 的 signal 矩阵
+    """
+    n_list = [para[0] if isinstance(para, list) else int(para) for para in para_list]
+
+    # ===== 计算指标 (每列对应一组参数)
+    ma_short = rolling_mean_batch(arrays['close'], n_list, min_periods=1)
+    ma_long = rolling_mean_batch(ma_short, n_list, min_periods=1)
+    ma_short_pre, ma_long_pre = shift_array(ma_short), shift_array(ma_long)
+
+    # ===== 找出交易信号
+    signal_long = np.full_like(ma_short, np.nan)
+    signal_long[(ma_short > ma_long) & (ma_short_pre <= ma_long_pre)] = 1
+    signal_long[(ma_short < ma_long) & (ma_short_pre >= ma_long_pre)] = 0
+
+    signal_short = np.full_like(ma_short, np.nan)
+    signal_short[(ma_short < ma_long) & (ma_short_pre >= ma_long_pre)] = -1
+    signal_short[(ma_short > ma_long) & (ma_short_pre <= ma_long_pre)] = 0
+
+    # ===== 合并做多做空信号，去除重复信号
+    return merge_signal_matrix(signal_long, signal_short)
+
 # 策略参数组合
 def para_list(m_list=range(2, 500, 2), n_list=range(2, 200, 2)):
     """
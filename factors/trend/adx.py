@@ -55,10 +55,7 @@ def signal(df, para=[14, 25], proportion=1, leverage_rate=1):
     sell_signal = trend_filter & (~prev_trend) & (df['close'] < df['close'].shift(1))
     df.loc[sell_signal, 'signal_short'] = -1
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['tr', 'dm_plus', 'dm_minus', 'tr_smooth', 'dm_plus_smooth', 'dm_minus_smooth', 'di_plus', 'di_minus', 'dx', 'adx', 'trend_strength', 'signal_long', 'signal_short'], axis=1, inplace=True)
     df = process_stop_loss_close(df, proportion, leverage_rate=leverage_rate)
@@ -15,6 +15,7 @@ Donchian通道由N周期内的最高价和最低价构成。
 """
 
 from cta_api.function import *
+from cta_api.indicators import donchian
 
 def signal(df, para=[20], proportion=1, leverage_rate=1):
     """
@@ -28,8 +29,7 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     period = para[0]
 
     # 计算Donchian通道
-    df['donchian_high'] = df['high'].rolling(window=period, min_periods=1).max()
-    df['donchian_low'] = df['low'].rolling(window=period, min_periods=1).min()
+    df['donchian_high'], df['donchian_low'] = donchian(df, period)
     df['donchian_middle'] = (df['donchian_high'] + df['donchian_low']) / 2
 
     # 做多信号: 价格突破通道上沿
@@ -50,13 +50,8 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     condition2 = df['close'].shift(1) <= df['donchian_middle'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['donchian_high', 'donchian_low', 'donchian_middle', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -16,6 +16,10 @@
 """
 
 from cta_api.function import *
+from cta_api.indicators import ema
+
+# 因子用到的行情列，批量回测只读取这些列
+columns = ['close']
 
 def signal(df, para=[12, 26], proportion=1, leverage_rate=1):
     """
@@ -30,8 +34,8 @@ def signal(df, para=[12, 26], proportion=1, leverage_rate=1):
     long_period = para[1]
 
     # 计算EMA (pandas ewm, adjust=False使用标准EMA公式)
-    df['factor_ema_short'] = df['close'].ewm(span=short_period, adjust=False).mean()
-    df['factor_ema_long'] = df['close'].ewm(span=long_period, adjust=False).mean()
+    df['factor_ema_short'] = ema(df, short_period)
+    df['factor_ema_long'] = ema(df, long_period)
 
     # 做多信号: 短期EMA上穿长期EMA
     condition1 = df['factor_ema_short'] > df['factor_ema_long']
@@ -53,13 +57,8 @@ def signal(df, para=[12, 26], proportion=1, leverage_rate=1):
     condition2 = df['factor_ema_short'].shift(1) <= df['factor_ema_long'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     # df.drop(['ema_short', 'ema_long', 'signal_long', 'signal_short'], axis=1, inplace=True)
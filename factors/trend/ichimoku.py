@@ -52,10 +52,7 @@ def signal(df, para=[9, 26, 52], proportion=1, leverage_rate=1):
     df.loc[sell_signal, 'signal_short'] = -1
     df.loc[~(df['close'] < df['cloud_bottom'].shift(1)), 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['tr', 'tenkan', 'tenkan_lead', 'kijun', 'kijun_lead', 'senkou_a', 'senkou_b', 'senkou_a_lead', 'senkou_b_lead', 'cloud_top', 'cloud_bottom', 'close_above_cloud', 'signal_long', 'signal_short'], axis=1, inplace=True)
     df = process_stop_loss_close(df, proportion, leverage_rate=leverage_rate)
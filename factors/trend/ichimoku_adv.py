@@ -21,6 +21,7 @@ Ichimoku云图是综合技术分析系统，包含:
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[9, 26, 52], proportion=1, leverage_rate=1):
     """
@@ -36,17 +37,17 @@ def signal(df, para=[9, 26, 52], proportion=1, leverage_rate=1):
     senkou_period = para[2]
 
     # 计算转换线
-    df['tenkan_sen'] = (df['high'].rolling(window=tenkan_period).max() +
-                        df['low'].rolling(window=tenkan_period).min()) / 2
+    tenkan_high, tenkan_low = rolling_max_min(df['high'], df['low'], tenkan_period)
+    df['tenkan_sen'] = (tenkan_high + tenkan_low) / 2
 
     # 计算基准线
-    df['kijun_sen'] = (df['high'].rolling(window=kijun_period).max() +
-                        df['low'].rolling(window=kijun_period).min()) / 2
+    kijun_high, kijun_low = rolling_max_min(df['high'], df['low'], kijun_period)
+    df['kijun_sen'] = (kijun_high + kijun_low) / 2
 
     # 计算先行带
     df['senkou_span_a'] = ((df['tenkan_sen'] + df['kijun_sen']) / 2).shift(26)
-    df['senkou_span_b'] = ((df['high'].rolling(window=senkou_period).max() +
-                         df['low'].rolling(window=senkou_period).min()) / 2).shift(26)
+    senkou_high, senkou_low = rolling_max_min(df['high'], df['low'], senkou_period)
+    df['senkou_span_b'] = pd.Series((senkou_high + senkou_low) / 2, index=df.index).shift(26)
 
     # 计算迟行线
     df['chikou_span'] = df['close'].shift(-26)
@@ -79,13 +80,8 @@ def signal(df, para=[9, 26, 52], proportion=1, leverage_rate=1):
     condition3 = df['close'] > df['cloud_top']
     df.loc[(condition1 & condition2) | condition3, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['tenkan_sen', 'kijun_sen', 'senkou_span_a', 'senkou_span_b',
@@ -15,6 +15,11 @@ KAMA根据市场的波动率自动调整平滑度。
 """
 
 from cta_api.function import *
+from cta_api.recursion import kama
+from cta_api.indicators import cached_indicator
+
+# 因子用到的行情列，批量回测只读取这些列
+columns = ['close']
 
 def signal(df, para=[20, 50], proportion=1, leverage_rate=1):
     """
@@ -29,8 +34,8 @@ def signal(df, para=[20, 50], proportion=1, leverage_rate=1):
     long_period = para[1]
 
     # 计算KAMA
-    df['kama_short'] = calculate_kama(df['close'], short_period)
-    df['kama_long'] = calculate_kama(df['close'], long_period)
+    df['kama_short'] = cached_indicator(df, 'kama', (short_period, 2 / 3, 2 / 31), lambda: calculate_kama(df['close'], short_period))
+    df['kama_long'] = cached_indicator(df, 'kama', (long_period, 2 / 3, 2 / 31), lambda: calculate_kama(df['close'], long_period))
 
     # 做多信号: 短期KAMA上穿长期KAMA
     condition1 = df['kama_short'] > df['kama_long']
@@ -52,13 +57,8 @@ def signal(df, para=[20, 50], proportion=1, leverage_rate=1):
     condition2 = df['kama_short'].shift(1) <= df['kama_long'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['kama_short', 'kama_long', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -75,32 +75,9 @@ def calculate_kama(series, period):
     1. 计算效率比率(ER): 方向性波动 / 总波动
     2. 计算平滑常数SC: (ER * (fastest - slowest) + slowest)^2
     3. KAMA = 前一日KAMA + SC * (当前价 - 前一日KAMA)
+    递推部分由 cta_api.recursion 编译执行
     """
-    fastest = 2 / 3
-    slowest = 2 / 31
-
-    # 计算价格变化
-    change = series.diff(period).abs()
-
-    # 计算总波动
-    volatility = series.diff().abs().rolling(window=period).sum()
-
-    # 效率比率
-    er = change / volatility
-    er = er.fillna(0)
-
-    # 平滑常数
-    sc = (er * (fastest - slowest) + slowest) ** 2
-
-    # 计算KAMA
-    kama = series.copy()
-    for i in range(period, len(series)):
-        if i == period:
-            kama.iloc[i] = series.iloc[:i+1].mean()
-        else:
-            kama.iloc[i] = kama.iloc[i-1] + sc.iloc[i] * (series.iloc[i] - kama.iloc[i-1])
-
-    return kama
+    return kama(series, period, fastest=2 / 3, slowest=2 / 31)
 
 
 def para_list():
@@ -41,10 +41,7 @@ def signal(df, para=[20, 2.0], proportion=1, leverage_rate=1):
     df.loc[touch_upper, 'signal_short'] = -1
     df.loc[df['close'] <= df['middle_band'], 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['tr', 'atr', 'middle_band', 'upper_band', 'lower_band', 'signal_long', 'signal_short'], axis=1, inplace=True)
     df = process_stop_loss_close(df, proportion, leverage_rate=leverage_rate)
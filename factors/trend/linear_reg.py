@@ -14,7 +14,7 @@
 """
 
 from cta_api.function import *
-import numpy as np
+from cta_api.rolling import rolling_linreg, rolling_mean_std
 
 def signal(df, para=[50], proportion=1, leverage_rate=1):
     """
@@ -27,14 +27,11 @@ def signal(df, para=[50], proportion=1, leverage_rate=1):
 
     period = para[0]
 
-    # 计算线性回归趋势线
-    df['reg_line'] = df['close'].rolling(window=period).apply(
-        lambda x: np.polyfit(range(len(x)), x, 1)[0] * (len(x)-1) + np.polyfit(range(len(x)), x, 1)[1],
-        raw=False
-    )
+    # 计算线性回归趋势线 (窗口末端的回归值)
+    df['reg_line'] = rolling_linreg(df['close'], period)[2]
 
     # 计算标准差带
-    df['std_dev'] = df['close'].rolling(window=period).std()
+    df['std_dev'] = rolling_mean_std(df['close'], period)[1]
     df['upper_band'] = df['reg_line'] + df['std_dev']
     df['lower_band'] = df['reg_line'] - df['std_dev']
 
@@ -58,13 +55,8 @@ def signal(df, para=[50], proportion=1, leverage_rate=1):
     condition2 = df['close'].shift(1) <= df['reg_line'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['reg_line', 'std_dev', 'upper_band', 'lower_band', 'signal_long', 'signal_short'], axis=1, inplace=True)
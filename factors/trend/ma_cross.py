@@ -15,6 +15,10 @@
 """
 
 from cta_api.function import *
+from cta_api.indicators import ma
+
+# 因子用到的行情列，批量回测只读取这些列
+columns = ['close']
 
 def signal(df, para=[20, 50], proportion=1, leverage_rate=1):
     """
@@ -29,8 +33,8 @@ def signal(df, para=[20, 50], proportion=1, leverage_rate=1):
     long_period = para[1]
 
     # 计算短期和长期均线
-    df['ma_short'] = df['close'].rolling(window=short_period, min_periods=1).mean()
-    df['ma_long'] = df['close'].rolling(window=long_period, min_periods=1).mean()
+    df['ma_short'] = ma(df, short_period)
+    df['ma_long'] = ma(df, long_period)
 
     # 做多信号: 短期均线上穿长期均线
     condition1 = df['ma_short'] > df['ma_long']
@@ -52,13 +56,8 @@ def signal(df, para=[20, 50], proportion=1, leverage_rate=1):
     condition2 = df['ma_short'].shift(1) <= df['ma_long'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['ma_short', 'ma_long', 'signal_long', 'signal_short'], axis=1, inplace=True)
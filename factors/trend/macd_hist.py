@@ -17,6 +17,7 @@ MACD柱状图策略 (MACD Histogram)
 """
 
 from cta_api.function import *
+from cta_api.indicators import ema
 import pandas as pd
 import numpy as np
 
@@ -34,8 +35,8 @@ def signal(df, para=[12, 26, 9], proportion=1, leverage_rate=1):
     signal_period = para[2]
 
     # 计算EMA
-    df['ema_fast'] = df['close'].ewm(span=fast_period, adjust=False).mean()
-    df['ema_slow'] = df['close'].ewm(span=slow_period, adjust=False).mean()
+    df['ema_fast'] = ema(df, fast_period)
+    df['ema_slow'] = ema(df, slow_period)
 
     # 计算DIF和DEA
     df['dif'] = df['ema_fast'] - df['ema_slow']
@@ -64,13 +65,8 @@ def signal(df, para=[12, 26, 9], proportion=1, leverage_rate=1):
     condition2 = df['macd_hist'].shift(1) <= 0
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['ema_fast', 'ema_slow', 'dif', 'dea', 'macd_hist', 'signal_long', 'signal_short'], axis=1, inplace=True)
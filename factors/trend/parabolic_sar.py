@@ -16,6 +16,7 @@ SAR位于价格下方时做多，位于上方时做空，动态调整止损位
 """
 
 from cta_api.function import *
+from cta_api.recursion import sar_recursion
 import numpy as np
 
 def signal(df, para=[0.02, 0.2, 0.02], proportion=1, leverage_rate=1):
@@ -27,19 +28,8 @@ def signal(df, para=[0.02, 0.2, 0.02], proportion=1, leverage_rate=1):
     df['ep'] = df['high'].shift(1)
     df['trend'] = 0
 
-    for i in range(2, len(df)):
-        if df.loc[i, 'close'] > df.loc[i, 'ep']:
-            df.loc[i, 'trend'] = 1
-        elif df.loc[i, 'close'] < df.loc[i, 'ep']:
-            df.loc[i, 'trend'] = 0
-
-        if df.loc[i, 'trend'] == 1:
-            df.loc[i, 'sar'] = df.loc[i, 'sar'] + step * (max_val - df.loc[i, 'sar'])
-        else:
-            df.loc[i, 'sar'] = df.loc[i, 'sar'] + step * (df.loc[i, 'ep'] - df.loc[i, 'sar'])
-
-        if df.loc[i, 'trend'] == 1 and df.loc[i, 'low'] < df.loc[i, 'sar']:
-            df.loc[i, 'trend'] = -1
+    # 逐K线更新 sar / trend (编译执行)
+    df['sar'], df['trend'] = sar_recursion(df['close'], df['low'], df['ep'], df['sar'], step, max_val)
 
     df['signal_long'] = np.where(df['close'] > df['sar'], 1, 0)
     df['signal_short'] = np.where(df['close'] < df['sar'], -1, 0)
@@ -50,10 +40,7 @@ def signal(df, para=[0.02, 0.2, 0.02], proportion=1, leverage_rate=1):
     sell_signal = (df['signal_short'] == -1) & (df['signal_short'].shift(1) == 0)
     df.loc[sell_signal, 'signal_short'] = -1
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['sar', 'ep', 'trend', 'signal_long', 'signal_short'], axis=1, inplace=True)
     df = process_stop_loss_close(df, proportion, leverage_rate=leverage_rate)
@@ -14,6 +14,7 @@
 """
 
 from cta_api.function import *
+from cta_api.rolling import rolling_max_min
 
 def signal(df, para=[40], proportion=1, leverage_rate=1):
     """
@@ -27,8 +28,7 @@ def signal(df, para=[40], proportion=1, leverage_rate=1):
     period = para[0]
 
     # 计算价格通道
-    df['channel_high'] = df['high'].rolling(window=period).max()
-    df['channel_low'] = df['low'].rolling(window=period).min()
+    df['channel_high'], df['channel_low'] = rolling_max_min(df['high'], df['low'], period)
     df['channel_middle'] = (df['channel_high'] + df['channel_low']) / 2
 
     # 做多信号: 价格突破通道上沿
@@ -49,13 +49,8 @@ def signal(df, para=[40], proportion=1, leverage_rate=1):
     condition2 = df['close'].shift(1) <= df['channel_middle'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['channel_high', 'channel_low', 'channel_middle', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -12,6 +12,8 @@ SuperTrend 是基于ATR的趋势跟踪指标。
 """
 
 from cta_api.function import *
+from cta_api.recursion import trailing_band
+from cta_api.indicators import atr
 import pandas as pd
 import numpy as np
 
@@ -20,10 +22,7 @@ def signal(df, para=[10], proportion=1, leverage_rate=1):
     multiplier = 3.0
     
     # 计算ATR
-    df['tr'] = np.maximum(df['high'] - df['low'], 
-                          np.maximum(abs(df['high'] - df['close'].shift(1)), 
-                                     abs(df['low'] - df['close'].shift(1))))
-    df['atr'] = df['tr'].rolling(window=n).mean()
+    df['atr'] = atr(df, n)
     
     df['hl2'] = (df['high'] + df['low']) / 2
     df['basic_upper'] = df['hl2'] + multiplier * df['atr']
@@ -44,49 +43,9 @@ def signal(df, para=[10], proportion=1, leverage_rate=1):
     # 当收盘价 < 上一次的Final Lower，趋势转空
     # 趋势为多时，Lower band不降低；趋势为空时，Upper band不升高
     
-    # 使用纯Python循环（Numba会更快，但为了兼容性先写Python，数据量不大时可接受）
-    # 或者使用 cta_api.function 中的 Numba 加速（如果有）
-    # 这里直接写一个简单的循环
-    
-    close = df['close'].values
-    basic_upper = df['basic_upper'].values
-    basic_lower = df['basic_lower'].values
-    final_upper = np.zeros(len(df))
-    final_lower = np.zeros(len(df))
-    trend = np.zeros(len(df)) # 1 up, -1 down
-    
-    curr_trend = 1
-    curr_upper = basic_upper[0]
-    curr_lower = basic_lower[0]
-    
-    for i in range(1, len(df)):
-        if np.isnan(basic_upper[i]):
-            continue
-            
-        # Update Final Upper
-        if basic_upper[i] < curr_upper or close[i-1] > curr_upper:
-            curr_upper = basic_upper[i]
-        else:
-            curr_upper = curr_upper
-            
-        # Update Final Lower
-        if basic_lower[i] > curr_lower or close[i-1] < curr_lower:
-            curr_lower = basic_lower[i]
-        else:
-            curr_lower = curr_lower
-            
-        # Update Trend
-        if curr_trend == 1:
-            if close[i] < curr_lower:
-                curr_trend = -1
-        else:
-            if close[i] > curr_upper:
-                curr_trend = 1
-                
-        final_upper[i] = curr_upper
-        final_lower[i] = curr_lower
-        trend[i] = curr_trend
-        
+    # 递推由 cta_api.recursion 编译执行，ATR 尚未形成的K线跳过 (趋势记为0)
+    final_upper, final_lower, trend = trailing_band(df['close'], df['basic_upper'], df['basic_lower'],
+                                                    init_trend=1, skip_nan=True)
     df['trend'] = trend
     
     # 生成信号
@@ -99,10 +58,7 @@ def signal(df, para=[10], proportion=1, leverage_rate=1):
     df.loc[condition_short, 'signal_short'] = -1
     df.loc[condition_long, 'signal_short'] = 0
     
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['tr', 'atr', 'hl2', 'basic_upper', 'basic_lower', 'final_upper', 'final_lower', 'trend', 'super_trend', 'trend_dir', 'signal_long', 'signal_short'], axis=1, inplace=True, errors='ignore')
     
@@ -16,6 +16,7 @@ Supertrend基于ATR和波动率计算动态止损线。
 """
 
 from cta_api.function import *
+from cta_api.recursion import trailing_band
 import numpy as np
 import pandas as pd
 
@@ -38,58 +39,9 @@ def signal(df, para=[10, 3.0], proportion=1, leverage_rate=1):
     basic_upper = hl2 + (multiplier * atr)
     basic_lower = hl2 - (multiplier * atr)
 
-    # Final bands initialization
-    final_upper = basic_upper.copy()
-    final_lower = basic_lower.copy()
-    supertrend = pd.Series(index=df.index, dtype='float64')
-    
-    # Iterative calculation for Final Bands and Supertrend
-    # Using numpy arrays for speed
-    close_arr = df['close'].values
-    bu_arr = basic_upper.values
-    bl_arr = basic_lower.values
-    fu_arr = np.zeros(len(df))
-    fl_arr = np.zeros(len(df))
-    st_arr = np.zeros(len(df))
-    trend_arr = np.zeros(len(df)) # 1 for up, -1 for down
-
-    # Initialize first values
-    fu_arr[0] = bu_arr[0]
-    fl_arr[0] = bl_arr[0]
-    
-    for i in range(1, len(df)):
-        # Final Upper Band
-        if (bu_arr[i] < fu_arr[i-1]) or (close_arr[i-1] > fu_arr[i-1]):
-            fu_arr[i] = bu_arr[i]
-        else:
-            fu_arr[i] = fu_arr[i-1]
-            
-        # Final Lower Band
-        if (bl_arr[i] > fl_arr[i-1]) or (close_arr[i-1] < fl_arr[i-1]):
-            fl_arr[i] = bl_arr[i]
-        else:
-            fl_arr[i] = fl_arr[i-1]
-            
-        # Supertrend
-        if i == 0:
-            trend_arr[i] = 1
-        else:
-            # Determine trend
-            if trend_arr[i-1] == 1:
-                if close_arr[i] < fl_arr[i]:
-                    trend_arr[i] = -1
-                else:
-                    trend_arr[i] = 1
-            else:
-                if close_arr[i] > fu_arr[i]:
-                    trend_arr[i] = 1
-                else:
-                    trend_arr[i] = -1
-        
-        if trend_arr[i] == 1:
-            st_arr[i] = fl_arr[i]
-        else:
-            st_arr[i] = fu_arr[i]
+    # Iterative calculation for Final Bands and Supertrend (compiled, see cta_api.recursion)
+    fu_arr, fl_arr, trend_arr = trailing_band(df['close'], basic_upper, basic_lower, init_trend=0)
+    st_arr = np.where(trend_arr == 1, fl_arr, fu_arr)
 
     df['supertrend'] = st_arr
     df['trend'] = trend_arr
@@ -101,10 +53,7 @@ def signal(df, para=[10, 3.0], proportion=1, leverage_rate=1):
     sell_signal = (df['trend'] == -1) & (df['trend'].shift(1) == 1)
     df.loc[sell_signal, 'signal_short'] = -1
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['supertrend', 'trend', 'signal_long', 'signal_short'], axis=1, inplace=True)
     df = process_stop_loss_close(df, proportion, leverage_rate=leverage_rate)
@@ -62,12 +62,7 @@ def signal(df, para=[10], proportion=1, leverage_rate=1):
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
     # 合并信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    
-    # 去重
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['t3', 'signal_long', 'signal_short'], axis=1, inplace=True)
     
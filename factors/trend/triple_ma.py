@@ -15,6 +15,10 @@
 """
 
 from cta_api.function import *
+from cta_api.indicators import ma
+
+# 因子用到的行情列，批量回测只读取这些列
+columns = ['close']
 
 def signal(df, para=[10, 20, 50], proportion=1, leverage_rate=1):
     """
@@ -30,9 +34,9 @@ def signal(df, para=[10, 20, 50], proportion=1, leverage_rate=1):
     long_period = para[2]
 
     # 计算三条均线
-    df['ma_short'] = df['close'].rolling(window=short_period, min_periods=1).mean()
-    df['ma_mid'] = df['close'].rolling(window=mid_period, min_periods=1).mean()
-    df['ma_long'] = df['close'].rolling(window=long_period, min_periods=1).mean()
+    df['ma_short'] = ma(df, short_period)
+    df['ma_mid'] = ma(df, mid_period)
+    df['ma_long'] = ma(df, long_period)
 
     # 多头排列: 短>中>长
     bull_alignment = (df['ma_short'] > df['ma_mid']) & (df['ma_mid'] > df['ma_long'])
@@ -56,13 +60,8 @@ def signal(df, para=[10, 20, 50], proportion=1, leverage_rate=1):
     # 做空平仓: 空头排列破坏
     df.loc[~bear_alignment & prev_bear, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['ma_short', 'ma_mid', 'ma_long', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -30,7 +30,7 @@ def signal(df, para=[20, 1], proportion=1, leverage_rate=1):
     sell_signal = (df['close'] < df['sma']) & (df['close'].shift(1) >= df['sma'].shift(1))
     df.loc[df['close'] >= df['sma'].shift(1), 'signal_short'] = -1
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
+    df['signal'] = merge_signal(df, drop_duplicates=False)
 
     df['signal'] = df['signal'].replace(0, np.nan)
 
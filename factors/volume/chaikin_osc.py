@@ -62,13 +62,8 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     condition2 = df['ema_vol_up'].shift(1) <= df['cma'].shift(1)
     df.loc[condition1 & condition2, 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['price_change', 'clv', 'ema_vol_up', 'ema_vol_down', 'cma', 'signal_long', 'signal_short'], axis=1, inplace=True)
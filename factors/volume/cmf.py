@@ -49,10 +49,7 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     df.loc[df['cmf'] < 0, 'signal_long'] = 0
     df.loc[df['cmf'] > 0, 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['cmf', 'signal_long', 'signal_short'], axis=1, inplace=True)
     
@@ -65,13 +65,8 @@ def signal(df, para=[14], proportion=1, leverage_rate=1):
     condition1 = df['mfi'] > 80
     df.loc[(condition1) & df['signal_short'].shift(1).notnull(), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['tp', 'typical_price', 'pos_mf', 'neg_mf', 'pos_mf_sum', 'neg_mf_sum', 'mfi', 'signal_long', 'signal_short'], axis=1, inplace=True)
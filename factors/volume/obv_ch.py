@@ -15,6 +15,7 @@ OBV反映资金流向，用于确认价格变动。
 """
 
 from cta_api.function import *
+from cta_api.recursion import obv
 
 def signal(df, para=[20], proportion=1, leverage_rate=1):
     """
@@ -28,12 +29,8 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     period = para[0]
 
     # 计算OBV
-    df['obv'] = 0
-    for i in range(1, len(df)):
-        if df.iloc[i]['close'] > df.iloc[i-1]['close']:
-            df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv'] + df.iloc[i]['volume']
-        elif df.iloc[i]['close'] < df.iloc[i-1]['close']:
-            df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv'] - df.iloc[i]['volume']
+    # 收盘价持平时 OBV 归零 (与原逐行循环一致)
+    df['obv'] = obv(df['close'], df['volume'], hold_on_flat=False)
 
     # 计算OBV均线
     df['obv_ma'] = df['obv'].rolling(window=period, min_periods=1).mean()
@@ -62,13 +59,8 @@ def signal(df, para=[20], proportion=1, leverage_rate=1):
     condition2 = df['obv'] >= df['obv_ma'].shift(1)
     df.loc[(condition1 | condition2) & df['signal_short'].shift(1).notnull(), 'signal_short'] = 0
 
-    # 合并多空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-
-    # 去除重复信号
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    # 合并多空信号，去除重复信号
+    df['signal'] = merge_signal(df)
 
     # 删除中间变量
     df.drop(['obv', 'obv_ma', 'price_high', 'price_low', 'signal_long', 'signal_short'], axis=1, inplace=True)
@@ -52,10 +52,7 @@ def signal(df, para=[14], proportion=1, leverage_rate=1):
     df.loc[(df['pos'] == -1) & (df['pos'].shift(1) != -1), 'signal_short'] = -1
     df.loc[(df['pos'] != -1) & (df['pos'].shift(1) == -1), 'signal_short'] = 0
 
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)
-    temp = df[df['signal'].notnull()][['signal']]
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]
-    df['signal'] = temp['signal']
+    df['signal'] = merge_signal(df)
 
     df.drop(['vroc', 'proc', 'pos', 'signal_long', 'signal_short'], axis=1, inplace=True)
     
@@ -50,7 +50,7 @@ def signal(df, para=[200, 2, 0.05], proportion=1, leverage_rate=1):
     df.loc[condition1 & condition2, 'signal_short'] = 0  # 将产生平仓信号当天的signal设置为0，0代表平仓
 
     # ===== 合并做多做空信号
-    df['signal'] = df[['signal_long', 'signal_short']].sum(axis=1, min_count=1, skipna=True)  # 合并多空信号，即signal_long与signal_short相加，得到真实的交易信号
+    df['signal'] = merge_signal(df, drop_duplicates=False)  # 合并多空信号，即signal_long与signal_short相加，得到真实的交易信号
 
     # ===== 根据bias，修改开仓时间
     df['temp'] = df['signal']
@@ -71,10 +71,7 @@ def signal(df, para=[200, 2, 0.05], proportion=1, leverage_rate=1):
 
     # ===== 合去除重复信号
     # === 去除重复信号
-    df['signal'] = df['temp']
-    temp = df[df['signal'].notnull()][['signal']]  # 筛选siganal不为空的数据，并另存一个变量
-    temp = temp[temp['signal'] != temp['signal'].shift(1)]  # 筛选出当前周期与上个周期持仓信号不一致的，即去除重复信号
-    df['signal'] = temp['signal']  # 将处理后的signal覆盖到原始数据的signal列
+    df['signal'] = drop_duplicate_signal(df['temp'])  # 筛选出当前周期与上个周期持仓信号不一致的，即去除重复信号
 
     # ===== 删除无关变量
     df.drop(['median', 'std', 'upper', 'lower', 'bias', 'temp', 'signal_long', 'signal_short'], axis=1,